@@ -2,61 +2,173 @@
 AutoGSC Web Dashboard
 A simple Flask web interface for the AutoGSC tool.
 """
-from flask import Flask, render_template, jsonify, request
-from threading import Thread
-import subprocess
+from flask import Flask, Response, render_template, jsonify, request
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
 import os
 import sys
 
 # Add parent directory to path to import our modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import get_stats, get_today_submission_count, get_connection
-from config import SITE_URL, SITEMAP_URL, DAILY_SUBMISSION_LIMIT
+from database import get_stats, get_today_submission_count, get_connection, get_status_counts
+from config import SITE_URL, SITEMAP_URL, DAILY_SUBMISSION_LIMIT, SERVICE_ACCOUNT_FILES
 
 app = Flask(__name__)
 
+# Log lines kept per job; older lines are dropped
+JOB_LOG_LINES = 1000
+
+# Lines returned by /api/job/status when no `since` is given
+JOB_LOG_TAIL = 100
+
+STAGE_STATUS = {
+    "sitemap": "Fetching sitemap...",
+    "scan": "Scanning sitemap...",
+    "submit": "Submitting URLs...",
+}
+
+# Log symbol per URL outcome reported by the pipeline
+OUTCOME_SYMBOLS = {
+    "indexed": "✓",
+    "submitted": "✓",
+    "would_submit": "→",
+    "not_indexed": "✗",
+    "failed": "✗",
+    "error": "?",
+}
+
+
+class JobLog:
+    """
+    Ring buffer of log lines with sequence numbers.
+    
+    Sequence numbers keep increasing across clear(), so a client polling
+    with `since` never mistakes a new job's lines for ones it already has.
+    """
+    
+    def __init__(self, maxlen=JOB_LOG_LINES):
+        self._lines = deque(maxlen=maxlen)
+        self._next_seq = 0
+        self._lock = Lock()
+    
+    def append(self, line):
+        with self._lock:
+            self._lines.append(line)
+            self._next_seq += 1
+    
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+    
+    def since(self, seq=None, limit=JOB_LOG_TAIL):
+        """
+        Get lines with sequence number >= seq (the last `limit` if seq is None).
+        
+        Returns:
+            Dict with 'lines', 'first_seq' (sequence number of lines[0]),
+            'next_seq' (pass as `since` on the next poll) and 'truncated'
+            (True if lines after `seq` were already dropped)
+        """
+        with self._lock:
+            oldest = self._next_seq - len(self._lines)
+            if seq is None:
+                start = max(0, len(self._lines) - limit)
+            else:
+                start = min(max(0, seq - oldest), len(self._lines))
+            lines = list(islice(self._lines, start, start + limit))
+            return {
+                "lines": lines,
+                "first_seq": oldest + start,
+                "next_seq": oldest + start + len(lines),
+                "truncated": seq is not None and seq < oldest,
+            }
+
+
 # Track running jobs
-current_job = {"running": False, "status": "", "log": []}
+current_job = {"job_id": 0, "running": False, "status": "", "progress": None, "result": None}
+job_log = JobLog()
+cancel_requested = Event()
+
+# Jobs run in-process, one at a time, on this worker
+job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autogsc-job")
+_job_lock = Lock()
+
+# Warm API clients shared across jobs (see get_client)
+_clients = {}
+_clients_lock = Lock()
+
+
+def handle_job_event(event):
+    """Update current_job and the log from a reporter event."""
+    kind = event.get("event")
+    if kind == "stage":
+        current_job["status"] = STAGE_STATUS.get(event.get("stage"), current_job["status"])
+        current_job["progress"] = {"done": 0, "total": event.get("total")}
+    elif kind in ("url", "progress"):
+        current_job["progress"] = {"done": event.get("done"), "total": event.get("total")}
+        if kind == "url":
+            symbol = OUTCOME_SYMBOLS.get(event.get("outcome"), "·")
+            job_log.append(f"{symbol} {event.get('url')} -> {event.get('status')}")
+    elif kind == "summary":
+        if event.get("stage") == "submit":
+            current_job["result"] = {k: event.get(k) for k in ("submitted", "failed", "skipped")}
+    elif kind in ("warning", "error"):
+        job_log.append(f"{kind.title()}: {event.get('message')}")
+        if kind == "error":
+            current_job["status"] = f"Error: {event.get('message')}"
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once a cancel has been requested."""
 
 
-def run_autogsc_job():
-    """Run the AutoGSC scan and submit in background."""
-    global current_job
-    current_job["running"] = True
-    current_job["log"] = []
-    current_job["status"] = "Starting..."
+def _job_event(event):
+    """Reporter callback for in-process jobs; also the cancellation point."""
+    if cancel_requested.is_set():
+        raise JobCancelled()
+    handle_job_event(event)
+
+
+def get_client(client_class):
+    """
+    Get a shared, already-authenticated API client.
+    
+    Built on first use and reused by later jobs, so a job doesn't pay for
+    credential loading and API discovery again. Jobs run one at a time, so
+    the clients are never used from two threads at once.
+    """
+    with _clients_lock:
+        client = _clients.get(client_class)
+        if client is None:
+            client = _clients[client_class] = client_class()
+        return client
+
+
+def run_autogsc_job(dry_run=False):
+    """Run the AutoGSC scan and submit on the job worker."""
+    from reporter import Reporter, JSONL
+    from pipeline import run_pipeline
+    from gsc_client import GSCClient
+    from indexing_client import IndexingClient
     
+    reporter = Reporter(JSONL, on_event=_job_event)
     try:
-        # Run the main.py script
-        process = subprocess.Popen(
-            [sys.executable, "main.py", "run"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            cwd=os.path.dirname(os.path.abspath(__file__))
-        )
-        
-        current_job["status"] = "Scanning sitemap..."
-        
-        for line in process.stdout:
-            line = line.strip()
-            if line:
-                current_job["log"].append(line)
-                # Update status based on output
-                if "Scanning" in line:
-                    current_job["status"] = "Scanning sitemap..."
-                elif "Submitting" in line:
-                    current_job["status"] = "Submitting URLs..."
-                elif "Complete" in line:
-                    current_job["status"] = "Complete!"
-        
-        process.wait()
-        current_job["status"] = "Complete!"
+        run_pipeline(reporter,
+                     lambda: get_client(GSCClient),
+                     lambda: get_client(IndexingClient),
+                     SITEMAP_URL, dry_run=dry_run, site_url=SITE_URL)
+        if not current_job["status"].startswith("Error"):
+            current_job["status"] = "Complete!"
         
+    except JobCancelled:
+        current_job["status"] = "Cancelled"
+        job_log.append("Cancelled by user")
     except Exception as e:
         current_job["status"] = f"Error: {str(e)}"
-        current_job["log"].append(f"Error: {str(e)}")
+        job_log.append(f"Error: {str(e)}")
     finally:
         current_job["running"] = False
 
@@ -66,9 +178,10 @@ def get_recent_submissions(limit=10):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT url, submitted_at, result 
-        FROM submissions 
-        ORDER BY submitted_at DESC 
+        SELECT d.url, s.submitted_at, s.result 
+        FROM submissions s
+        LEFT JOIN url_dict d ON d.id = s.url_id
+        ORDER BY s.submitted_at DESC 
         LIMIT ?
     """, (limit,))
     rows = cursor.fetchall()
@@ -78,16 +191,7 @@ def get_recent_submissions(limit=10):
 
 def get_url_breakdown():
     """Get breakdown of URLs by status."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT indexing_status, COUNT(*) 
-        FROM urls 
-        GROUP BY indexing_status
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-    return {r[0]: r[1] for r in rows}
+    return get_status_counts()
 
 
 @app.route("/")
@@ -100,13 +204,20 @@ def index():
 def api_stats():
     """Get current statistics."""
     stats = get_stats()
-    stats["today_limit"] = DAILY_SUBMISSION_LIMIT
+    stats["today_limit"] = DAILY_SUBMISSION_LIMIT * len(SERVICE_ACCOUNT_FILES)
     stats["site_url"] = SITE_URL
     stats["sitemap_url"] = SITEMAP_URL
     stats["breakdown"] = get_url_breakdown()
     return jsonify(stats)
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Timing histograms and counters in Prometheus text format."""
+    from metrics import render_prometheus
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/api/history")
 def api_history():
     """Get recent submission history."""
@@ -115,21 +226,49 @@ def api_history():
 
 @app.route("/api/job/status")
 def api_job_status():
-    """Get current job status."""
-    return jsonify(current_job)
+    """
+    Get current job status.
+    
+    Pass `since=<next_seq from the previous poll>` to get only new log lines;
+    without it the last JOB_LOG_TAIL lines are returned.
+    """
+    since = request.args.get("since", type=int)
+    log = job_log.since(since)
+    return jsonify({
+        **current_job,
+        "log": log["lines"],
+        "log_first_seq": log["first_seq"],
+        "log_next_seq": log["next_seq"],
+        "log_truncated": log["truncated"],
+    })
 
 
 @app.route("/api/job/start", methods=["POST"])
 def api_job_start():
     """Start a new scan/submit job."""
-    if current_job["running"]:
-        return jsonify({"error": "Job already running"}), 400
+    with _job_lock:
+        if current_job["running"]:
+            return jsonify({"error": "Job already running"}), 400
+        current_job.update(job_id=current_job["job_id"] + 1, running=True,
+                           status="Starting...", progress=None, result=None)
     
-    thread = Thread(target=run_autogsc_job)
-    thread.start()
+    job_log.clear()
+    cancel_requested.clear()
+    job_executor.submit(run_autogsc_job, dry_run=bool(request.args.get("dry_run")))
     return jsonify({"status": "started"})
 
 
+@app.route("/api/job/cancel", methods=["POST"])
+def api_job_cancel():
+    """Ask the running job to stop after the URL it is working on."""
+    if not current_job["running"]:
+        return jsonify({"error": "No job running"}), 400
+    
+    cancel_requested.set()
+    current_job["status"] = "Cancelling..."
+    return jsonify({"status": "cancelling"})
+
+
 if __name__ == "__main__":
     print("\n" + "="*50)
     print("  AutoGSC Dashboard")
@@ -2,26 +2,25 @@
 AutoGSC SaaS Version - OAuth-based Authentication
 Users login with Google or email/password. Email users can connect GSC from dashboard.
 """
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from werkzeug.security import generate_password_hash, check_password_hash
-from threading import Thread
-import subprocess
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, session
+from functools import lru_cache
 import os
-import sys
 import json
 import secrets
 import sqlite3
+from datetime import datetime
 
-# psycopg2 is only needed when DATABASE_URL is set (Supabase / any Postgres)
-try:
-    import psycopg2
-    import psycopg2.extras
-except ImportError:
-    psycopg2 = None
+from config import DAILY_SUBMISSION_LIMIT, GSC_API_ENDPOINT, INDEXING_API_ENDPOINT, SITEMAP_DISCOVERY
+from migrations import Migration, POSTGRES
+from quota import QuotaLedger, create_quota_tables, indexing_scope, inspection_scope
+from concurrency import ConcurrencyStore, create_concurrency_tables
+from write_behind import create_sync_tables
+from storage import open_storage
+
+# The Google client stacks (google_auth_oauthlib, googleapiclient), psycopg2
+# and werkzeug.security are imported inside the routes that use them. Every
+# serverless cold start pays for module-level imports, and most requests
+# (landing page, login form, static pages) need none of them.
 
 app = Flask(__name__)
 # Read secret key from environment or generate one
@@ -37,152 +36,132 @@ _sqlite_path = os.environ.get(
 )
 
 
-def _pg():
-    """Open a Postgres connection with dict-like rows."""
-    return psycopg2.connect(DATABASE_URL, cursor_factory=psycopg2.extras.RealDictCursor)
+def _migration_001_users(cur, dialect):
+    """Users table (Google and email/password accounts)."""
+    id_column = 'id SERIAL PRIMARY KEY' if dialect == POSTGRES else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS users (
+            {id_column},
+            email TEXT UNIQUE NOT NULL,
+            name TEXT,
+            password_hash TEXT,
+            gsc_credentials TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_002_quota_ledger(cur, dialect):
+    """Quota ledger shared by all web workers."""
+    create_quota_tables(cur, dialect)
+
+
+def _migration_003_concurrency_limits(cur, dialect):
+    """Adaptive inspection concurrency, saved per property."""
+    create_concurrency_tables(cur, dialect)
+
+
+def _migration_004_sync_tables(cur, dialect):
+    """Latest status per URL and submission log, written through the outbox."""
+    create_sync_tables(cur, dialect)
+
+
+# Append new migrations; never edit or reorder applied ones.
+MIGRATIONS = [
+    Migration(1, "users", _migration_001_users),
+    Migration(2, "quota ledger", _migration_002_quota_ledger),
+    Migration(3, "concurrency limits", _migration_003_concurrency_limits),
+    Migration(4, "sync tables", _migration_004_sync_tables),
+]
+
+
+# Pooled connections to the user DB; migrations are applied on first use
+_storage = open_storage(DATABASE_URL, _sqlite_path, MIGRATIONS, row_factory=sqlite3.Row)
+
+
+def _db():
+    """Borrow a connection to the user DB (Postgres or SQLite)."""
+    return _storage.connect()
 
 
-def _sqlite():
-    """Open a SQLite connection with dict-like rows."""
-    conn = sqlite3.connect(_sqlite_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+@lru_cache(maxsize=1)
+def get_quota_ledger():
+    """
+    Quota ledger in the user DB, shared by every worker and user.
+
+    Dashboard reads of what's left are cached for a few seconds; reservations
+    always go to the database.
+    """
+    return QuotaLedger(_db, _storage.dialect, DAILY_SUBMISSION_LIMIT, cache_seconds=5)
+
+
+def get_concurrency_store():
+    """Saved inspection concurrency per property, in the user DB."""
+    return ConcurrencyStore(_db, _storage.dialect)
+
+
+def save_url_statuses(site_url, statuses):
+    """
+    Record the latest status per URL in url_status, in one transaction of
+    batched statements. Written before the response returns: a serverless
+    instance may be frozen or recycled right after, so nothing is left queued.
+    """
+    p = _storage.p
+    rows = [(site_url, url, status, datetime.now().isoformat()) for url, status in statuses]
+    if not rows:
+        return
+    with _storage.transaction() as cur:
+        _storage.executemany(cur, f"""
+            INSERT INTO url_status (site_url, url, status, checked_at)
+            VALUES ({p}, {p}, {p}, {p})
+            ON CONFLICT (site_url, url) DO UPDATE SET
+                status = excluded.status, checked_at = excluded.checked_at
+        """, rows)
 
 
 def init_db():
-    if DATABASE_URL:
-        conn = _pg()
-        try:
-            with conn.cursor() as cur:
-                cur.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        id SERIAL PRIMARY KEY,
-                        email TEXT UNIQUE NOT NULL,
-                        name TEXT,
-                        password_hash TEXT,
-                        gsc_credentials TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-            conn.commit()
-        finally:
-            conn.close()
-    else:
-        conn = _sqlite()
-        try:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    email TEXT UNIQUE NOT NULL,
-                    name TEXT,
-                    password_hash TEXT,
-                    gsc_credentials TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.commit()
-        finally:
-            conn.close()
+    """
+    Apply pending user DB migrations (a single version check when current).
+
+    Returns the migration versions applied.
+    """
+    return _storage.migrate()
 
 
 def get_user_by_email(email):
-    if DATABASE_URL:
-        conn = _pg()
-        try:
-            with conn.cursor() as cur:
-                cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-                return cur.fetchone()
-        finally:
-            conn.close()
-    else:
-        conn = _sqlite()
-        try:
-            return conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-        finally:
-            conn.close()
+    return _storage.fetchone(f'SELECT * FROM users WHERE email = {_storage.p}', (email,))
 
 
 def get_or_create_user(email, name=None):
-    if DATABASE_URL:
-        conn = _pg()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    'INSERT INTO users (email, name) VALUES (%s, %s) ON CONFLICT (email) DO NOTHING',
-                    (email, name)
-                )
-                conn.commit()
-                cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-                return cur.fetchone()
-        finally:
-            conn.close()
-    else:
-        conn = _sqlite()
-        try:
-            row = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-            if not row:
-                conn.execute('INSERT INTO users (email, name) VALUES (?, ?)', (email, name))
-                conn.commit()
-                row = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-            return row
-        finally:
-            conn.close()
+    p = _storage.p
+    with _storage.transaction() as cur:
+        cur.execute(
+            f'INSERT INTO users (email, name) VALUES ({p}, {p}) ON CONFLICT (email) DO NOTHING',
+            (email, name)
+        )
+        cur.execute(f'SELECT * FROM users WHERE email = {p}', (email,))
+        return cur.fetchone()
 
 
 def _db_insert_user(email, name, password_hash):
     """Insert a new email/password user."""
-    if DATABASE_URL:
-        conn = _pg()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    'INSERT INTO users (email, name, password_hash) VALUES (%s, %s, %s)',
-                    (email, name, password_hash)
-                )
-            conn.commit()
-        finally:
-            conn.close()
-    else:
-        conn = _sqlite()
-        try:
-            conn.execute(
-                'INSERT INTO users (email, name, password_hash) VALUES (?, ?, ?)',
-                (email, name, password_hash)
-            )
-            conn.commit()
-        finally:
-            conn.close()
+    p = _storage.p
+    with _storage.transaction() as cur:
+        cur.execute(
+            f'INSERT INTO users (email, name, password_hash) VALUES ({p}, {p}, {p})',
+            (email, name, password_hash)
+        )
 
 
 def _db_save_gsc_credentials(email, credentials_json):
     """Persist GSC credentials for an email user."""
-    if DATABASE_URL:
-        conn = _pg()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    'UPDATE users SET gsc_credentials = %s WHERE email = %s',
-                    (credentials_json, email)
-                )
-            conn.commit()
-        finally:
-            conn.close()
-    else:
-        conn = _sqlite()
-        try:
-            conn.execute(
-                'UPDATE users SET gsc_credentials = ? WHERE email = ?',
-                (credentials_json, email)
-            )
-            conn.commit()
-        finally:
-            conn.close()
-
+    p = _storage.p
+    with _storage.transaction() as cur:
+        cur.execute(
+            f'UPDATE users SET gsc_credentials = {p} WHERE email = {p}',
+            (credentials_json, email)
+        )
 
-try:
-    init_db()
-except Exception as _db_init_err:
-    print(f"Warning: could not initialise user DB: {_db_init_err}")
 
 # Get application root for subpath deployment (Vercel/Render)
 APPLICATION_ROOT = os.environ.get('APPLICATION_ROOT', '/')
@@ -243,53 +222,32 @@ SCOPES = [
 user_data = {}
 
 
-def get_flow():
-    """Create OAuth flow from environment variable or file."""
-    from flask import request
-    import tempfile
-    
-    # Construct redirect URI from request if not set in environment
-    redirect_uri = REDIRECT_URI
-    if not redirect_uri or redirect_uri == 'http://localhost:5000/oauth/callback':
-        # Try to construct from request
-        if request and request.host:
-            scheme = request.scheme if hasattr(request, 'scheme') else 'https'
-            host = request.host
-            redirect_uri = f"{scheme}://{host}/oauth/callback"
-    
+_client_config_snapshot = None
+
+
+def get_client_config():
+    """
+    Get the OAuth client config, parsed and validated once per process.
+
+    Reads CLIENT_CONFIG (environment) or CLIENT_SECRETS_FILE (local dev).
+    Failures are not cached, so fixing the config takes effect without a
+    restart.
+    """
+    global _client_config_snapshot
+    if _client_config_snapshot is not None:
+        return _client_config_snapshot
+
     if CLIENT_CONFIG:
-        # Use config from environment variable
-        # Flow.from_client_secrets_file requires a file, so write to temp file
-        try:
-            # Validate CLIENT_CONFIG structure
-            if not isinstance(CLIENT_CONFIG, dict):
-                raise ValueError(f"CLIENT_CONFIG must be a dict, got {type(CLIENT_CONFIG)}")
-            if 'web' not in CLIENT_CONFIG:
-                raise ValueError("CLIENT_CONFIG missing 'web' key. Expected format: {'web': {...}}")
-            if 'client_id' not in CLIENT_CONFIG['web']:
-                raise ValueError("CLIENT_CONFIG missing 'client_id' in 'web' key")
-            if 'client_secret' not in CLIENT_CONFIG['web']:
-                raise ValueError("CLIENT_CONFIG missing 'client_secret' in 'web' key")
-            
-            # Write config to temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                json.dump(CLIENT_CONFIG, f)
-                temp_file = f.name
-            
-            try:
-                return Flow.from_client_secrets_file(
-                    temp_file,
-                    scopes=SCOPES,
-                    redirect_uri=redirect_uri
-                )
-            finally:
-                # Clean up temp file (though it will be deleted when process ends)
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass
-        except Exception as e:
-            raise ValueError(f"Failed to create OAuth flow from CLIENT_CONFIG: {str(e)}") from e
+        # Validate CLIENT_CONFIG structure
+        if not isinstance(CLIENT_CONFIG, dict):
+            raise ValueError(f"CLIENT_CONFIG must be a dict, got {type(CLIENT_CONFIG)}")
+        if 'web' not in CLIENT_CONFIG:
+            raise ValueError("CLIENT_CONFIG missing 'web' key. Expected format: {'web': {...}}")
+        if 'client_id' not in CLIENT_CONFIG['web']:
+            raise ValueError("CLIENT_CONFIG missing 'client_id' in 'web' key")
+        if 'client_secret' not in CLIENT_CONFIG['web']:
+            raise ValueError("CLIENT_CONFIG missing 'client_secret' in 'web' key")
+        config = CLIENT_CONFIG
     else:
         # Use config from file (local development)
         if not CLIENT_SECRETS_FILE or not os.path.exists(CLIENT_SECRETS_FILE):
@@ -298,11 +256,84 @@ def get_flow():
                 f"Please set GOOGLE_CLIENT_SECRET environment variable in Render or create client_secret.json for local development.\n"
                 f"GOOGLE_CLIENT_SECRET_ENV is set: {GOOGLE_CLIENT_SECRET_ENV is not None}"
             )
-        return Flow.from_client_secrets_file(
-            CLIENT_SECRETS_FILE,
-            scopes=SCOPES,
-            redirect_uri=redirect_uri
-        )
+        with open(CLIENT_SECRETS_FILE) as f:
+            config = json.load(f)
+
+    _client_config_snapshot = config
+    return config
+
+
+# Validate an environment-provided config at startup (in-memory, no I/O);
+# a bad config is reported again when a login is attempted.
+if CLIENT_CONFIG:
+    try:
+        get_client_config()
+    except ValueError as _config_err:
+        print(f"Warning: invalid OAuth client config: {_config_err}")
+
+
+@lru_cache(maxsize=64)
+def _redirect_uri_for(scheme, host):
+    """Redirect URI for a request host, memoized per (scheme, host)."""
+    redirect_uri = REDIRECT_URI
+    if not redirect_uri or redirect_uri == 'http://localhost:5000/oauth/callback':
+        # Construct from the request host when not set in environment
+        if host:
+            redirect_uri = f"{scheme or 'https'}://{host}/oauth/callback"
+    return redirect_uri
+
+
+def get_flow():
+    """
+    Create an OAuth flow for the current request.
+
+    Flow objects carry per-login state (OAuth state, PKCE verifier), so one
+    is built per request. Building one needs no disk I/O: it comes from
+    the in-memory client config snapshot.
+    """
+    from flask import request
+    from google_auth_oauthlib.flow import Flow
+    
+    redirect_uri = _redirect_uri_for(
+        request.scheme if request else None,
+        request.host if request else None
+    )
+    
+    try:
+        client_config = get_client_config()
+    except ValueError as e:
+        raise ValueError(f"Failed to create OAuth flow from CLIENT_CONFIG: {str(e)}") from e
+    
+    return Flow.from_client_config(
+        client_config,
+        scopes=SCOPES,
+        redirect_uri=redirect_uri
+    )
+
+
+def _quota_project():
+    """GCP project that user-authorized calls count against."""
+    try:
+        config = get_client_config()
+    except Exception:
+        return 'default'
+    client = config.get('web') or config.get('installed') or {}
+    return client.get('project_id') or client.get('client_id') or 'default'
+
+
+def get_quota_scope():
+    """
+    Indexing quota scope for user-authorized calls.
+
+    Calls made with users' OAuth tokens count against the OAuth client's GCP
+    project, so every user shares one publish quota.
+    """
+    return indexing_scope(_quota_project())
+
+
+def get_inspection_scope(site_url):
+    """URL Inspection quota scope (OAuth client's project and the property)."""
+    return inspection_scope(_quota_project(), site_url)
 
 
 def credentials_to_dict(credentials):
@@ -326,6 +357,7 @@ def get_user_credentials():
                 session['credentials'] = json.loads(user['gsc_credentials'])
         if 'credentials' not in session:
             return None
+    from google.oauth2.credentials import Credentials
     return Credentials(**session['credentials'])
 
 
@@ -464,6 +496,7 @@ def register_post():
     if existing:
         return render_template("register.html", error="An account with this email already exists.", name=name, email=email)
 
+    from werkzeug.security import generate_password_hash
     password_hash = generate_password_hash(password)
     _db_insert_user(email, name or email, password_hash)
 
@@ -484,6 +517,7 @@ def email_login():
     user = get_user_by_email(email)
     if not user or not user['password_hash']:
         return render_template("login.html", error="Invalid email or password.")
+    from werkzeug.security import check_password_hash
     if not check_password_hash(user['password_hash'], password):
         return render_template("login.html", error="Invalid email or password.")
 
@@ -552,6 +586,7 @@ def oauth_callback():
 
     # Normal Google login: get user info and set session
     try:
+        from googleapiclient.discovery import build
         service = build('oauth2', 'v2', credentials=credentials)
         user_info = service.userinfo().get().execute()
         google_email = user_info.get('email')
@@ -588,12 +623,16 @@ def api_user():
 @app.route("/api/sites")
 def api_sites():
     """List all GSC sites the user has access to."""
+    from googleapiclient.discovery import build
+    from googleapiclient.errors import HttpError
+    
     credentials = get_user_credentials()
     if not credentials:
         return jsonify({'error': 'Not logged in'}), 401
     
     try:
-        service = build('searchconsole', 'v1', credentials=credentials)
+        service = build('searchconsole', 'v1', credentials=credentials,
+                        client_options={'api_endpoint': GSC_API_ENDPOINT})
         sites = service.sites().list().execute()
         return jsonify(sites.get('siteEntry', []))
     except HttpError as e:
@@ -618,6 +657,13 @@ def api_select_site():
     return jsonify({'success': True})
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Timing histograms and counters in Prometheus text format."""
+    from metrics import render_prometheus
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/api/stats")
 def api_stats():
     """Get stats for selected site."""
@@ -635,16 +681,82 @@ def api_stats():
         'indexed': 0,
         'pending': 0,
         'unindexed': 0,
-        'today_submissions': 0,
-        'today_limit': 200
+        'today_submissions': DAILY_SUBMISSION_LIMIT - get_quota_ledger().remaining(get_quota_scope()),
+        'today_limit': DAILY_SUBMISSION_LIMIT
     })
 
 
+def list_gsc_sitemaps(credentials, site_url):
+    """Sitemaps submitted to Search Console for a property (sitemaps().list() entries)."""
+    from googleapiclient.discovery import build
+    
+    service = build('searchconsole', 'v1', credentials=credentials,
+                    client_options={'api_endpoint': GSC_API_ENDPOINT})
+    return service.sitemaps().list(siteUrl=site_url).execute().get('sitemap', [])
+
+
+def inspect_urls(urls, token, site_url, limiter=None):
+    """
+    Inspect URLs concurrently with the URL Inspection REST API.
+    
+    Args:
+        urls: Iterable of URLs (e.g. a CompactUrlList)
+        token: OAuth access token
+        site_url: Search Console property
+        limiter: concurrency.AdaptiveLimiter setting how many requests are
+            in flight; adjusted as responses come back (default: a new one)
+    
+    Returns:
+        ScanResultStore with one result per URL
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+    import requests as req_lib
+    from concurrency import AdaptiveLimiter, adaptive_map
+    from scan_store import ScanResultStore
+    from metrics import INSPECT_ERRORS, INSPECT_SECONDS
+    
+    inspect_endpoint = GSC_API_ENDPOINT.rstrip('/') + '/v1/urlInspection/index:inspect'
+    limiter = limiter or AdaptiveLimiter()
+    
+    def check_url(url):
+        """Returns (url, status, indexed, error)."""
+        started = time.perf_counter()
+        try:
+            with INSPECT_SECONDS.time():
+                resp = req_lib.post(
+                    inspect_endpoint,
+                    headers={'Authorization': f'Bearer {token}'},
+                    json={'inspectionUrl': url, 'siteUrl': site_url},
+                    timeout=20
+                )
+            limiter.record(time.perf_counter() - started,
+                           throttled=resp.status_code == 429 or resp.status_code >= 500)
+            if resp.status_code != 200:
+                INSPECT_ERRORS.inc()
+                return url, 'error', False, True
+            coverage = resp.json().get('inspectionResult', {}).get('indexStatusResult', {}).get('coverageState', 'Unknown')
+            is_indexed = 'indexed' in coverage.lower() and 'not' not in coverage.lower()
+            return url, 'indexed' if is_indexed else coverage, is_indexed, False
+        except req_lib.RequestException:
+            # Timeouts and dropped connections are overload too
+            limiter.record(time.perf_counter() - started, throttled=True)
+            INSPECT_ERRORS.inc()
+            return url, 'error', False, True
+        except Exception:
+            INSPECT_ERRORS.inc()
+            return url, 'error', False, True
+    
+    store = ScanResultStore()
+    with ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
+        for result in adaptive_map(executor, check_url, urls, limiter):
+            store.add(*result)
+    return store
+
+
 @app.route("/api/scan", methods=["POST"])
 def api_scan():
     """Scan sitemap and check indexing status concurrently."""
-    from concurrent.futures import ThreadPoolExecutor
-    import requests as req_lib
     import google.auth.transport.requests as google_transport
 
     try:
@@ -658,46 +770,43 @@ def api_scan():
         site = session['selected_site']
         site_url = site['site_url']
 
-        from sitemap_parser import get_all_urls
-        urls = get_all_urls(site['sitemap_url'])
+        from sitemap_parser import discover_sitemaps, get_all_urls
+        from scan_store import CompactUrlList
+        sitemaps = [site['sitemap_url']]
+        if SITEMAP_DISCOVERY:
+            # Plus robots.txt and Search Console sitemaps, fetched concurrently
+            sitemaps = discover_sitemaps(site_url, site['sitemap_url'],
+                                         lambda: list_gsc_sitemaps(credentials, site_url))
+        urls = get_all_urls(sitemaps, urls=CompactUrlList())
 
         # Ensure we have a fresh access token before spawning threads
         try:
             credentials.refresh(google_transport.Request())
         except Exception:
             pass
-        token = credentials.token
 
-        def check_url(url):
-            try:
-                resp = req_lib.post(
-                    'https://searchconsole.googleapis.com/v1/urlInspection/index:inspect',
-                    headers={'Authorization': f'Bearer {token}'},
-                    json={'inspectionUrl': url, 'siteUrl': site_url},
-                    timeout=20
-                )
-                if resp.status_code != 200:
-                    return {'url': url, 'status': 'error', 'indexed': False, '_err': True}
-                coverage = resp.json().get('inspectionResult', {}).get('indexStatusResult', {}).get('coverageState', 'Unknown')
-                is_indexed = 'indexed' in coverage.lower() and 'not' not in coverage.lower()
-                return {'url': url, 'status': 'indexed' if is_indexed else coverage, 'indexed': is_indexed, '_err': False}
-            except Exception:
-                return {'url': url, 'status': 'error', 'indexed': False, '_err': True}
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            url_results = list(executor.map(check_url, urls))
-
-        results = {'total': len(urls), 'indexed': 0, 'not_indexed': 0, 'errors': 0, 'urls': []}
-        for r in url_results:
-            results['urls'].append({'url': r['url'], 'status': r['status'], 'indexed': r['indexed']})
-            if r['_err']:
-                results['errors'] += 1
-            elif r['indexed']:
-                results['indexed'] += 1
-            else:
-                results['not_indexed'] += 1
-
-        return jsonify(results)
+        # Start where the last scan of this property left off
+        from concurrency import AdaptiveLimiter, DEFAULT_CONCURRENCY
+        scope = get_inspection_scope(site_url)
+        concurrency_store = get_concurrency_store()
+        limiter = AdaptiveLimiter(concurrency_store.get(scope) or DEFAULT_CONCURRENCY)
+        store = inspect_urls(urls, credentials.token, site_url, limiter)
+        concurrency_store.save(scope, limiter)
+
+        save_url_statuses(site_url, ((r.url, r.status) for r in store if not r.error))
+
+        def generate():
+            # Stream the response so the full result list never exists as dicts
+            yield json.dumps({
+                'total': len(urls),
+                'indexed': store.indexed,
+                'not_indexed': store.not_indexed,
+                'errors': store.errors,
+            })[:-1] + ', "urls": '
+            yield from store.iter_json()
+            yield '}'
+
+        return Response(generate(), mimetype='application/json')
 
     except Exception as e:
         import traceback
@@ -709,6 +818,10 @@ def api_scan():
 @app.route("/api/submit", methods=["POST"])
 def api_submit():
     """Submit URLs for indexing."""
+    from googleapiclient.discovery import build
+    from googleapiclient.errors import HttpError
+    from metrics import SUBMIT_ERRORS, SUBMIT_SECONDS
+    
     credentials = get_user_credentials()
     if not credentials:
         return jsonify({'error': 'Not logged in'}), 401
@@ -722,23 +835,35 @@ def api_submit():
     results = {
         'submitted': 0,
         'failed': 0,
+        'skipped': 0,
         'errors': []
     }
     
+    # Atomically claim quota shared with every other worker and user
+    reservation = get_quota_ledger().reserve(get_quota_scope(), len(urls))
+    results['skipped'] = len(urls) - reservation.granted
+    
+    attempted = 0
     try:
-        service = build('indexing', 'v3', credentials=credentials)
+        service = build('indexing', 'v3', credentials=credentials,
+                        client_options={'api_endpoint': INDEXING_API_ENDPOINT})
         
-        for url in urls[:200]:  # Respect daily limit
+        for url in urls[:reservation.granted]:
+            attempted += 1
             try:
-                service.urlNotifications().publish(
-                    body={'url': url, 'type': 'URL_UPDATED'}
-                ).execute()
+                with SUBMIT_SECONDS.time():
+                    service.urlNotifications().publish(
+                        body={'url': url, 'type': 'URL_UPDATED'}
+                    ).execute()
                 results['submitted'] += 1
             except HttpError as e:
+                SUBMIT_ERRORS.inc()
                 results['failed'] += 1
                 results['errors'].append({'url': url, 'error': str(e)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        reservation.commit(attempted)
     
     return jsonify(results)
 
@@ -2,17 +2,29 @@
 AutoGSC SaaS - Multi-User Application
 Supports multiple users with OAuth login and per-user sites.
 """
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, session
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import logging
 import sqlite3
 import os
 import secrets
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from config import (DAILY_SUBMISSION_LIMIT, GSC_API_ENDPOINT, INDEXING_API_ENDPOINT, SITEMAP_DISCOVERY,
+                    SUBMISSION_RETENTION_DAYS)
+from migrations import Migration, create_index, POSTGRES
+from quota import QuotaLedger, create_quota_tables, indexing_scope
+from storage import open_storage
+from url_dict import build_url_map, create_url_dict_tables, url_id, url_ids
+from metrics import (INSPECT_ERRORS, INSPECT_SECONDS, SUBMIT_ERRORS, SUBMIT_SECONDS,
+                     db_write_seconds, render_prometheus)
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 
 # Allow HTTP for local dev
@@ -29,38 +41,54 @@ SCOPES = [
 
 DATABASE = os.path.join(os.path.dirname(__file__), "autogsc_saas.db")
 
+# Postgres for the SaaS database (SQLite file DATABASE when unset)
+SAAS_DATABASE_URL = os.environ.get('SAAS_DATABASE_URL')
+
+# Postgres layout: urls hash-partitioned by site, submissions by month
+URL_PARTITIONS = 16
+SUBMISSION_PARTITIONS_AHEAD = 2
+
+# Advisory lock held by maintain_db() on Postgres
+MAINTENANCE_LOCK = 0x61677363
+
 
 # ============== Database ==============
 
 def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection; migrations are applied on first use."""
+    return _storage.connect()
 
 
-def init_db():
-    conn = get_db()
-    conn.executescript('''
+def _now():
+    """UTC 'YYYY-MM-DD HH:MM:SS', the format SQLite's datetime('now') stores."""
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _migration_001_base_tables(cur, dialect):
+    id_column = 'id SERIAL PRIMARY KEY' if dialect == POSTGRES else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    cur.execute(f'''
         CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {id_column},
             email TEXT UNIQUE NOT NULL,
             name TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             credentials TEXT
-        );
-        
+        )
+    ''')
+    cur.execute(f'''
         CREATE TABLE IF NOT EXISTS sites (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {id_column},
             user_id INTEGER NOT NULL,
             site_url TEXT NOT NULL,
             sitemap_url TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id),
             UNIQUE(user_id, site_url)
-        );
-        
+        )
+    ''')
+    cur.execute(f'''
         CREATE TABLE IF NOT EXISTS urls (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {id_column},
             site_id INTEGER NOT NULL,
             url TEXT NOT NULL,
             indexing_status TEXT,
@@ -68,118 +96,485 @@ def init_db():
             last_submitted TIMESTAMP,
             FOREIGN KEY (site_id) REFERENCES sites(id),
             UNIQUE(site_id, url)
-        );
-        
+        )
+    ''')
+    cur.execute(f'''
         CREATE TABLE IF NOT EXISTS submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {id_column},
             site_id INTEGER NOT NULL,
             url TEXT NOT NULL,
             submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             result TEXT,
             FOREIGN KEY (site_id) REFERENCES sites(id)
-        );
+        )
     ''')
-    conn.commit()
-    conn.close()
 
 
-init_db()
+def _migration_002_site_stats(cur, dialect):
+    # Per-site URL counts by status, maintained alongside urls writes
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS site_status_counts (
+            site_id INTEGER NOT NULL,
+            indexing_status TEXT NOT NULL,
+            url_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (site_id, indexing_status)
+        )
+    ''')
+    create_index(cur, dialect, 'idx_urls_site_submitted', 'urls',
+                 'site_id, last_submitted, indexing_status')
+    create_index(cur, dialect, 'idx_submissions_site_time', 'submissions',
+                 'site_id, submitted_at')
+    
+    # Backfill for databases created before the counters existed
+    cur.execute('SELECT 1 FROM site_status_counts LIMIT 1')
+    if cur.fetchone() is None:
+        cur.execute('''
+            INSERT INTO site_status_counts (site_id, indexing_status, url_count)
+            SELECT site_id, indexing_status, COUNT(*) FROM urls
+            WHERE indexing_status IS NOT NULL
+            GROUP BY site_id, indexing_status
+        ''')
+
+
+def _migration_003_quota_ledger(cur, dialect):
+    create_quota_tables(cur, dialect)
+
+
+def _migration_004_tenant_layout(cur, dialect):
+    # Old submissions are rolled up here per site and day (archive_submissions)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS submission_archive (
+            site_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            succeeded INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (site_id, day)
+        )
+    ''')
+    if dialect == POSTGRES:
+        _partition_tables(cur)
+    else:
+        create_index(cur, dialect, 'idx_urls_site_status', 'urls', 'site_id, indexing_status')
+        create_index(cur, dialect, 'idx_submissions_time', 'submissions', 'submitted_at')
 
 
-# ============== Helpers ==============
+def _first_value(row):
+    return list(row.values())[0] if isinstance(row, dict) else row[0]
 
-def get_or_create_user(email, name=None, credentials=None):
-    conn = get_db()
-    cursor = conn.cursor()
+
+def _partition_tables(cur):
+    """
+    Rebuild urls and submissions as partitioned tables (Postgres).
     
-    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-    user = cursor.fetchone()
+    urls is hash-partitioned on site_id, so a site's rows and index entries
+    sit in one of URL_PARTITIONS smaller tables. submissions is partitioned
+    by month, so queries on recent submissions only touch recent partitions
+    and archive_submissions() drops whole expired months.
+    """
+    cur.execute('ALTER TABLE urls RENAME TO urls_unpartitioned')
+    cur.execute('ALTER TABLE submissions RENAME TO submissions_unpartitioned')
     
-    if user:
-        if credentials:
-            cursor.execute('UPDATE users SET credentials = ? WHERE id = ?', 
-                          (credentials, user['id']))
-            conn.commit()
+    # Partition keys must be part of every unique constraint
+    cur.execute('''
+        CREATE TABLE urls (
+            id SERIAL,
+            site_id INTEGER NOT NULL REFERENCES sites(id),
+            url TEXT NOT NULL,
+            indexing_status TEXT,
+            last_checked TIMESTAMP,
+            last_submitted TIMESTAMP,
+            PRIMARY KEY (site_id, id),
+            UNIQUE (site_id, url)
+        ) PARTITION BY HASH (site_id)
+    ''')
+    for i in range(URL_PARTITIONS):
+        cur.execute(f'''
+            CREATE TABLE urls_p{i:02d} PARTITION OF urls
+            FOR VALUES WITH (MODULUS {URL_PARTITIONS}, REMAINDER {i})
+        ''')
+    cur.execute('''
+        CREATE TABLE submissions (
+            id SERIAL,
+            site_id INTEGER NOT NULL REFERENCES sites(id),
+            url TEXT NOT NULL,
+            submitted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            result TEXT,
+            PRIMARY KEY (id, submitted_at)
+        ) PARTITION BY RANGE (submitted_at)
+    ''')
+    # Catches rows outside the monthly partitions; normally stays empty
+    cur.execute('CREATE TABLE submissions_default PARTITION OF submissions DEFAULT')
+    cur.execute('SELECT MIN(submitted_at) AS oldest FROM submissions_unpartitioned')
+    oldest = _first_value(cur.fetchone())
+    ensure_submission_partitions(cur, oldest or datetime.utcnow())
+    
+    cur.execute('''
+        INSERT INTO urls (id, site_id, url, indexing_status, last_checked, last_submitted)
+        SELECT id, site_id, url, indexing_status, last_checked, last_submitted
+        FROM urls_unpartitioned
+    ''')
+    cur.execute('''
+        INSERT INTO submissions (id, site_id, url, submitted_at, result)
+        SELECT id, site_id, url, COALESCE(submitted_at, CURRENT_TIMESTAMP), result
+        FROM submissions_unpartitioned
+    ''')
+    # Also drops their indexes, freeing the names for the new tables
+    cur.execute('DROP TABLE urls_unpartitioned')
+    cur.execute('DROP TABLE submissions_unpartitioned')
+    for table in ('urls', 'submissions'):
+        cur.execute(f'''
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false)
+            FROM {table}
+        ''')
+    
+    # Created on the parent, so every partition gets them
+    cur.execute('CREATE INDEX idx_urls_site_status ON urls (site_id, indexing_status)')
+    cur.execute('CREATE INDEX idx_urls_site_submitted ON urls (site_id, last_submitted, indexing_status)')
+    cur.execute('CREATE INDEX idx_submissions_site_time ON submissions (site_id, submitted_at)')
+
+
+def _month_start(value, months=0):
+    """First day of the month `months` after the month of `value`."""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def ensure_submission_partitions(cur, start):
+    """
+    Create monthly submissions partitions (Postgres) from the month of
+    `start` through SUBMISSION_PARTITIONS_AHEAD months from now.
+    """
+    month = _month_start(start)
+    last = _month_start(datetime.utcnow(), SUBMISSION_PARTITIONS_AHEAD)
+    while month <= last:
+        following = _month_start(month, 1)
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS submissions_{month:%Y_%m} PARTITION OF submissions
+            FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')
+        ''')
+        month = following
+
+
+def _rename_partitioned(cur, table, new_name):
+    """Rename a partitioned table and its partitions (urls_p00 -> urls_by_text_p00)."""
+    cur.execute(f'''
+        SELECT c.relname AS name FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = '{table}'::regclass
+    ''')
+    for name in [row['name'] for row in cur.fetchall()]:
+        cur.execute(f'ALTER TABLE {name} RENAME TO {new_name}{name[len(table):]}')
+    cur.execute(f'ALTER TABLE {table} RENAME TO {new_name}')
+
+
+def _migration_005_url_dictionary(cur, dialect):
+    """
+    URL strings moved to url_dict (see url_dict.py); urls is keyed by
+    (site_id, url_id) and submissions reference url_id.
+    """
+    create_url_dict_tables(cur, dialect)
+    build_url_map(cur, dialect, 'SELECT url FROM urls UNION SELECT url FROM submissions')
+    
+    # The new tables take over the old index names
+    for index in ('idx_urls_site_status', 'idx_urls_site_submitted',
+                  'idx_submissions_site_time', 'idx_submissions_time'):
+        cur.execute(f'DROP INDEX IF EXISTS {index}')
+    if dialect == POSTGRES:
+        _rename_partitioned(cur, 'urls', 'urls_by_text')
+        _rename_partitioned(cur, 'submissions', 'submissions_by_text')
+        id_type = 'BIGINT'
+        urls_layout = 'PARTITION BY HASH (site_id)'
+        submissions_id = 'id SERIAL'
+        submissions_key = ', PRIMARY KEY (id, submitted_at)'
+        submissions_layout = 'PARTITION BY RANGE (submitted_at)'
     else:
-        cursor.execute('INSERT INTO users (email, name, credentials) VALUES (?, ?, ?)',
-                      (email, name, credentials))
-        conn.commit()
-        cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-        user = cursor.fetchone()
-    
-    conn.close()
-    return dict(user)
+        cur.execute('ALTER TABLE urls RENAME TO urls_by_text')
+        cur.execute('ALTER TABLE submissions RENAME TO submissions_by_text')
+        id_type = 'INTEGER'
+        # Clustered on (site_id, url_id): one B-tree, no rowid index beside it
+        urls_layout = 'WITHOUT ROWID'
+        submissions_id = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+        submissions_key = submissions_layout = ''
+    
+    cur.execute(f'''
+        CREATE TABLE urls (
+            site_id INTEGER NOT NULL REFERENCES sites(id),
+            url_id {id_type} NOT NULL,
+            indexing_status TEXT,
+            last_checked TIMESTAMP,
+            last_submitted TIMESTAMP,
+            PRIMARY KEY (site_id, url_id)
+        ) {urls_layout}
+    ''')
+    cur.execute(f'''
+        CREATE TABLE submissions (
+            {submissions_id},
+            site_id INTEGER NOT NULL REFERENCES sites(id),
+            url_id {id_type} NOT NULL,
+            submitted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            result TEXT{submissions_key}
+        ) {submissions_layout}
+    ''')
+    if dialect == POSTGRES:
+        for i in range(URL_PARTITIONS):
+            cur.execute(f'''
+                CREATE TABLE urls_p{i:02d} PARTITION OF urls
+                FOR VALUES WITH (MODULUS {URL_PARTITIONS}, REMAINDER {i})
+            ''')
+        cur.execute('CREATE TABLE submissions_default PARTITION OF submissions DEFAULT')
+        cur.execute('SELECT MIN(submitted_at) AS oldest FROM submissions_by_text')
+        ensure_submission_partitions(cur, _first_value(cur.fetchone()) or datetime.utcnow())
+    
+    cur.execute('''
+        INSERT INTO urls (site_id, url_id, indexing_status, last_checked, last_submitted)
+        SELECT u.site_id, m.id, u.indexing_status, u.last_checked, u.last_submitted
+        FROM urls_by_text u JOIN url_map m ON m.url = u.url
+    ''')
+    cur.execute('''
+        INSERT INTO submissions (id, site_id, url_id, submitted_at, result)
+        SELECT s.id, s.site_id, m.id, COALESCE(s.submitted_at, CURRENT_TIMESTAMP), s.result
+        FROM submissions_by_text s JOIN url_map m ON m.url = s.url
+    ''')
+    cur.execute('DROP TABLE urls_by_text')
+    cur.execute('DROP TABLE submissions_by_text')
+    cur.execute('DROP TABLE url_map')
+    if dialect == POSTGRES:
+        cur.execute('''
+            SELECT setval(pg_get_serial_sequence('submissions', 'id'), COALESCE(MAX(id), 0) + 1, false)
+            FROM submissions
+        ''')
+    
+    cur.execute('CREATE INDEX idx_urls_site_status ON urls (site_id, indexing_status)')
+    cur.execute('CREATE INDEX idx_urls_site_submitted ON urls (site_id, last_submitted, indexing_status)')
+    cur.execute('CREATE INDEX idx_submissions_site_time ON submissions (site_id, submitted_at)')
+    if dialect != POSTGRES:
+        cur.execute('CREATE INDEX idx_submissions_time ON submissions (submitted_at)')
+
+
+# Append new migrations; never edit or reorder applied ones.
+MIGRATIONS = [
+    Migration(1, "base tables", _migration_001_base_tables),
+    # concurrent: create_index builds online on Postgres (no-op on SQLite)
+    Migration(2, "site stats counters", _migration_002_site_stats, concurrent=True),
+    Migration(3, "quota ledger", _migration_003_quota_ledger),
+    Migration(4, "multi-tenant layout", _migration_004_tenant_layout),
+    Migration(5, "url dictionary", _migration_005_url_dictionary),
+]
+
+_storage = open_storage(SAAS_DATABASE_URL, DATABASE, MIGRATIONS, row_factory=sqlite3.Row)
+
+
+def init_db():
+    return _storage.migrate()
+
+
+# ============== Helpers ==============
+
+def get_or_create_user(email, name=None, credentials=None):
+    p = _storage.p
+    with _storage.transaction() as cursor:
+        # New users are inserted; existing ones get fresh credentials if given
+        cursor.execute(f'''
+            INSERT INTO users (email, name, credentials) VALUES ({p}, {p}, {p})
+            ON CONFLICT (email) DO UPDATE SET
+                credentials = COALESCE(excluded.credentials, users.credentials)
+        ''', (email, name, credentials))
+        cursor.execute(f'SELECT * FROM users WHERE email = {p}', (email,))
+        return dict(cursor.fetchone())
 
 
 def get_user_sites(user_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM sites WHERE user_id = ?', (user_id,))
-    sites = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return sites
+    rows = _storage.fetchall(f'SELECT * FROM sites WHERE user_id = {_storage.p}', (user_id,))
+    return [dict(row) for row in rows]
 
 
 def add_user_site(user_id, site_url, sitemap_url=None):
-    conn = get_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            'INSERT INTO sites (user_id, site_url, sitemap_url) VALUES (?, ?, ?)',
-            (user_id, site_url, sitemap_url)
-        )
-        conn.commit()
-        site_id = cursor.lastrowid
-    except sqlite3.IntegrityError:
+    p = _storage.p
+    with _storage.transaction() as cursor:
+        cursor.execute(f'''
+            INSERT INTO sites (user_id, site_url, sitemap_url) VALUES ({p}, {p}, {p})
+            ON CONFLICT (user_id, site_url) DO NOTHING
+        ''', (user_id, site_url, sitemap_url))
         cursor.execute(
-            'SELECT id FROM sites WHERE user_id = ? AND site_url = ?',
+            f'SELECT id FROM sites WHERE user_id = {p} AND site_url = {p}',
             (user_id, site_url)
         )
-        site_id = cursor.fetchone()['id']
-    conn.close()
-    return site_id
+        return cursor.fetchone()['id']
+
+
+def _upsert_site_url(cursor, site_id, url, status, now):
+    """Upsert a URL's status and keep site_status_counts in step."""
+    p = _storage.p
+    site_url_id = url_id(cursor, url, _storage.dialect)
+    # Runs once per scanned URL, so these are prepared statements
+    _storage.prepared(
+        cursor, f'SELECT indexing_status FROM urls WHERE site_id = {p} AND url_id = {p}',
+        (site_id, site_url_id)
+    )
+    row = cursor.fetchone()
+    current = row['indexing_status'] if row else None
+    
+    _storage.prepared(cursor, f'''
+        INSERT INTO urls (site_id, url_id, indexing_status, last_checked)
+        VALUES ({p}, {p}, {p}, {p})
+        ON CONFLICT(site_id, url_id) DO UPDATE SET
+            indexing_status = excluded.indexing_status,
+            last_checked = excluded.last_checked
+    ''', (site_id, site_url_id, status, now))
+    
+    if current == status:
+        return
+    if current is not None:
+        _storage.prepared(cursor, f'''
+            UPDATE site_status_counts SET url_count = url_count - 1
+            WHERE site_id = {p} AND indexing_status = {p}
+        ''', (site_id, current))
+    _storage.prepared(cursor, f'''
+        INSERT INTO site_status_counts (site_id, indexing_status, url_count)
+        VALUES ({p}, {p}, 1)
+        ON CONFLICT(site_id, indexing_status) DO UPDATE SET
+            url_count = site_status_counts.url_count + 1
+    ''', (site_id, status))
 
 
 def get_site_stats(site_id):
+    p = _storage.p
     conn = get_db()
     cursor = conn.cursor()
     
     stats = {}
     
-    cursor.execute('SELECT COUNT(*) FROM urls WHERE site_id = ?', (site_id,))
-    stats['total_urls'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM urls WHERE site_id = ? AND indexing_status = 'indexed'", (site_id,))
-    stats['indexed'] = cursor.fetchone()[0]
-    
-    cursor.execute('''
-        SELECT COUNT(*) FROM urls 
-        WHERE site_id = ? 
-        AND indexing_status != 'indexed' 
-        AND last_submitted IS NOT NULL
-        AND datetime(last_submitted) > datetime('now', '-48 hours')
-    ''', (site_id,))
-    stats['pending'] = cursor.fetchone()[0]
-    
-    cursor.execute('''
-        SELECT COUNT(*) FROM urls 
-        WHERE site_id = ? 
+    cursor.execute(
+        f'SELECT indexing_status, url_count FROM site_status_counts WHERE site_id = {p}',
+        (site_id,)
+    )
+    counts = {row['indexing_status']: row['url_count'] for row in cursor.fetchall()}
+    
+    stats['total_urls'] = sum(counts.values())
+    stats['indexed'] = counts.get('indexed', 0)
+    
+    # Timestamps are stored as UTC 'YYYY-MM-DD HH:MM:SS' strings, so compare
+    # them directly (no datetime() wrapper) to let the index do the range scan.
+    cutoff = (datetime.utcnow() - timedelta(hours=48)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute(f'''
+        SELECT COUNT(*) AS n FROM urls 
+        WHERE site_id = {p} 
+        AND last_submitted > {p}
         AND indexing_status != 'indexed'
-        AND (last_submitted IS NULL OR datetime(last_submitted) <= datetime('now', '-48 hours'))
-    ''', (site_id,))
-    stats['unindexed'] = cursor.fetchone()[0]
+    ''', (site_id, cutoff))
+    stats['pending'] = cursor.fetchone()['n']
+    
+    stats['unindexed'] = stats['total_urls'] - stats['indexed'] - stats['pending']
     
     today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) FROM submissions 
-        WHERE site_id = ? AND date(submitted_at) = ?
-    ''', (site_id, today))
-    stats['today_submissions'] = cursor.fetchone()[0]
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    cursor.execute(f'''
+        SELECT COUNT(*) AS n FROM submissions 
+        WHERE site_id = {p} AND submitted_at >= {p} AND submitted_at < {p}
+    ''', (site_id, today, tomorrow))
+    stats['today_submissions'] = cursor.fetchone()['n']
     
     conn.close()
     return stats
 
 
+def archive_submissions(cur, retention_days=SUBMISSION_RETENTION_DAYS):
+    """
+    Roll submissions older than `retention_days` up into submission_archive
+    (per site and day) and delete them. Returns the rows archived.
+    
+    On Postgres whole expired monthly partitions are dropped instead of
+    deleted row by row. Runs in the caller's transaction (see maintain_db).
+    """
+    p = _storage.p
+    # Whole days only, so every archived day is complete
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d 00:00:00')
+    
+    cur.execute(f'SELECT COUNT(*) AS n FROM submissions WHERE submitted_at < {p}', (cutoff,))
+    archived = cur.fetchone()['n']
+    if not archived:
+        return 0
+    
+    day = "to_char(submitted_at, 'YYYY-MM-DD')" if _storage.dialect == POSTGRES else 'substr(submitted_at, 1, 10)'
+    cur.execute(f'''
+        INSERT INTO submission_archive (site_id, day, succeeded, failed)
+        SELECT site_id, {day},
+               SUM(CASE WHEN result = 'success' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN result = 'success' THEN 0 ELSE 1 END)
+        FROM submissions
+        WHERE submitted_at < {p}
+        GROUP BY site_id, {day}
+        ON CONFLICT (site_id, day) DO UPDATE SET
+            succeeded = submission_archive.succeeded + excluded.succeeded,
+            failed = submission_archive.failed + excluded.failed
+    ''', (cutoff,))
+    
+    if _storage.dialect == POSTGRES:
+        cur.execute('''
+            SELECT c.relname AS name FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'submissions'::regclass
+        ''')
+        for name in [row['name'] for row in cur.fetchall()]:
+            if name == 'submissions_default':
+                continue
+            month = datetime.strptime(name, 'submissions_%Y_%m')
+            if _month_start(month, 1).strftime('%Y-%m-%d 00:00:00') <= cutoff:
+                cur.execute(f'DROP TABLE {name}')
+    
+    # What's left: the partial month at the cutoff (and the default partition)
+    cur.execute(f'DELETE FROM submissions WHERE submitted_at < {p}', (cutoff,))
+    return archived
+
+
+_maintained_on = None
+
+
+def maintain_db():
+    """
+    Daily upkeep, run from request handlers at most once a day per process:
+    submission partitions for the coming months (Postgres) and archival of
+    old submissions. Database errors are logged with their traceback, not
+    raised, so the request that ran it still succeeds; anything else is a bug
+    and propagates.
+    """
+    global _maintained_on
+    today = datetime.utcnow().date()
+    if _maintained_on == today:
+        return
+    _maintained_on = today
+    try:
+        with _storage.transaction() as cur:
+            # One maintainer at a time, so no rows are rolled up twice
+            if _storage.dialect == POSTGRES:
+                cur.execute('SELECT pg_advisory_xact_lock(%s)', (MAINTENANCE_LOCK,))
+                ensure_submission_partitions(cur, datetime.utcnow())
+            else:
+                cur.execute('BEGIN IMMEDIATE')
+            archived = archive_submissions(cur)
+        if archived:
+            logger.info("Archived %d submissions older than %d days", archived, SUBMISSION_RETENTION_DAYS)
+    except _storage.Error:
+        logger.warning("Database maintenance failed", exc_info=True)
+
+
+@lru_cache(maxsize=1)
+def get_quota_scope():
+    """Indexing quota scope: user-authorized calls bill the OAuth client's project."""
+    import json
+    try:
+        with open(CLIENT_SECRETS_FILE) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return indexing_scope('default')
+    client = config.get('web') or config.get('installed') or {}
+    return indexing_scope(client.get('project_id') or client.get('client_id') or 'default')
+
+
+def get_quota_ledger():
+    return QuotaLedger(get_db, _storage.dialect, DAILY_SUBMISSION_LIMIT)
+
+
 def oauth_exists():
     return os.path.exists(CLIENT_SECRETS_FILE)
 
@@ -196,11 +591,8 @@ def get_credentials():
     if 'user_id' not in session:
         return None
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT credentials FROM users WHERE id = ?', (session['user_id'],))
-    row = cursor.fetchone()
-    conn.close()
+    row = _storage.fetchone(f'SELECT credentials FROM users WHERE id = {_storage.p}',
+                            (session['user_id'],))
     
     if not row or not row['credentials']:
         return None
@@ -313,7 +705,8 @@ def api_gsc_sites():
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        service = build('searchconsole', 'v1', credentials=credentials)
+        service = build('searchconsole', 'v1', credentials=credentials,
+                        client_options={'api_endpoint': GSC_API_ENDPOINT})
         result = service.sites().list().execute()
         return jsonify(result.get('siteEntry', []))
     except HttpError as e:
@@ -344,43 +737,53 @@ def api_site_stats(site_id):
         return jsonify({'error': 'Not logged in'}), 401
     
     stats = get_site_stats(site_id)
-    stats['today_limit'] = 200
+    stats['today_limit'] = DAILY_SUBMISSION_LIMIT
     return jsonify(stats)
 
 
 @app.route("/api/sites/<int:site_id>/scan", methods=["POST"])
 def api_scan_site(site_id):
     """Scan a site's sitemap and check indexing status."""
-    from sitemap_parser import get_all_urls
+    import json
+    from sitemap_parser import discover_sitemaps, get_all_urls, site_origin
+    from scan_store import CompactUrlList, ScanResultStore
     
     credentials = get_credentials()
     if not credentials:
         return jsonify({'error': 'Not authenticated'}), 401
     
     # Get site info
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM sites WHERE id = ?', (site_id,))
-    site_row = cursor.fetchone()
-    
+    site_row = _storage.fetchone(f'SELECT * FROM sites WHERE id = {_storage.p}', (site_id,))
     if not site_row:
         return jsonify({'error': 'Site not found'}), 404
     
     site = dict(site_row)
     
-    # Get URLs from sitemap
-    urls = get_all_urls(site['sitemap_url'])
-    
-    results = {'total': len(urls), 'indexed': 0, 'not_indexed': 0, 'urls': []}
+    # Get URLs from the site's sitemap, robots.txt and Search Console sitemaps
+    if SITEMAP_DISCOVERY:
+        def list_gsc():
+            service = build('searchconsole', 'v1', credentials=credentials,
+                            client_options={'api_endpoint': GSC_API_ENDPOINT})
+            return service.sitemaps().list(siteUrl=site['site_url']).execute().get('sitemap', [])
+        sitemaps = discover_sitemaps(site['site_url'], site['sitemap_url'], list_gsc)
+    else:
+        sitemaps = [site['sitemap_url'] or site_origin(site['site_url']) + '/sitemap.xml']
+    urls = get_all_urls(sitemaps, urls=CompactUrlList())
+    store = ScanResultStore()
     
+    conn = get_db()
+    cursor = conn.cursor()
+    now = _now()
     try:
-        service = build('searchconsole', 'v1', credentials=credentials)
+        service = build('searchconsole', 'v1', credentials=credentials,
+                        client_options={'api_endpoint': GSC_API_ENDPOINT})
         
         for url in urls:
             try:
-                response = service.urlInspection().index().inspect(
-                    body={'inspectionUrl': url, 'siteUrl': site['site_url']}
-                ).execute()
+                with INSPECT_SECONDS.time():
+                    response = service.urlInspection().index().inspect(
+                        body={'inspectionUrl': url, 'siteUrl': site['site_url']}
+                    ).execute()
                 
                 result = response.get('inspectionResult', {})
                 index_status = result.get('indexStatusResult', {})
@@ -390,32 +793,32 @@ def api_scan_site(site_id):
                 status = 'indexed' if is_indexed else coverage
                 
                 # Save to database
-                cursor.execute('''
-                    INSERT INTO urls (site_id, url, indexing_status, last_checked)
-                    VALUES (?, ?, ?, datetime('now'))
-                    ON CONFLICT(site_id, url) DO UPDATE SET
-                        indexing_status = excluded.indexing_status,
-                        last_checked = datetime('now')
-                ''', (site_id, url, status))
+                _upsert_site_url(cursor, site_id, url, status, now)
                 
-                results['urls'].append({'url': url, 'status': status, 'indexed': is_indexed})
-                
-                if is_indexed:
-                    results['indexed'] += 1
-                else:
-                    results['not_indexed'] += 1
+                store.add(url, status, is_indexed)
                     
             except HttpError as e:
-                results['urls'].append({'url': url, 'status': 'error', 'indexed': False})
+                INSPECT_ERRORS.inc()
+                store.add(url, 'error', error=True)
         
-        conn.commit()
+        with db_write_seconds('scan_commit').time():
+            conn.commit()
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
     
-    return jsonify(results)
+    def generate():
+        yield json.dumps({
+            'total': len(urls),
+            'indexed': store.indexed,
+            'not_indexed': store.not_indexed,
+        })[:-1] + ', "urls": '
+        yield from store.iter_json()
+        yield '}'
+    
+    return Response(generate(), mimetype='application/json')
 
 
 @app.route("/api/sites/<int:site_id>/submit", methods=["POST"])
@@ -433,50 +836,62 @@ def api_submit_urls(site_id):
     
     results = {'submitted': 0, 'failed': 0}
     
-    conn = get_db()
-    cursor = conn.cursor()
+    # Atomically claim quota shared with every other worker and user
+    reservation = get_quota_ledger().reserve(get_quota_scope(), len(urls))
+    results['skipped'] = len(urls) - reservation.granted
+    attempted = 0
+    submissions = []
     
     try:
-        service = build('indexing', 'v3', credentials=credentials)
+        service = build('indexing', 'v3', credentials=credentials,
+                        client_options={'api_endpoint': INDEXING_API_ENDPOINT})
         
-        for url in urls[:200]:  # Respect 200/day limit
+        for url in urls[:reservation.granted]:
+            attempted += 1
             try:
-                service.urlNotifications().publish(
-                    body={'url': url, 'type': 'URL_UPDATED'}
-                ).execute()
-                
-                # Log submission
-                cursor.execute('''
-                    INSERT INTO submissions (site_id, url, result)
-                    VALUES (?, ?, 'success')
-                ''', (site_id, url))
-                
-                # Update URL record
-                cursor.execute('''
-                    UPDATE urls SET last_submitted = datetime('now')
-                    WHERE site_id = ? AND url = ?
-                ''', (site_id, url))
+                with SUBMIT_SECONDS.time():
+                    service.urlNotifications().publish(
+                        body={'url': url, 'type': 'URL_UPDATED'}
+                    ).execute()
                 
+                submissions.append((url, 'success', _now()))
                 results['submitted'] += 1
                 
             except HttpError as e:
-                cursor.execute('''
-                    INSERT INTO submissions (site_id, url, result)
-                    VALUES (?, ?, ?)
-                ''', (site_id, url, f'error: {str(e)}'))
+                SUBMIT_ERRORS.inc()
+                submissions.append((url, f'error: {str(e)}', _now()))
                 results['failed'] += 1
         
-        conn.commit()
+        # Log submissions and update URL records in one bulk transaction
+        p = _storage.p
+        with db_write_seconds('submit_commit').time():
+            with _storage.transaction() as cursor:
+                ids = url_ids(cursor, (url for url, _, _ in submissions), _storage.dialect)
+                _storage.executemany(cursor, f'''
+                    INSERT INTO submissions (site_id, url_id, result, submitted_at)
+                    VALUES ({p}, {p}, {p}, {p})
+                ''', [(site_id, ids[url], result, at) for url, result, at in submissions])
+                _storage.executemany(cursor, f'''
+                    UPDATE urls SET last_submitted = {p}
+                    WHERE site_id = {p} AND url_id = {p}
+                ''', [(at, site_id, ids[url]) for url, result, at in submissions if result == 'success'])
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        conn.close()
+        reservation.commit(attempted)
     
+    maintain_db()
     return jsonify(results)
 
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Timing histograms and counters in Prometheus text format."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/api/metadata", methods=["POST"])
 def api_metadata():
     """Fetch metadata (title, favicon, image) for a given URL."""
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Cold Import Benchmark
+Reports the cold-import cost of each app module and its heaviest dependencies.
+
+Every module is imported in a fresh interpreter with -X importtime, the way
+a serverless cold start sees it. The cumulative time of the module itself
+is reported, plus the most expensive imports it pulls in.
+
+Usage:
+    python benchmarks/bench_cold_import.py
+    python benchmarks/bench_cold_import.py app_oauth --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    'app_oauth',
+    'app',
+    'app_saas',
+    'main',
+    'database',
+    'sitemap_parser',
+    'gsc_client',
+    'indexing_client',
+    # Third-party stacks, for reference
+    'flask',
+    'google_auth_oauthlib.flow',
+    'googleapiclient.discovery',
+    'psycopg2',
+    'werkzeug.security',
+]
+
+
+def import_profile(module, env):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        Tuple of (cumulative microseconds for `module`, {module: self microseconds}),
+        or (None, {}) if the import failed
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        return None, {}
+
+    cumulative = None
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = [p.strip() for p in line[len('import time:'):].split('|')]
+        if not parts[0].isdigit():
+            continue  # header line
+        name = parts[2]
+        self_times[name] = self_times.get(name, 0) + int(parts[0])
+        if name == module:
+            cumulative = int(parts[1])
+    return cumulative, self_times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('modules', nargs='*', help='Modules to profile (default: app and dependency set)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per module; the median is reported (default: 3)')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest transitive imports to list per module (default: 5)')
+    args = parser.parse_args(argv)
+
+    modules = args.modules or DEFAULT_MODULES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep imports from touching real databases
+        env = dict(os.environ,
+                   AUTOGSC_DATABASE_PATH=os.path.join(tmp, 'bench.db'),
+                   DB_PATH=os.path.join(tmp, 'bench_users.db'))
+        env.pop('DATABASE_URL', None)
+
+        print(f"{'module':<28} {'cold import':>12}")
+        print('-' * 41)
+        for module in modules:
+            runs = [import_profile(module, env) for _ in range(args.runs)]
+            totals = [total for total, _ in runs if total is not None]
+            if not totals:
+                print(f"{module:<28} {'(not importable)':>12}")
+                continue
+
+            print(f"{module:<28} {statistics.median(totals) / 1000:9.1f} ms")
+
+            self_times = runs[-1][1]
+            heaviest = sorted(self_times.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+            for name, micros in heaviest:
+                print(f"    {name:<40} {micros / 1000:7.1f} ms self")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+Offline throughput benchmark for sitemap parsing, URL inspection and submission.
+
+Everything runs against benchmarks/mock_google.py, so no Google account or
+network is needed. Each scenario runs in a fresh interpreter (so peak RSS
+is its own) with a throwaway database, and reports:
+
+    items/s      URLs parsed, inspected or submitted per second
+    p50/p99      Latency of the unit of work (sitemap fetch+parse, API call)
+    peak RSS     Maximum resident memory of the scenario process
+    DB writes/s  Tracking-database writes per second of wall time
+
+Scenarios:
+    sitemap-flat     One urlset (--sitemap-urls URLs)
+    sitemap-index    Sitemap index with 10k-URL children
+    sitemap-gzip     Same, children gzipped
+    sitemap-1m       1,000,000 URLs in 50k-URL children
+    inspect          GSCClient + database via pipeline.check_urls (sequential, like the CLI)
+    publish          IndexingClient.submit_batch
+    api-scan         app_oauth.inspect_urls (concurrent REST calls, like /api/scan)
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py inspect publish --latency-ms 50 --error-429 0.02
+    python benchmarks/bench_pipeline.py api-scan --api-urls 5000 --max-inflight 12
+    python benchmarks/bench_pipeline.py --save benchmarks/results.jsonl
+    python benchmarks/bench_pipeline.py --compare benchmarks/results.jsonl --tolerance 0.2
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+SCENARIOS = ['sitemap-flat', 'sitemap-index', 'sitemap-gzip', 'sitemap-1m',
+             'inspect', 'publish', 'api-scan']
+DEFAULT_SCENARIOS = [s for s in SCENARIOS if s != 'sitemap-1m']
+
+# Higher is better for these; lower is better for the rest
+HIGHER_IS_BETTER = ('items_per_sec',)
+COMPARED = ('items_per_sec', 'p99_ms', 'peak_rss_mb')
+
+
+# -- Child side: runs one scenario in its own interpreter ------------------
+
+def _record_latency(func, latencies):
+    """Wrap `func` so each call's duration is appended to `latencies`."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+    return wrapper
+
+
+def _bench_urls(count):
+    from sitemaps import page_url
+    return [page_url(i) for i in range(count)]
+
+
+def _run_sitemap(base_url, path, latencies):
+    import sitemap_parser
+    from scan_store import CompactUrlList
+
+    # get_all_urls looks fetch_sitemap/_parse_locs up at call time
+    sitemap_parser.fetch_sitemap = _record_latency(sitemap_parser.fetch_sitemap, latencies)
+    urls = sitemap_parser.get_all_urls(f'{base_url}/sitemaps/{path}', urls=CompactUrlList())
+    return len(urls), 0 if urls else 1
+
+
+def _run_inspect(count, latencies):
+    from gsc_client import GSCClient
+    from pipeline import check_urls
+    from reporter import Reporter, JSONL
+
+    gsc = GSCClient()
+    gsc.inspect_url = _record_latency(gsc.inspect_url, latencies)
+    counts, _ = check_urls(_bench_urls(count), gsc, Reporter(JSONL, on_event=lambda event: None))
+    return count, counts['error']
+
+
+def _run_publish(count, latencies):
+    from indexing_client import IndexingClient
+
+    indexer = IndexingClient()
+    indexer.submit_url = _record_latency(indexer.submit_url, latencies)
+    results = indexer.submit_batch(_bench_urls(count), on_result=lambda *args: None)
+    return results['submitted'] + results['failed'], results['failed']
+
+
+def _run_api_scan(count, latencies):
+    import requests
+    import app_oauth
+
+    requests.post = _record_latency(requests.post, latencies)
+    store = app_oauth.inspect_urls(_bench_urls(count), 'mock-token', 'sc-domain:bench.example.com')
+    return len(store), store.errors
+
+
+def run_child(scenario, base_url, sitemap_urls, api_urls):
+    """Run one scenario and return its measurements."""
+    from metrics import summary_rows
+
+    latencies = []
+    started = time.perf_counter()
+    if scenario == 'sitemap-flat':
+        items, errors = _run_sitemap(base_url, f'flat-{sitemap_urls}.xml', latencies)
+    elif scenario == 'sitemap-index':
+        items, errors = _run_sitemap(base_url, f'index-{sitemap_urls}-10000.xml', latencies)
+    elif scenario == 'sitemap-gzip':
+        items, errors = _run_sitemap(base_url, f'index-{sitemap_urls}-10000-gz.xml', latencies)
+    elif scenario == 'sitemap-1m':
+        items, errors = _run_sitemap(base_url, 'index-1000000-50000.xml', latencies)
+    elif scenario == 'inspect':
+        items, errors = _run_inspect(api_urls, latencies)
+    elif scenario == 'publish':
+        items, errors = _run_publish(api_urls, latencies)
+    elif scenario == 'api-scan':
+        items, errors = _run_api_scan(api_urls, latencies)
+    else:
+        raise ValueError(f"unknown scenario: {scenario}")
+    seconds = time.perf_counter() - started
+
+    db_writes = sum(row['count'] for row in summary_rows()
+                    if row['name'].startswith('autogsc_db_write_seconds'))
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p99 = cuts[49], cuts[98]
+    else:
+        p50 = p99 = latencies[0] if latencies else 0.0
+
+    return {
+        'scenario': scenario,
+        'items': items,
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'items_per_sec': round(items / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(p50 * 1000, 2),
+        'p99_ms': round(p99 * 1000, 2),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'db_writes_per_sec': round(db_writes / seconds, 1) if seconds else 0.0,
+    }
+
+
+# -- Parent side: mock server, subprocesses, reporting ---------------------
+
+def git_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def run_scenario(scenario, args, env):
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario,
+               '--base-url', env['AUTOGSC_BENCH_BASE_URL'],
+               '--sitemap-urls', str(args.sitemap_urls), '--api-urls', str(args.api_urls)]
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or ['(no output)']
+        return {'scenario': scenario, 'failed': tail[0]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_table(results):
+    print(f"{'scenario':<15} {'items':>9} {'items/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'RSS MB':>8} {'DB w/s':>8} {'errors':>7}")
+    print('-' * 82)
+    for r in results:
+        if 'failed' in r:
+            print(f"{r['scenario']:<15} FAILED: {r['failed']}")
+            continue
+        print(f"{r['scenario']:<15} {r['items']:>9} {r['items_per_sec']:>10.1f} {r['p50_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['peak_rss_mb']:>8.1f} {r['db_writes_per_sec']:>8.1f} {r['errors']:>7}")
+
+
+def compare(results, baseline_path, tolerance):
+    """Compare with the last record in `baseline_path`; returns regression messages."""
+    with open(baseline_path) as f:
+        lines = [line for line in f if line.strip()]
+    if not lines:
+        return []
+    baseline = {r['scenario']: r for r in json.loads(lines[-1])['results'] if 'failed' not in r}
+
+    regressions = []
+    for r in results:
+        base = baseline.get(r['scenario'])
+        if base is None or 'failed' in r:
+            continue
+        for key in COMPARED:
+            old, new = base.get(key), r.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if key in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{r['scenario']}: {key} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"Any of {', '.join(SCENARIOS)} (default: all but sitemap-1m)")
+    parser.add_argument('--sitemap-urls', type=int, default=50000, help='URLs in sitemap scenarios')
+    parser.add_argument('--api-urls', type=int, default=500, help='URLs in API scenarios')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Mock API latency')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Mock API latency jitter')
+    parser.add_argument('--error-429', type=float, default=0.0, help='Fraction of API calls answered 429')
+    parser.add_argument('--error-503', type=float, default=0.0, help='Fraction of API calls answered 503')
+    parser.add_argument('--publish-quota', type=int, default=None, help='Mock publish quota')
+    parser.add_argument('--max-inflight', type=int, default=None,
+                        help='Mock API calls in flight before 429s (exercises adaptive concurrency)')
+    parser.add_argument('--save', metavar='FILE', help='Append results (with git commit) to a JSONL file')
+    parser.add_argument('--compare', metavar='FILE', help='Fail on regressions against the last saved run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression for --compare (default: 0.2)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCH_DIR)
+
+    if args.child:
+        # Everything the app prints goes to stderr; stdout is the result line
+        result_stream, sys.stdout = sys.stdout, sys.stderr
+        result = run_child(args.child, args.base_url, args.sitemap_urls, args.api_urls)
+        result_stream.write(json.dumps(result) + '\n')
+        return 0
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+    scenarios = args.scenarios or DEFAULT_SCENARIOS
+
+    from mock_google import MockConfig, MockGoogleServer, write_service_account
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_429, args.error_503,
+                        args.publish_quota, max_inflight=args.max_inflight)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, MockGoogleServer(config) as server:
+        service_account = os.path.join(tmp, 'service-account.json')
+        if set(scenarios) & {'inspect', 'publish'}:
+            write_service_account(service_account, server.base_url)
+        for scenario in scenarios:
+            db_dir = tempfile.mkdtemp(dir=tmp)
+            env = dict(os.environ,
+                       AUTOGSC_BENCH_BASE_URL=server.base_url,
+                       AUTOGSC_GSC_API_ENDPOINT=server.base_url + '/',
+                       AUTOGSC_INDEXING_API_ENDPOINT=server.base_url + '/',
+                       AUTOGSC_SERVICE_ACCOUNT_FILE=service_account,
+                       AUTOGSC_DAILY_SUBMISSION_LIMIT=str(max(args.api_urls, 200)),
+                       AUTOGSC_DATABASE_PATH=os.path.join(db_dir, 'autogsc.db'),
+                       DB_PATH=os.path.join(db_dir, 'users.db'))
+            env.pop('DATABASE_URL', None)
+            results.append(run_scenario(scenario, args, env))
+        server_stats = server.stats
+
+    print_table(results)
+    print(f"\nmock server: {server_stats['calls']}, injected errors {server_stats['injected']}")
+
+    if args.save:
+        with open(args.save, 'a') as f:
+            f.write(json.dumps({
+                'commit': git_commit(),
+                'timestamp': int(time.time()),
+                'config': {k: getattr(args, k) for k in
+                           ('sitemap_urls', 'api_urls', 'latency_ms', 'jitter_ms', 'error_429', 'error_503')},
+                'results': results,
+            }) + '\n')
+
+    status = 1 if any('failed' in r for r in results) else 0
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS")
+            for line in regressions:
+                print(f"  {line}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
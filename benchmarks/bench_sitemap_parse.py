@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Sitemap Parse Benchmark
+Parse time and memory of each sitemap XML backend in sitemap_parser.py.
+
+Parses synthetic sitemaps from benchmarks/sitemaps.py, already in memory,
+so only parsing is measured:
+
+    urlset-50k      50,000 URLs, <loc> and <lastmod> only (~4MB)
+    urlset-50k-fat  50,000 URLs with image and hreflang entries (~50MB)
+    index-50k       Sitemap index with 50,000 child sitemaps
+
+Backends are the ones set_parser_backend() accepts, plus "tree", the
+original ElementTree.fromstring + findall parser, as the baseline. Each
+run is in a fresh interpreter; "peak MB" is how far parsing raised the
+process's peak RSS above what it was with the sitemap loaded.
+
+Usage:
+    python benchmarks/bench_sitemap_parse.py
+    python benchmarks/bench_sitemap_parse.py --backends tree fast --repeat 5
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+BACKENDS = ['tree', 'stdlib', 'lxml', 'fast']
+SITEMAPS = ['urlset-50k', 'urlset-50k-fat', 'index-50k']
+
+
+def _write_sitemap(name, path):
+    from sitemaps import iter_index, iter_urlset, page_url
+
+    if name == 'urlset-50k':
+        chunks = iter_urlset(0, 50000)
+    elif name == 'urlset-50k-fat':
+        chunks = iter_urlset(0, 50000, fat=True)
+    else:
+        chunks = iter_index(f"{page_url(i)}/sitemap.xml" for i in range(50000))
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def _parse_tree(data):
+    """The parser as it was before backends: whole tree plus two findall passes."""
+    import xml.etree.ElementTree as ET
+
+    root = ET.fromstring(data)
+    namespace = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+    sitemap_refs = [e.text.strip() for e in root.findall(".//ns:sitemap/ns:loc", namespace) if e.text]
+    if sitemap_refs:
+        return sitemap_refs, []
+    return [], [e.text.strip() for e in root.findall(".//ns:url/ns:loc", namespace) if e.text]
+
+
+def run_child(backend, path, repeat):
+    """Parse `path` `repeat` times with `backend`; returns the measurements."""
+    import sitemap_parser
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if backend == 'tree':
+        parse = _parse_tree
+    else:
+        sitemap_parser.set_parser_backend(backend)
+        parse = sitemap_parser._XML_BACKENDS[backend]
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        refs, urls = parse(data)
+        times.append(time.perf_counter() - started)
+        locs = len(refs) + len(urls)
+        del refs, urls
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        'backend': backend,
+        'size_mb': round(len(data) / 1e6, 1),
+        'locs': locs,
+        'seconds': round(statistics.median(times), 4),
+        'peak_mb': round((peak - baseline) / 1024, 1),  # ru_maxrss is KB on Linux
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--sitemaps', nargs='+', choices=SITEMAPS, default=SITEMAPS)
+    parser.add_argument('--repeat', type=int, default=3, help='Parses per run; the median is reported')
+    parser.add_argument('--child', nargs=2, metavar=('BACKEND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sys.path[:0] = [ROOT, BENCH_DIR]
+    if args.child:
+        print(json.dumps(run_child(args.child[0], args.child[1], args.repeat)))
+        return 0
+
+    from importlib.util import find_spec
+    backends = [b for b in args.backends if b != 'lxml' or find_spec('lxml') is not None]
+    if len(backends) < len(args.backends):
+        print("lxml is not installed; skipping the lxml backend", file=sys.stderr)
+
+    print(f"{'sitemap':<16} {'backend':<8} {'MB':>6} {'locs':>7} {'seconds':>8} {'peak MB':>8} {'vs tree':>8}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.sitemaps:
+            path = os.path.join(tmp, f'{name}.xml')
+            _write_sitemap(name, path)
+            baseline = None
+            for backend in backends:
+                proc = subprocess.run(
+                    [sys.executable, __file__, '--child', backend, path, '--repeat', str(args.repeat)],
+                    capture_output=True, text=True,
+                )
+                if proc.returncode != 0:
+                    print(f"{name:<16} {backend:<8} failed:\n{proc.stderr}", file=sys.stderr)
+                    failed = True
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                if backend == 'tree':
+                    baseline = result['seconds']
+                speedup = f"{baseline / result['seconds']:.1f}x" if baseline and result['seconds'] else '-'
+                print(f"{name:<16} {backend:<8} {result['size_mb']:>6} {result['locs']:>7} "
+                      f"{result['seconds']:>8.3f} {result['peak_mb']:>8} {speedup:>8}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
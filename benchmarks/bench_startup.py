@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+CLI Startup Benchmark
+Times `main.py --help` and `main.py status` (text and jsonl) and guards against regressions.
+
+Each command runs in a fresh interpreter (what cron and monitoring probes
+pay). Two checks fail the run:
+  - median wall time above --max-ms
+  - a heavy module (Google API clients, requests, rich.progress) imported
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --max-ms 150
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    '--help': ['main.py', '--help'],
+    'status': ['main.py', 'status'],
+    'status jsonl': ['main.py', '--output', 'jsonl', 'status'],
+}
+
+# Modules that must never load for the commands above
+FORBIDDEN_MODULES = (
+    'googleapiclient',
+    'google.oauth2',
+    'google_auth_oauthlib',
+    'requests',
+    'rich.progress',
+    'gsc_client',
+    'indexing_client',
+    'sitemap_parser',
+)
+
+
+def time_command(args, env, runs):
+    """Run a command `runs` times and return wall times in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def imported_modules(args, env):
+    """Get the set of modules a command imports, via -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True, check=True)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            modules.add(line.rsplit('|', 1)[1].strip())
+    return modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=10, help='Runs per command (default: 10)')
+    parser.add_argument('--max-ms', type=float, default=150.0,
+                        help='Fail if a median exceeds this many ms (default: 150)')
+    args = parser.parse_args(argv)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the benchmark away from the real tracking database
+        env = dict(os.environ, AUTOGSC_DATABASE_PATH=os.path.join(tmp, 'bench.db'))
+
+        # Baseline: bare interpreter startup, for context
+        baseline = statistics.median(time_command(['-c', 'pass'], env, args.runs))
+        print(f"{'python -c pass':<20} median {baseline:7.1f} ms")
+
+        for name, command in COMMANDS.items():
+            timings = time_command(command, env, args.runs)
+            median = statistics.median(timings)
+            print(f"{'main.py ' + name:<20} median {median:7.1f} ms   "
+                  f"min {min(timings):7.1f} ms   max {max(timings):7.1f} ms")
+            if median > args.max_ms:
+                failures.append(f"main.py {name}: median {median:.1f} ms > {args.max_ms:.0f} ms")
+
+            loaded = imported_modules(command, env)
+            for module in FORBIDDEN_MODULES:
+                if module in loaded:
+                    failures.append(f"main.py {name}: imports {module}")
+
+    if failures:
+        print("\nFAIL")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Mock Google APIs
+A local stand-in for the Google endpoints AutoGSC calls, for benchmarks.
+
+Emulates:
+    POST /token                              OAuth token (service account JWT grant)
+    POST /v1/urlInspection/index:inspect     URL Inspection
+    POST /v3/urlNotifications:publish        Indexing API publish
+    POST /batch/indexing/v3, /batch          Batch (multipart/mixed) publish
+    GET  /sitemaps/...                       Synthetic sitemaps (see below)
+
+with configurable latency, injected 429/503 responses and a publish quota.
+Point the app at it with AUTOGSC_GSC_API_ENDPOINT/AUTOGSC_INDEXING_API_ENDPOINT
+and a service account file whose token_uri is <base>/token (see
+write_service_account()).
+
+Sitemaps:
+    /sitemaps/flat-<n>.xml                   One urlset with n URLs
+    /sitemaps/index-<n>-<per>.xml            Index of ceil(n/per) child urlsets
+    /sitemaps/index-<n>-<per>-gz.xml         Same, children gzipped (.xml.gz)
+    /sitemaps/part-<start>-<count>.xml[.gz]  One child urlset
+
+Usage (standalone):
+    python benchmarks/mock_google.py --port 8765 --latency-ms 50 --error-429 0.01
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sitemaps import gzip_chunks, iter_index, iter_urlset, part_ranges  # noqa: E402
+
+COVERAGE_INDEXED = 'Submitted and indexed'
+COVERAGE_NOT_INDEXED = (
+    'Discovered - currently not indexed',
+    'Crawled - currently not indexed',
+)
+
+
+class MockConfig:
+    """
+    Behaviour of the mock server.
+
+    Args:
+        latency_ms: Base latency added to every API call
+        jitter_ms: Uniform random extra latency (0..jitter_ms)
+        error_429: Fraction of API calls answered with 429 RESOURCE_EXHAUSTED
+        error_503: Fraction of API calls answered with 503 UNAVAILABLE
+        publish_quota: Publish calls allowed before every further one gets 429
+        max_inflight: API calls allowed in flight at once; calls beyond it get
+            429, like a per-property rate limit
+        indexed_ratio: Fraction of URLs reported as indexed (stable per URL)
+        seed: Random seed for error injection and jitter
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_429=0.0, error_503=0.0,
+                 publish_quota=None, indexed_ratio=0.7, seed=0, max_inflight=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_429 = error_429
+        self.error_503 = error_503
+        self.publish_quota = publish_quota
+        self.indexed_ratio = indexed_ratio
+        self.seed = seed
+        self.max_inflight = max_inflight
+
+
+class MockState:
+    """Counters shared by the handler threads."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.injected = {429: 0, 503: 0}
+        self.published = 0
+        self.inflight = 0
+
+    def count(self, name: str):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def draw(self):
+        """Decide latency and any injected error for one API call."""
+        config = self.config
+        with self.lock:
+            jitter = self.random.uniform(0, config.jitter_ms) if config.jitter_ms else 0.0
+            roll = self.random.random()
+        error = None
+        if roll < config.error_429:
+            error = 429
+        elif roll < config.error_429 + config.error_503:
+            error = 503
+        if error:
+            with self.lock:
+                self.injected[error] += 1
+        return (config.latency_ms + jitter) / 1000.0, error
+
+    def enter(self) -> bool:
+        """Count an API call in; False if it's over max_inflight."""
+        with self.lock:
+            limit = self.config.max_inflight
+            if limit is not None and self.inflight >= limit:
+                self.injected[429] += 1
+                return False
+            self.inflight += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.inflight -= 1
+
+    def take_publish_quota(self) -> bool:
+        with self.lock:
+            quota = self.config.publish_quota
+            if quota is not None and self.published >= quota:
+                return False
+            self.published += 1
+            return True
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {'calls': dict(self.calls), 'injected': dict(self.injected),
+                    'published': self.published}
+
+
+def _error_body(code: int) -> dict:
+    status, message = {
+        429: ('RESOURCE_EXHAUSTED', 'Quota exceeded for quota metric'),
+        503: ('UNAVAILABLE', 'The service is currently unavailable.'),
+    }[code]
+    return {'error': {'code': code, 'message': message, 'status': status}}
+
+
+def _is_indexed(url: str, ratio: float) -> bool:
+    """Stable per-URL verdict, so repeated scans agree."""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 32 < ratio
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Request handler; the server's `state` attribute holds the MockState."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockGoogle/1.0'
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    # -- helpers -----------------------------------------------------------
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, code: int, body: bytes, content_type='application/json', headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code: int, payload: dict):
+        headers = {'Retry-After': '1'} if code == 429 else None
+        self._send(code, json.dumps(payload).encode(), headers=headers)
+
+    # -- API emulation -----------------------------------------------------
+
+    def _inspect(self, body: dict):
+        """(status code, payload) for one URL Inspection call."""
+        url = body.get('inspectionUrl', '')
+        if _is_indexed(url, self.state.config.indexed_ratio):
+            verdict, coverage = 'PASS', COVERAGE_INDEXED
+        else:
+            verdict = 'NEUTRAL'
+            coverage = COVERAGE_NOT_INDEXED[len(url) % len(COVERAGE_NOT_INDEXED)]
+        return 200, {'inspectionResult': {
+            'inspectionResultLink': 'https://search.google.com/search-console/inspect',
+            'indexStatusResult': {
+                'verdict': verdict,
+                'coverageState': coverage,
+                'robotsTxtState': 'ALLOWED',
+                'indexingState': 'INDEXING_ALLOWED',
+                'pageFetchState': 'SUCCESSFUL',
+                'lastCrawlTime': '2024-01-01T00:00:00Z',
+            },
+        }}
+
+    def _publish(self, body: dict):
+        """(status code, payload) for one publish call."""
+        if not self.state.take_publish_quota():
+            return 429, _error_body(429)
+        return 200, {'urlNotificationMetadata': {
+            'url': body.get('url'),
+            'latestUpdate': {'url': body.get('url'), 'type': body.get('type', 'URL_UPDATED'),
+                             'notifyTime': '2024-01-01T00:00:00Z'},
+        }}
+
+    def _api_call(self, name: str, handler):
+        self.state.count(name)
+        if not self.state.enter():
+            self._read_body()
+            self._send_json(429, _error_body(429))
+            return
+        try:
+            delay, error = self.state.draw()
+            try:
+                body = json.loads(self._read_body() or b'{}')
+            except ValueError:
+                body = {}
+            if delay:
+                time.sleep(delay)
+            if error:
+                self._send_json(error, _error_body(error))
+                return
+            code, payload = handler(body)
+            self._send_json(code, payload)
+        finally:
+            self.state.leave()
+
+    def _batch(self):
+        """multipart/mixed batch of publish calls, one latency for the whole batch."""
+        self.state.count('batch')
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get('Content-Type', ''))
+        raw = self._read_body().decode('utf-8', 'replace')
+        if not match:
+            self._send_json(400, {'error': {'code': 400, 'message': 'Missing boundary'}})
+            return
+
+        delay, error = self.state.draw()
+        if delay:
+            time.sleep(delay)
+        if error:
+            self._send_json(error, _error_body(error))
+            return
+
+        out_boundary = 'batch_mock_boundary'
+        parts = []
+        for part in raw.split('--' + match.group(1)):
+            part = part.strip()
+            if not part or part == '--':
+                continue
+            content_id = re.search(r'Content-ID:\s*<([^>]*)>', part, re.IGNORECASE)
+            json_start = part.find('{')
+            try:
+                body = json.loads(part[json_start:part.rfind('}') + 1]) if json_start != -1 else {}
+            except ValueError:
+                body = {}
+            self.state.count('publish')
+            code, payload = self._publish(body)
+            reason = 'OK' if code == 200 else 'Too Many Requests'
+            parts.append(
+                f'--{out_boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id.group(1) if content_id else len(parts)}>\r\n\r\n'
+                f'HTTP/1.1 {code} {reason}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+                f'{json.dumps(payload)}\r\n'
+            )
+        body = (''.join(parts) + f'--{out_boundary}--\r\n').encode()
+        self._send(200, body, content_type=f'multipart/mixed; boundary={out_boundary}')
+
+    # -- sitemaps ----------------------------------------------------------
+
+    def _sitemap(self, path: str):
+        self.state.count('sitemap')
+        base = f'http://{self.headers.get("Host")}/sitemaps'
+        name = path[len('/sitemaps/'):]
+
+        match = re.fullmatch(r'flat-(\d+)\.xml', name)
+        if match:
+            return self._stream(iter_urlset(0, int(match.group(1))))
+
+        match = re.fullmatch(r'index-(\d+)-(\d+)(-gz)?\.xml', name)
+        if match:
+            suffix = '.xml.gz' if match.group(3) else '.xml'
+            children = [f'{base}/part-{start}-{count}{suffix}'
+                        for start, count in part_ranges(int(match.group(1)), int(match.group(2)))]
+            return self._stream(iter_index(children))
+
+        match = re.fullmatch(r'part-(\d+)-(\d+)\.xml(\.gz)?', name)
+        if match:
+            chunks = iter_urlset(int(match.group(1)), int(match.group(2)))
+            if match.group(3):
+                return self._send(200, gzip_chunks(chunks), content_type='application/x-gzip')
+            return self._stream(chunks)
+
+        self._send_json(404, {'error': {'code': 404, 'message': 'No such sitemap'}})
+
+    def _stream(self, chunks):
+        """Send a generated document with chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    # -- routing -----------------------------------------------------------
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/sitemaps/'):
+            self._sitemap(path)
+        elif path == '/_stats':
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/token':
+            self._read_body()
+            self.state.count('token')
+            self._send_json(200, {'access_token': 'mock-token', 'expires_in': 3600,
+                                  'token_type': 'Bearer'})
+        elif path == '/v1/urlInspection/index:inspect':
+            self._api_call('inspect', self._inspect)
+        elif path == '/v3/urlNotifications:publish':
+            self._api_call('publish', self._publish)
+        elif path in ('/batch', '/batch/indexing/v3'):
+            self._batch()
+        else:
+            self._read_body()
+            self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 resets connections once a benchmark
+    # opens a few dozen at once
+    request_queue_size = 128
+
+
+class MockGoogleServer:
+    """The mock server on a background thread. Use as a context manager."""
+
+    def __init__(self, config: MockConfig = None, host='127.0.0.1', port=0):
+        self.httpd = _Server((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = MockState(config or MockConfig())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def stats(self) -> dict:
+        return self.httpd.state.snapshot()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def write_service_account(path: str, base_url: str):
+    """
+    Write a service account key file whose token_uri points at the mock.
+
+    The key is freshly generated; google-auth signs JWTs with it and the
+    mock accepts any assertion.
+    """
+    # cryptography is installed with google-auth
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    with open(path, 'w') as f:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'autogsc-bench',
+            'private_key_id': 'bench',
+            'private_key': pem.decode(),
+            'client_email': 'bench@autogsc-bench.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': f'{base_url}/token',
+        }, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Base latency per API call')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra latency per call')
+    parser.add_argument('--error-429', type=float, default=0.0, help='Fraction of calls answered 429')
+    parser.add_argument('--error-503', type=float, default=0.0, help='Fraction of calls answered 503')
+    parser.add_argument('--publish-quota', type=int, default=None, help='Publish calls before 429s')
+    parser.add_argument('--indexed-ratio', type=float, default=0.7, help='Fraction of URLs indexed')
+    parser.add_argument('--max-inflight', type=int, default=None,
+                        help='API calls in flight before 429s')
+    parser.add_argument('--service-account', default=None,
+                        help='Also write a matching service account file here')
+    args = parser.parse_args(argv)
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_429, args.error_503,
+                        args.publish_quota, args.indexed_ratio, max_inflight=args.max_inflight)
+    server = MockGoogleServer(config, args.host, args.port)
+    if args.service_account:
+        write_service_account(args.service_account, server.base_url)
+
+    print(f"Mock Google APIs on {server.base_url}")
+    print(f"  export AUTOGSC_GSC_API_ENDPOINT={server.base_url}/")
+    print(f"  export AUTOGSC_INDEXING_API_ENDPOINT={server.base_url}/")
+    if args.service_account:
+        print(f"  export AUTOGSC_SERVICE_ACCOUNT_FILE={os.path.abspath(args.service_account)}")
+    print(f"  sitemap: {server.base_url}/sitemaps/index-100000-50000.xml")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Synthetic Sitemaps
+Generators for benchmark sitemaps: flat urlsets, sitemap indexes with
+child files, gzip-compressed variants, up to millions of URLs.
+
+Output is produced in chunks so a 1M-URL sitemap never has to be built as
+one string. mock_google.py serves these over HTTP; they can also be
+written to disk:
+
+    python benchmarks/sitemaps.py flat 50000 -o /tmp/sitemap.xml
+    python benchmarks/sitemaps.py flat 50000 --fat -o /tmp/sitemap-50mb.xml
+    python benchmarks/sitemaps.py index 1000000 --per-file 50000 --gzip -o /tmp/sitemaps
+"""
+import argparse
+import gzip
+import io
+import os
+import sys
+from typing import Iterator
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+IMAGE_NS = "http://www.google.com/schemas/sitemap-image/1.1"
+XHTML_NS = "http://www.w3.org/1999/xhtml"
+
+# The sitemap protocol's per-file maximum
+MAX_URLS_PER_FILE = 50000
+
+# Page URLs in generated sitemaps
+PAGE_BASE = "https://bench.example.com"
+
+_CHUNK_URLS = 2000
+
+
+def page_url(i: int) -> str:
+    """URL of the i-th synthetic page (a mix of shallow and deep paths)."""
+    return f"{PAGE_BASE}/section-{i % 97}/page-{i}"
+
+
+def _fat_entry(i: int) -> str:
+    # hreflang alternates and images, as e-commerce sitemaps carry them:
+    # about 1KB per URL, so 50k URLs come close to the 50MB file limit
+    url = page_url(i)
+    alternates = ''.join(
+        f'<xhtml:link rel="alternate" hreflang="{lang}" href="{url}?hl={lang}"/>'
+        for lang in ('en', 'de', 'fr', 'es', 'it')
+    )
+    images = ''.join(
+        f'<image:image><image:loc>{PAGE_BASE}/images/{i}-{n}.jpg</image:loc>'
+        f'<image:title>Product {i} photo {n}</image:title></image:image>'
+        for n in (1, 2, 3)
+    )
+    return (f'  <url><loc>{url}</loc><lastmod>2024-01-01T12:00:00+00:00</lastmod>'
+            f'<changefreq>weekly</changefreq><priority>0.8</priority>{alternates}{images}</url>\n')
+
+
+def iter_urlset(start: int, count: int, fat: bool = False) -> Iterator[bytes]:
+    """
+    <urlset> with pages [start, start + count), in chunks.
+
+    `fat` adds image and hreflang entries to every URL (~1KB each).
+    """
+    namespaces = f' xmlns:image="{IMAGE_NS}" xmlns:xhtml="{XHTML_NS}"' if fat else ''
+    yield (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<urlset xmlns="{SITEMAP_NS}"{namespaces}>\n').encode()
+    end = start + count
+    for chunk_start in range(start, end, _CHUNK_URLS):
+        chunk_end = min(chunk_start + _CHUNK_URLS, end)
+        if fat:
+            yield ''.join(_fat_entry(i) for i in range(chunk_start, chunk_end)).encode()
+            continue
+        yield ''.join(
+            f'  <url><loc>{page_url(i)}</loc><lastmod>2024-01-01</lastmod></url>\n'
+            for i in range(chunk_start, chunk_end)
+        ).encode()
+    yield b'</urlset>\n'
+
+
+def iter_index(child_urls) -> Iterator[bytes]:
+    """<sitemapindex> pointing at `child_urls`."""
+    yield (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<sitemapindex xmlns="{SITEMAP_NS}">\n').encode()
+    for url in child_urls:
+        yield f'  <sitemap><loc>{url}</loc></sitemap>\n'.encode()
+    yield b'</sitemapindex>\n'
+
+
+def part_ranges(total: int, per_file: int = MAX_URLS_PER_FILE):
+    """(start, count) for each child sitemap of a `total`-URL index."""
+    return [(start, min(per_file, total - start)) for start in range(0, total, per_file)]
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> bytes:
+    """Gzip-compress a chunk stream."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as gz:
+        for chunk in chunks:
+            gz.write(chunk)
+    return buf.getvalue()
+
+
+def _write(path: str, chunks: Iterator[bytes], compress: bool):
+    data = gzip_chunks(chunks) if compress else None
+    with open(path, 'wb') as f:
+        if data is not None:
+            f.write(data)
+        else:
+            for chunk in chunks:
+                f.write(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('kind', choices=['flat', 'index'])
+    parser.add_argument('urls', type=int, help='Total page URLs')
+    parser.add_argument('--per-file', type=int, default=MAX_URLS_PER_FILE,
+                        help=f'URLs per child sitemap for index (default: {MAX_URLS_PER_FILE})')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the urlset files')
+    parser.add_argument('--fat', action='store_true',
+                        help='Add image and hreflang entries (~1KB per URL)')
+    parser.add_argument('-o', '--output', required=True,
+                        help='Output file (flat) or directory (index)')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                        help='Where the child sitemaps will be served from (index)')
+    args = parser.parse_args(argv)
+
+    suffix = '.xml.gz' if args.gzip else '.xml'
+    if args.kind == 'flat':
+        _write(args.output, iter_urlset(0, args.urls, args.fat), args.gzip)
+        return 0
+
+    os.makedirs(args.output, exist_ok=True)
+    children = []
+    for start, count in part_ranges(args.urls, args.per_file):
+        name = f'part-{start}-{count}{suffix}'
+        _write(os.path.join(args.output, name), iter_urlset(start, count, args.fat), args.gzip)
+        children.append(f"{args.base_url.rstrip('/')}/{name}")
+    _write(os.path.join(args.output, 'sitemap_index.xml'), iter_index(children), False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
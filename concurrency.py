@@ -0,0 +1,176 @@
+"""
+Adaptive Concurrency
+AIMD (additive increase, multiplicative decrease) limit on in-flight API
+calls, so each property is scanned as fast as Google allows without a
+hand-tuned worker count.
+
+Workers report each call's latency and whether it was throttled (429, 5xx,
+timeout). While calls are healthy the limit grows by about one per round
+trip; a throttled call cuts it by BACKOFF, at most once per round trip, so
+a burst of errors from calls already in flight counts once. Latency well
+above the best seen holds the limit where it is.
+
+The limit a scan ends with is saved per quota scope (quota.inspection_scope)
+and is where the next scan of that property starts:
+
+    store = ConcurrencyStore(connect, dialect)
+    limiter = AdaptiveLimiter(store.get(scope) or DEFAULT_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
+        for result in adaptive_map(executor, check_url, urls, limiter):
+            ...
+    store.save(scope, limiter)
+"""
+import time
+from threading import Lock
+from typing import Callable, Iterable, Iterator, Optional
+
+from migrations import SQLITE, placeholder
+
+# Starting limit for a property with no saved state
+DEFAULT_CONCURRENCY = 5
+
+# Hard ceiling; the URL Inspection API allows 600 calls/minute per property
+MAX_CONCURRENCY = 32
+
+# Multiplier applied to the limit on a throttled call
+BACKOFF = 0.5
+
+# Growth stops while smoothed latency exceeds the best seen by this factor
+LATENCY_TOLERANCE = 2.0
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit fed by per-call latency and throttling.
+
+    record() is called from the worker threads; `current` is read by
+    whoever submits the work (see adaptive_map).
+    """
+
+    def __init__(self, initial: float = DEFAULT_CONCURRENCY, min_limit: int = 1,
+                 max_limit: int = MAX_CONCURRENCY):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_latency = None
+        self.latency = None  # exponentially smoothed
+        self.calls = 0
+        self.throttled = 0
+        self._last_backoff = 0.0
+        self._lock = Lock()
+
+    @property
+    def current(self) -> int:
+        """Calls allowed in flight right now."""
+        return max(self.min_limit, int(self.limit))
+
+    def record(self, seconds: float, throttled: bool = False):
+        """Feed back one finished call."""
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            if throttled:
+                self.throttled += 1
+                # Calls that were already in flight when we backed off report
+                # the same overload; only back off again after a round trip.
+                if now - self._last_backoff >= (self.latency or seconds):
+                    self.limit = max(float(self.min_limit), self.limit * BACKOFF)
+                    self._last_backoff = now
+                return
+
+            if self.min_latency is None or seconds < self.min_latency:
+                self.min_latency = seconds
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+            if self.latency <= self.min_latency * LATENCY_TOLERANCE:
+                # +1/limit per call is about +1 per round trip of `limit` calls
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+
+def adaptive_map(executor, fn: Callable, items: Iterable, limiter: AdaptiveLimiter) -> Iterator:
+    """
+    Like scan_store.bounded_map, with at most `limiter.current` calls in
+    flight, re-read as results come back.
+
+    The executor needs `limiter.max_limit` workers for the limit to be able
+    to reach its ceiling. Results are yielded in completion order.
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    pending = set()
+    for item in items:
+        while len(pending) >= limiter.current:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(fn, item))
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def create_concurrency_tables(cur, dialect: str):
+    """Create the per-scope limit table; called from each database's migrations."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS concurrency_limits (
+            scope TEXT PRIMARY KEY,
+            concurrency REAL NOT NULL,
+            latency REAL,
+            throttled INTEGER NOT NULL DEFAULT 0,
+            calls INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+
+
+class ConcurrencyStore:
+    """
+    Saved AdaptiveLimiter state per scope, over a connection factory.
+
+    Args:
+        connect: Callable returning a new DB-API connection
+        dialect: migrations.SQLITE or migrations.POSTGRES
+    """
+
+    def __init__(self, connect: Callable, dialect: str = SQLITE):
+        self.connect = connect
+        self.dialect = dialect
+        self.p = placeholder(dialect)
+
+    def get(self, scope: str) -> Optional[float]:
+        """The limit the last scan of `scope` ended with, or None."""
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT concurrency FROM concurrency_limits WHERE scope = {self.p}", (scope,))
+            row = cur.fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return row['concurrency'] if isinstance(row, dict) else row[0]
+
+    def save(self, scope: str, limiter: AdaptiveLimiter):
+        """Store where `limiter` ended up, for the next scan of `scope`."""
+        p = self.p
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"""
+                INSERT INTO concurrency_limits (scope, concurrency, latency, throttled, calls, updated_at)
+                VALUES ({p}, {p}, {p}, {p}, {p}, {p})
+                ON CONFLICT (scope) DO UPDATE SET
+                    concurrency = excluded.concurrency,
+                    latency = excluded.latency,
+                    throttled = excluded.throttled,
+                    calls = excluded.calls,
+                    updated_at = excluded.updated_at
+            """, (scope, limiter.limit, limiter.latency, limiter.throttled, limiter.calls,
+                  int(time.time())))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
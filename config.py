@@ -6,7 +6,19 @@ import os
 
 # Path to your Google Cloud Service Account JSON key file
 # Download this from Google Cloud Console -> APIs & Services -> Credentials
-SERVICE_ACCOUNT_FILE = os.path.join(os.path.dirname(__file__), "service-account.json")
+# (AUTOGSC_SERVICE_ACCOUNT_FILE overrides it)
+SERVICE_ACCOUNT_FILE = os.environ.get(
+    "AUTOGSC_SERVICE_ACCOUNT_FILE",
+    os.path.join(os.path.dirname(__file__), "service-account.json")
+)
+
+# More service accounts to pool quota across, separated by os.pathsep (":"
+# on Linux/macOS). Each must be a verified owner of SITE_URL and should be in
+# its own GCP project, since quota is per project. Defaults to
+# SERVICE_ACCOUNT_FILE alone (AUTOGSC_SERVICE_ACCOUNT_FILES overrides it).
+SERVICE_ACCOUNT_FILES = [
+    path for path in os.environ.get("AUTOGSC_SERVICE_ACCOUNT_FILES", "").split(os.pathsep) if path
+] or [SERVICE_ACCOUNT_FILE]
 
 # Your website URL as it appears in Google Search Console
 # Examples: "https://example.com" or "sc-domain:example.com"
@@ -15,11 +27,60 @@ SITE_URL = "sc-domain:lighthouselaunch.com"
 # Your sitemap URL
 SITEMAP_URL = "https://lighthouselaunch.com/sitemap.xml"
 
-# Google Indexing API limit (don't change unless Google updates this)
-DAILY_SUBMISSION_LIMIT = 200
+# Google Indexing API limit (don't change unless Google updates this or
+# raised your project's quota; AUTOGSC_DAILY_SUBMISSION_LIMIT overrides it)
+DAILY_SUBMISSION_LIMIT = int(os.environ.get("AUTOGSC_DAILY_SUBMISSION_LIMIT", 200))
+
+# URL Inspection API limit per property, per GCP project
+# (AUTOGSC_INSPECTION_DAILY_LIMIT overrides it)
+INSPECTION_DAILY_LIMIT = int(os.environ.get("AUTOGSC_INSPECTION_DAILY_LIMIT", 2000))
+
+# Database file for tracking submissions (AUTOGSC_DATABASE_PATH overrides it)
+DATABASE_PATH = os.environ.get(
+    "AUTOGSC_DATABASE_PATH",
+    os.path.join(os.path.dirname(__file__), "autogsc.db")
+)
+
+# Postgres to mirror URL statuses and submissions into, for dashboards or
+# several machines sharing state (AUTOGSC_SYNC_DATABASE_URL). Writes stay
+# local and are synced in batches; see write_behind.py.
+SYNC_DATABASE_URL = os.environ.get("AUTOGSC_SYNC_DATABASE_URL")
+
+# Root URLs of the Search Console and Indexing APIs. Only changed to point
+# the clients at a stand-in server (see benchmarks/mock_google.py).
+GSC_API_ENDPOINT = os.environ.get("AUTOGSC_GSC_API_ENDPOINT", "https://searchconsole.googleapis.com/")
+INDEXING_API_ENDPOINT = os.environ.get("AUTOGSC_INDEXING_API_ENDPOINT", "https://indexing.googleapis.com/")
+
+# Also scan the sitemaps listed in robots.txt and submitted to Search
+# Console, not just SITEMAP_URL (AUTOGSC_SITEMAP_DISCOVERY=0 turns it off)
+SITEMAP_DISCOVERY = os.environ.get("AUTOGSC_SITEMAP_DISCOVERY", "1") != "0"
+
+# Sitemap XML parser: "auto" (lxml if installed, else "fast"), "lxml",
+# "stdlib" or "fast" (AUTOGSC_SITEMAP_PARSER overrides it)
+SITEMAP_PARSER = os.environ.get("AUTOGSC_SITEMAP_PARSER", "auto")
+
+# Days after a submission to re-inspect the URL while it isn't indexed yet.
+# It becomes eligible for resubmission only once the last check still finds
+# it unindexed (AUTOGSC_VERIFY_SCHEDULE_DAYS overrides it, e.g. "1,3,7").
+DEFAULT_VERIFY_SCHEDULE_DAYS = (1, 3, 7)
+
+
+def _schedule_days(value: str) -> tuple:
+    """Parse "1,3,7"; the default unless it is positive, increasing whole days."""
+    try:
+        days = tuple(int(part) for part in value.split(",") if part.strip())
+    except ValueError:
+        return DEFAULT_VERIFY_SCHEDULE_DAYS
+    if not days or days[0] <= 0 or list(days) != sorted(set(days)):
+        return DEFAULT_VERIFY_SCHEDULE_DAYS
+    return days
+
+
+VERIFY_SCHEDULE_DAYS = _schedule_days(os.environ.get("AUTOGSC_VERIFY_SCHEDULE_DAYS", ""))
 
-# Database file for tracking submissions
-DATABASE_PATH = os.path.join(os.path.dirname(__file__), "autogsc.db")
+# How many days of indexing status history to keep (latest status per URL is always kept)
+STATUS_HISTORY_RETENTION_DAYS = 180
 
-# How many hours to wait before resubmitting a URL that failed
-RESUBMIT_AFTER_HOURS = 48
+# SaaS: days of individual submission rows to keep; older ones are rolled up
+# into per-site daily counts (AUTOGSC_SUBMISSION_RETENTION_DAYS overrides it)
+SUBMISSION_RETENTION_DAYS = int(os.environ.get("AUTOGSC_SUBMISSION_RETENTION_DAYS", "90"))
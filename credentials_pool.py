@@ -0,0 +1,154 @@
+"""
+Credentials Pool
+Several service accounts used as one, so the CLI gets the publish and
+inspection quota of every account's GCP project.
+
+Each account must be a verified owner of SITE_URL in Search Console, and
+in its own GCP project (quota is per project; two accounts from the same
+project share one). Quota is tracked per account in the quota ledger, so
+every process using the database sees the same headroom. Batches are split
+across the accounts with the most left today (reserve()); one-at-a-time
+calls rotate among accounts that still have quota (take()). N accounts
+give N times the daily quota.
+
+    pool = CredentialPool.from_files(SERVICE_ACCOUNT_FILES, SCOPES, 'indexing', 'v3',
+                                     INDEXING_API_ENDPOINT, indexing_scope, ledger)
+"""
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+from quota import QuotaLedger, QuotaReservation
+
+
+class PooledAccount:
+    """One service account: its credentials, API client and quota scope."""
+
+    def __init__(self, path: str, credentials, service, quota_scope: str):
+        self.path = path
+        self.credentials = credentials
+        self.service = service
+        self.quota_scope = quota_scope
+        # Block of quota reserved by CredentialPool.take()
+        self.block: Optional[QuotaReservation] = None
+        self.block_used = 0
+        # Day the ledger last had nothing left for this account
+        self.exhausted_on = None
+
+    @property
+    def project_id(self) -> str:
+        return getattr(self.credentials, 'project_id', None) or 'default'
+
+
+class CredentialPool:
+    """
+    Service accounts sharing the work by quota headroom.
+
+    Args:
+        accounts: The accounts (see from_files)
+        ledger: Quota ledger the accounts' scopes are tracked in
+        block: Units take() reserves at a time, so one-at-a-time calls
+            don't each cost a ledger transaction
+    """
+
+    def __init__(self, accounts: List[PooledAccount], ledger: QuotaLedger, block: int = 20):
+        if not accounts:
+            raise ValueError("CredentialPool needs at least one service account")
+        self.accounts = accounts
+        self.ledger = ledger
+        self.block = block
+        self._next = 0
+        self._lock = Lock()
+
+    @classmethod
+    def from_files(cls, paths: List[str], scopes: List[str], api: str, version: str,
+                   endpoint: str, scope_for: Callable[[str], str], ledger: QuotaLedger,
+                   block: int = 20) -> 'CredentialPool':
+        """
+        Load service account key files and build an API client for each.
+
+        Args:
+            scope_for: Quota scope for a project id (e.g. quota.indexing_scope)
+        """
+        accounts = []
+        for path in paths:
+            credentials = service_account.Credentials.from_service_account_file(path, scopes=scopes)
+            service = build(api, version, credentials=credentials,
+                            client_options={'api_endpoint': endpoint})
+            project_id = getattr(credentials, 'project_id', None) or 'default'
+            accounts.append(PooledAccount(path, credentials, service, scope_for(project_id)))
+        return cls(accounts, ledger, block)
+
+    @property
+    def scopes(self) -> List[str]:
+        """Distinct quota scopes (accounts in one project share a scope)."""
+        return list(dict.fromkeys(account.quota_scope for account in self.accounts))
+
+    @property
+    def daily_limit(self) -> int:
+        return self.ledger.limit * len(self.scopes)
+
+    def remaining(self) -> int:
+        """Units left today across all accounts."""
+        return sum(self.ledger.remaining(scope) for scope in self.scopes)
+
+    def reserve(self, units: int) -> List[Tuple[PooledAccount, QuotaReservation]]:
+        """
+        Reserve up to `units`, split across accounts, most headroom first.
+
+        Returns (account, reservation) pairs with granted > 0; commit or
+        release each reservation as with QuotaLedger.reserve().
+        """
+        grants = []
+        seen = set()
+        by_headroom = sorted(self.accounts, key=lambda a: self.ledger.remaining(a.quota_scope), reverse=True)
+        for account in by_headroom:
+            if units <= 0:
+                break
+            if account.quota_scope in seen:
+                continue
+            seen.add(account.quota_scope)
+            reservation = self.ledger.reserve(account.quota_scope, units)
+            if reservation.granted:
+                grants.append((account, reservation))
+                units -= reservation.granted
+        return grants
+
+    def take(self) -> Optional[PooledAccount]:
+        """
+        An account with quota for one more call, or None when all are out.
+
+        Accounts take turns; each holds a block of reserved units, topped up
+        from the ledger as it runs out. Call close() when done.
+        """
+        today = self.ledger.today()
+        with self._lock:
+            for _ in range(len(self.accounts)):
+                account = self.accounts[self._next]
+                self._next = (self._next + 1) % len(self.accounts)
+                if account.block is None or account.block_used >= account.block.granted:
+                    self._settle(account)
+                    if account.exhausted_on == today:
+                        continue
+                    reservation = self.ledger.reserve(account.quota_scope, self.block)
+                    if not reservation.granted:
+                        account.exhausted_on = today
+                        continue
+                    account.block = reservation
+                account.block_used += 1
+                return account
+            return None
+
+    def _settle(self, account: PooledAccount):
+        if account.block is not None:
+            account.block.commit(account.block_used)
+        account.block = None
+        account.block_used = 0
+
+    def close(self):
+        """Record what take() used and return the rest of each block."""
+        with self._lock:
+            for account in self.accounts:
+                self._settle(account)
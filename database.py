@@ -2,22 +2,107 @@
 Database Module
 SQLite storage for tracking URLs and submission history.
 """
-import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
-from config import DATABASE_PATH, RESUBMIT_AFTER_HOURS
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Dict, Any, Tuple
+from config import (
+    DATABASE_PATH, VERIFY_SCHEDULE_DAYS, STATUS_HISTORY_RETENTION_DAYS, DAILY_SUBMISSION_LIMIT,
+    SITE_URL, SYNC_DATABASE_URL,
+)
+from migrations import Migration, POSTGRES, SQLITE
+from metrics import db_write_seconds, timed
+from storage import PostgresStorage, SQLiteStorage
+
+# The write paths' dependencies (url_dict, write_behind, quota) are imported
+# where they are used, so read-only commands like `main.py status` stay fast.
+if TYPE_CHECKING:
+    from quota import QuotaLedger
+    from write_behind import WriteBehind
+
+# Statuses that make a URL eligible for submission
+NOT_INDEXED_STATUSES = (
+    'Discovered - currently not indexed',
+    'Crawled - currently not indexed',
+    'not_indexed',
+)
+
+# Normalized status codes stored in urls.status_code
+STATUS_OTHER = 0
+STATUS_INDEXED = 1
+STATUS_NOT_INDEXED = 2
+STATUS_ERROR = 3
+
+
+def status_code(indexing_status: Optional[str]) -> int:
+    """Map a raw indexing status string to its normalized status code."""
+    if indexing_status == 'indexed':
+        return STATUS_INDEXED
+    if indexing_status == 'error':
+        return STATUS_ERROR
+    if indexing_status in NOT_INDEXED_STATUSES:
+        return STATUS_NOT_INDEXED
+    return STATUS_OTHER
+
+
+def next_verification(submitted_at: int, now: int) -> Optional[int]:
+    """
+    When to next re-inspect a URL submitted at `submitted_at` (epoch
+    seconds): the first VERIFY_SCHEDULE_DAYS step after `now`, or None once
+    the schedule is used up.
+    """
+    for days in VERIFY_SCHEDULE_DAYS:
+        due = submitted_at + days * 86400
+        if due > now:
+            return due
+    return None
 
 
 def get_connection():
-    """Get database connection."""
-    return sqlite3.connect(DATABASE_PATH)
+    """Get a pooled database connection, initializing the schema on first use."""
+    return _storage.connect()
 
 
-def init_database():
-    """Initialize database tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
+_sync = None
+_sync_storage = None
+_sync_lock = threading.Lock()
+
+
+def _sync_connect():
+    """Connect to SYNC_DATABASE_URL, creating the synced tables on first use."""
+    from write_behind import create_sync_tables
+    
+    global _sync_storage
+    if _sync_storage is None:
+        storage = PostgresStorage(SYNC_DATABASE_URL, dict_rows=False)
+        with storage.transaction() as cur:
+            create_sync_tables(cur, POSTGRES)
+        _sync_storage = storage
+    return _sync_storage.connect()
+
+
+def get_sync() -> Optional['WriteBehind']:
+    """
+    Write-behind to config.SYNC_DATABASE_URL, or None when it isn't set.
     
+    Started on first use and flushed at exit.
+    """
+    global _sync
+    if not SYNC_DATABASE_URL:
+        return None
+    if _sync is None:
+        with _sync_lock:
+            if _sync is None:
+                import atexit
+                from write_behind import SUBMISSION_LOG, URL_STATUS, WriteBehind
+                _sync = WriteBehind(_sync_connect, POSTGRES, [URL_STATUS, SUBMISSION_LOG],
+                                    DATABASE_PATH + '.outbox').start()
+                atexit.register(_sync.close)
+    return _sync
+
+
+def _migration_001_base_tables(cursor, dialect):
+    """URLs, submissions and daily quota tables."""
     # URLs table - tracks all known URLs and their status
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS urls (
@@ -49,66 +134,595 @@ def init_database():
             submissions_count INTEGER DEFAULT 0
         )
     """)
+
+
+def _migration_002_status_history(cursor, dialect):
+    """Append-only log of status changes."""
+    # Status history - append-only log of status *changes* (not every check).
+    # changed_at is stored as unix epoch seconds to keep rows and indexes small.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS status_history (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL,
+            old_status TEXT,
+            new_status TEXT NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_status_history_url_time
+        ON status_history (url, changed_at)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_status_history_time
+        ON status_history (changed_at)
+    """)
+
+
+def _migration_003_stats_counters(cursor, dialect):
+    """Precomputed statistics tables."""
+    # Precomputed statistics, maintained in the same transaction as the
+    # writes they summarize so get_stats never has to scan urls.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS status_counts (
+            indexing_status TEXT PRIMARY KEY,
+            url_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # Covers the "recently submitted" range used for pending/unindexed stats
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_urls_last_submitted
+        ON urls (last_submitted, indexing_status)
+    """)
+    
+    # Backfill for databases created before the counters existed
+    cursor.execute("SELECT 1 FROM stat_counters WHERE name = 'total_submissions'")
+    if cursor.fetchone() is None:
+        _rebuild_stats(cursor)
+
+
+def _migration_004_status_code(cursor, dialect):
+    """Normalized status code plus partial indexes for the submit queue."""
+    cursor.execute("PRAGMA table_info(urls)")
+    if 'status_code' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE urls ADD COLUMN status_code INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+        UPDATE urls SET status_code = CASE
+            WHEN indexing_status = 'indexed' THEN ?
+            WHEN indexing_status = 'error' THEN ?
+            WHEN indexing_status IN (?, ?, ?) THEN ?
+            ELSE ?
+        END
+    """, (STATUS_INDEXED, STATUS_ERROR, *NOT_INDEXED_STATUSES, STATUS_NOT_INDEXED, STATUS_OTHER))
+    
+    # Submission candidates in last_checked order; covering (status_code is
+    # included so SQLite can check the WHERE without visiting the table).
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_urls_submit_queue
+        ON urls (last_checked, last_submitted, url, status_code)
+        WHERE status_code = {STATUS_NOT_INDEXED}
+    """)
+    
+    # Recently submitted, still not indexed (the "pending" stat)
+    cursor.execute("DROP INDEX IF EXISTS idx_urls_last_submitted")
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_urls_pending
+        ON urls (last_submitted)
+        WHERE status_code = {STATUS_NOT_INDEXED}
+    """)
+
+
+def _migration_005_quota_ledger(cursor, dialect):
+    """Quota ledger shared by every process using this database."""
+    from quota import create_quota_tables
+    create_quota_tables(cursor, dialect)
+
+
+def _migration_006_url_dictionary(cursor, dialect):
+    """URL strings moved to url_dict; urls, submissions and history keyed by url_id."""
+    from url_dict import build_url_map, create_url_dict_tables
+    
+    create_url_dict_tables(cursor, dialect)
+    build_url_map(cursor, dialect, """
+        SELECT url FROM urls
+        UNION SELECT url FROM submissions WHERE url IS NOT NULL
+        UNION SELECT url FROM status_history
+    """)
     
+    # url_id is the rowid: no second index on the key
+    cursor.execute("""
+        CREATE TABLE urls_by_id (
+            url_id INTEGER PRIMARY KEY,
+            indexing_status TEXT,
+            status_code INTEGER NOT NULL DEFAULT 0,
+            last_checked TIMESTAMP,
+            last_submitted TIMESTAMP,
+            submission_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO urls_by_id (url_id, indexing_status, status_code, last_checked,
+                                last_submitted, submission_count, created_at)
+        SELECT m.id, u.indexing_status, u.status_code, u.last_checked,
+               u.last_submitted, u.submission_count, u.created_at
+        FROM urls u JOIN url_map m ON m.url = u.url
+    """)
+    cursor.execute("""
+        CREATE TABLE submissions_by_id (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url_id INTEGER,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            result TEXT,
+            error_message TEXT,
+            FOREIGN KEY (url_id) REFERENCES url_dict(id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO submissions_by_id (id, url_id, submitted_at, result, error_message)
+        SELECT s.id, m.id, s.submitted_at, s.result, s.error_message
+        FROM submissions s LEFT JOIN url_map m ON m.url = s.url
+    """)
+    cursor.execute("""
+        CREATE TABLE status_history_by_id (
+            id INTEGER PRIMARY KEY,
+            url_id INTEGER NOT NULL,
+            old_status TEXT,
+            new_status TEXT NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO status_history_by_id (id, url_id, old_status, new_status, changed_at)
+        SELECT h.id, m.id, h.old_status, h.new_status, h.changed_at
+        FROM status_history h JOIN url_map m ON m.url = h.url
+    """)
+    
+    # Dropping the old tables drops their indexes too
+    for table in ('urls', 'submissions', 'status_history'):
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_by_id RENAME TO {table}")
+    cursor.execute("DROP TABLE url_map")
+    
+    cursor.execute(f"""
+        CREATE INDEX idx_urls_submit_queue
+        ON urls (last_checked, last_submitted, status_code)
+        WHERE status_code = {STATUS_NOT_INDEXED}
+    """)
+    cursor.execute(f"""
+        CREATE INDEX idx_urls_pending
+        ON urls (last_submitted)
+        WHERE status_code = {STATUS_NOT_INDEXED}
+    """)
+    cursor.execute("CREATE INDEX idx_status_history_url_time ON status_history (url_id, changed_at)")
+    cursor.execute("CREATE INDEX idx_status_history_time ON status_history (changed_at)")
+
+
+def _migration_007_verifications(cursor, dialect):
+    """Re-inspection schedule for submitted URLs."""
+    # One row per URL, for its latest successful submission. next_check is
+    # NULL once the URL was seen indexed (indexed_at) or the schedule ran out.
+    cursor.execute("""
+        CREATE TABLE verifications (
+            url_id INTEGER PRIMARY KEY,
+            submitted_at INTEGER NOT NULL,
+            next_check INTEGER,
+            indexed_at INTEGER
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_verifications_due
+        ON verifications (next_check)
+        WHERE next_check IS NOT NULL
+    """)
+    
+    # Resubmission now waits on the schedule, not on last_submitted
+    cursor.execute("DROP INDEX IF EXISTS idx_urls_pending")
+    
+    # Successful submissions still inside the schedule carry on from where
+    # they are (last_submitted is set by failed attempts too, so the URL's
+    # latest submissions row decides, as in record_submission)
+    now = int(time.time())
+    since = datetime.now() - timedelta(days=max(VERIFY_SCHEDULE_DAYS, default=0))
+    cursor.execute(f"""
+        SELECT u.url_id, u.last_submitted FROM urls u
+        JOIN (SELECT url_id, MAX(id) AS id FROM submissions GROUP BY url_id) latest
+            ON latest.url_id = u.url_id
+        JOIN submissions s ON s.id = latest.id
+        WHERE u.status_code = {STATUS_NOT_INDEXED}
+        AND u.last_submitted >= ?
+        AND s.result = 'success'
+    """, (since,))
+    rows = []
+    for submitted_id, last_submitted in cursor.fetchall():
+        submitted_at = int(datetime.fromisoformat(str(last_submitted)).timestamp())
+        rows.append((submitted_id, submitted_at, next_verification(submitted_at, now)))
+    cursor.executemany("""
+        INSERT INTO verifications (url_id, submitted_at, next_check) VALUES (?, ?, ?)
+    """, rows)
+
+
+def _migration_008_normalized_urls(cursor, dialect):
+    """Re-key URLs stored before sitemap normalization under their normalized form."""
+    cursor.execute("""
+        SELECT u.url_id, d.url, u.indexing_status FROM urls u
+        JOIN url_dict d ON d.id = u.url_id
+    """)
+    rows = cursor.fetchall()
+    if not rows:
+        return
+    # Only needed when there is something to re-key (sitemap_parser pulls
+    # in requests, which a fresh `status` shouldn't pay for)
+    from sitemap_parser import normalize_url
+    from url_dict import url_id
+    
+    for old_id, url, indexing_status in rows:
+        try:
+            normalized = normalize_url(url)
+        except ValueError:
+            normalized = None
+        if normalized == url:
+            continue
+        new_id = url_id(cursor, normalized, SQLITE) if normalized is not None else None
+        if new_id is not None:
+            cursor.execute("SELECT 1 FROM urls WHERE url_id = ?", (new_id,))
+        if new_id is None or cursor.fetchone() is not None:
+            # Malformed (scans skip it now) or a duplicate of a URL already
+            # tracked in normalized form: retire the row, or `submit` would
+            # keep resubmitting a URL no scan updates any more. Its history
+            # and submissions stay, under the old id.
+            cursor.execute("DELETE FROM urls WHERE url_id = ?", (old_id,))
+            cursor.execute("DELETE FROM verifications WHERE url_id = ?", (old_id,))
+            if indexing_status is not None:
+                _adjust_status_count(cursor, indexing_status, -1)
+            continue
+        for table in ('urls', 'status_history', 'submissions', 'verifications'):
+            cursor.execute(f"UPDATE {table} SET url_id = ? WHERE url_id = ?", (new_id, old_id))
+
+
+# Append new migrations; never edit or reorder applied ones.
+MIGRATIONS = [
+    Migration(1, "base tables", _migration_001_base_tables),
+    Migration(2, "status history", _migration_002_status_history),
+    Migration(3, "stats counters", _migration_003_stats_counters),
+    Migration(4, "status code and submit queue indexes", _migration_004_status_code),
+    Migration(5, "quota ledger", _migration_005_quota_ledger),
+    Migration(6, "url dictionary", _migration_006_url_dictionary),
+    Migration(7, "verification schedule", _migration_007_verifications),
+    Migration(8, "normalized urls", _migration_008_normalized_urls),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+# Pooled connections; the schema is migrated on first connect
+_storage = SQLiteStorage(DATABASE_PATH, MIGRATIONS)
+
+
+def init_database():
+    """
+    Initialize database tables by applying any pending migrations.
+    
+    Returns the migration versions applied (empty when already current).
+    """
+    return _storage.migrate()
+
+
+def get_quota_ledger(limit: int = DAILY_SUBMISSION_LIMIT) -> 'QuotaLedger':
+    """Get the quota ledger stored in the CLI database (`limit` per scope per day)."""
+    from quota import QuotaLedger
+    return QuotaLedger(get_connection, SQLITE, limit)
+
+
+def _rebuild_stats(cursor):
+    """Recompute the precomputed statistics tables from scratch."""
+    cursor.execute("DELETE FROM status_counts")
+    cursor.execute("""
+        INSERT INTO status_counts (indexing_status, url_count)
+        SELECT indexing_status, COUNT(*) FROM urls
+        WHERE indexing_status IS NOT NULL
+        GROUP BY indexing_status
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO stat_counters (name, value)
+        SELECT 'total_submissions', COUNT(*) FROM submissions
+    """)
+
+
+def rebuild_stats():
+    """Recompute precomputed statistics (e.g. after editing the DB by hand)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    _rebuild_stats(cursor)
     conn.commit()
     conn.close()
 
 
+def _adjust_status_count(cursor, indexing_status: str, delta: int):
+    """Add `delta` to the precomputed URL count for a status."""
+    cursor.execute("""
+        INSERT INTO status_counts (indexing_status, url_count)
+        VALUES (?, ?)
+        ON CONFLICT(indexing_status) DO UPDATE SET
+            url_count = url_count + excluded.url_count
+    """, (indexing_status, delta))
+
+
+def _last_recorded_status(cursor, url_id: int) -> Optional[str]:
+    """Get the most recent status recorded in the history log for a URL."""
+    cursor.execute("""
+        SELECT new_status FROM status_history
+        WHERE url_id = ?
+        ORDER BY changed_at DESC, id DESC
+        LIMIT 1
+    """, (url_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _upsert_url(cursor, url_id: int, indexing_status: str, now: datetime):
+    """Write one URL's status, its history and the status counts."""
+    cursor.execute("SELECT indexing_status FROM urls WHERE url_id = ?", (url_id,))
+    row = cursor.fetchone()
+    current = row[0] if row else None
+    
+    # Log transitions only. 'error' means the check failed, not that the
+    # status changed, so it never enters the history.
+    if indexing_status != 'error':
+        previous = _last_recorded_status(cursor, url_id)
+        if previous != indexing_status:
+            cursor.execute("""
+                INSERT INTO status_history (url_id, old_status, new_status, changed_at)
+                VALUES (?, ?, ?, ?)
+            """, (url_id, previous, indexing_status, int(now.timestamp())))
+    
+    cursor.execute("""
+        INSERT INTO urls (url_id, indexing_status, status_code, last_checked)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(url_id) DO UPDATE SET
+            indexing_status = excluded.indexing_status,
+            status_code = excluded.status_code,
+            last_checked = excluded.last_checked
+    """, (url_id, indexing_status, status_code(indexing_status), now))
+    
+    if current != indexing_status:
+        if current is not None:
+            _adjust_status_count(cursor, current, -1)
+        _adjust_status_count(cursor, indexing_status, 1)
+    
+    if indexing_status != 'error':
+        _advance_verification(cursor, url_id, indexing_status, int(now.timestamp()))
+
+
+def _advance_verification(cursor, url_id: int, indexing_status: str, now: int):
+    """
+    Count an inspection towards the URL's verification schedule, whether it
+    came from `verify` or a full scan. Indexed ends the schedule and records
+    when; not indexed moves it on to the next step, once the current one is due.
+    """
+    cursor.execute("""
+        SELECT submitted_at, next_check FROM verifications
+        WHERE url_id = ? AND next_check IS NOT NULL
+    """, (url_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    submitted_at, next_check = row
+    if indexing_status == 'indexed':
+        cursor.execute("""
+            UPDATE verifications SET indexed_at = ?, next_check = NULL
+            WHERE url_id = ?
+        """, (now, url_id))
+    elif now >= next_check:
+        cursor.execute("""
+            UPDATE verifications SET next_check = ?
+            WHERE url_id = ?
+        """, (next_verification(submitted_at, now), url_id))
+
+
+@timed(db_write_seconds('upsert_url'))
 def upsert_url(url: str, indexing_status: str):
     """Insert or update a URL's indexing status."""
+    _write_statuses([(url, indexing_status)])
+
+
+@timed(db_write_seconds('upsert_urls'))
+def upsert_urls(statuses: Iterable[Tuple[str, str]]):
+    """
+    Insert or update the indexing status of many URLs in one transaction.
+    
+    Args:
+        statuses: (url, indexing_status) pairs
+    """
+    _write_statuses(list(statuses))
+
+
+def _write_statuses(statuses: List[Tuple[str, str]]):
+    if not statuses:
+        return
+    from url_dict import url_ids
+    
+    now = datetime.now()
+    with _storage.transaction() as cursor:
+        ids = url_ids(cursor, (url for url, _ in statuses), SQLITE)
+        for url, indexing_status in statuses:
+            _upsert_url(cursor, ids[url], indexing_status, now)
+    
+    sync = get_sync()
+    if sync is not None:
+        from write_behind import URL_STATUS
+        checked_at = now.isoformat()
+        sync.put_many(URL_STATUS, ((SITE_URL, url, status, checked_at) for url, status in statuses))
+
+
+def iter_unindexed_urls(limit: Optional[int] = None, batch_size: int = 500) -> Iterator[str]:
+    """
+    Stream URLs that are not indexed and not awaiting verification of an
+    earlier submission, least recently checked first.
+    
+    Rows are read off the partial submit-queue index in batches of
+    `batch_size`, so memory stays flat however many candidates there are.
+    """
+    rows = _storage.iter_rows(f"""
+        SELECT d.url FROM urls u
+        JOIN url_dict d ON d.id = u.url_id
+        WHERE u.status_code = {STATUS_NOT_INDEXED}
+        AND NOT EXISTS (
+            SELECT 1 FROM verifications v
+            WHERE v.url_id = u.url_id AND v.next_check IS NOT NULL
+        )
+        ORDER BY u.last_checked ASC
+        LIMIT ?
+    """, (-1 if limit is None else limit,), batch_size)
+    for row in rows:
+        yield row[0]
+
+
+def get_unindexed_urls(limit: Optional[int] = None) -> List[str]:
+    """Get URLs that are not indexed and not awaiting verification."""
+    return list(iter_unindexed_urls(limit))
+
+
+def _count_awaiting_verification(cursor) -> int:
+    """Not-indexed URLs still inside their verification schedule."""
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM verifications v
+        JOIN urls u ON u.url_id = v.url_id
+        WHERE v.next_check IS NOT NULL
+        AND u.status_code = {STATUS_NOT_INDEXED}
+    """)
+    return cursor.fetchone()[0]
+
+
+def count_unindexed_urls() -> int:
+    """Count URLs that are not indexed and not awaiting verification."""
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        INSERT INTO urls (url, indexing_status, last_checked)
-        VALUES (?, ?, ?)
-        ON CONFLICT(url) DO UPDATE SET
-            indexing_status = excluded.indexing_status,
-            last_checked = excluded.last_checked
-    """, (url, indexing_status, datetime.now()))
+    cursor.execute(f"SELECT COUNT(*) FROM urls WHERE status_code = {STATUS_NOT_INDEXED}")
+    count = cursor.fetchone()[0] - _count_awaiting_verification(cursor)
     
-    conn.commit()
     conn.close()
+    return count
+
+
+def iter_due_verifications(limit: Optional[int] = None) -> Iterator[str]:
+    """Stream submitted URLs whose next re-inspection is due, most overdue first."""
+    rows = _storage.iter_rows("""
+        SELECT d.url FROM verifications v
+        JOIN url_dict d ON d.id = v.url_id
+        WHERE v.next_check IS NOT NULL AND v.next_check <= ?
+        ORDER BY v.next_check ASC
+        LIMIT ?
+    """, (int(time.time()), -1 if limit is None else limit))
+    for row in rows:
+        yield row[0]
 
 
-def get_unindexed_urls() -> List[str]:
-    """Get all URLs that are not indexed and haven't been submitted recently."""
+def get_due_verifications(limit: Optional[int] = None) -> List[str]:
+    """Get submitted URLs whose next re-inspection is due."""
+    return list(iter_due_verifications(limit))
+
+
+def get_awaiting_verification() -> set:
+    """URLs submitted recently enough that their verification isn't over."""
+    rows = _storage.iter_rows("""
+        SELECT d.url FROM verifications v
+        JOIN url_dict d ON d.id = v.url_id
+        WHERE v.next_check IS NOT NULL
+    """)
+    return {row[0] for row in rows}
+
+
+def get_verification_summary(since_days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    How submissions (of the last `since_days` days, or all) turned out:
+    'awaiting' verification, of which 'due' now; 'indexed', and by which
+    schedule step ('indexed_by_day', {days: count}; later finds, e.g. by a
+    full scan, count under the last step); 'not_indexed' after the whole
+    schedule; and 'median_hours' from submission to being seen indexed.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
-    cutoff_time = datetime.now() - timedelta(hours=RESUBMIT_AFTER_HOURS)
-    
+    now = int(time.time())
+    since = 0 if since_days is None else now - since_days * 86400
     cursor.execute("""
-        SELECT url FROM urls
-        WHERE indexing_status IN ('Discovered - currently not indexed', 
-                                   'Crawled - currently not indexed',
-                                   'not_indexed')
-        AND (last_submitted IS NULL OR last_submitted < ?)
-        ORDER BY last_checked ASC
-    """, (cutoff_time,))
-    
-    urls = [row[0] for row in cursor.fetchall()]
+        SELECT submitted_at, next_check, indexed_at FROM verifications
+        WHERE submitted_at >= ?
+    """, (since,))
+    
+    summary = {
+        "awaiting": 0, "due": 0, "indexed": 0, "not_indexed": 0,
+        "indexed_by_day": {days: 0 for days in VERIFY_SCHEDULE_DAYS},
+        "median_hours": None,
+    }
+    hours = []
+    for submitted_at, next_check, indexed_at in cursor.fetchall():
+        if indexed_at is not None:
+            summary["indexed"] += 1
+            hours.append((indexed_at - submitted_at) / 3600)
+            step = next((days for days in VERIFY_SCHEDULE_DAYS
+                         if indexed_at <= submitted_at + days * 86400), VERIFY_SCHEDULE_DAYS[-1])
+            summary["indexed_by_day"][step] += 1
+        elif next_check is not None:
+            summary["awaiting"] += 1
+            summary["due"] += next_check <= now
+        else:
+            summary["not_indexed"] += 1
     conn.close()
-    return urls
+    
+    if hours:
+        hours.sort()
+        middle = len(hours) // 2
+        summary["median_hours"] = hours[middle] if len(hours) % 2 else (hours[middle - 1] + hours[middle]) / 2
+    return summary
 
 
+@timed(db_write_seconds('record_submission'))
 def record_submission(url: str, result: str, error_message: Optional[str] = None):
     """Record a submission attempt."""
+    from url_dict import url_id
+    
     conn = get_connection()
     cursor = conn.cursor()
+    submitted_id = url_id(cursor, url, SQLITE)
     
     # Log the submission
     cursor.execute("""
-        INSERT INTO submissions (url, result, error_message)
+        INSERT INTO submissions (url_id, result, error_message)
         VALUES (?, ?, ?)
-    """, (url, result, error_message))
+    """, (submitted_id, result, error_message))
     
     # Update the URL record
     cursor.execute("""
         UPDATE urls 
         SET last_submitted = ?, submission_count = submission_count + 1
-        WHERE url = ?
-    """, (datetime.now(), url))
+        WHERE url_id = ?
+    """, (datetime.now(), submitted_id))
+    
+    # Start (or restart) its verification schedule
+    if result == 'success':
+        submitted_at = int(time.time())
+        cursor.execute("""
+            INSERT INTO verifications (url_id, submitted_at, next_check, indexed_at)
+            VALUES (?, ?, ?, NULL)
+            ON CONFLICT(url_id) DO UPDATE SET
+                submitted_at = excluded.submitted_at,
+                next_check = excluded.next_check,
+                indexed_at = NULL
+        """, (submitted_id, submitted_at, next_verification(submitted_at, submitted_at)))
+    
+    cursor.execute("""
+        UPDATE stat_counters SET value = value + 1
+        WHERE name = 'total_submissions'
+    """)
     
     # Update daily quota
     today = datetime.now().strftime("%Y-%m-%d")
@@ -121,6 +735,11 @@ def record_submission(url: str, result: str, error_message: Optional[str] = None
     
     conn.commit()
     conn.close()
+    
+    sync = get_sync()
+    if sync is not None:
+        from write_behind import SUBMISSION_LOG
+        sync.put(SUBMISSION_LOG, (SITE_URL, url, result, error_message, datetime.now().isoformat()))
 
 
 def get_today_submission_count() -> int:
@@ -137,6 +756,16 @@ def get_today_submission_count() -> int:
     return row[0] if row else 0
 
 
+def get_status_counts() -> Dict[str, int]:
+    """Get the number of URLs per indexing status."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT indexing_status, url_count FROM status_counts WHERE url_count > 0")
+    counts = {r[0]: r[1] for r in cursor.fetchall()}
+    conn.close()
+    return counts
+
+
 def get_stats() -> Dict[str, Any]:
     """Get overall statistics."""
     conn = get_connection()
@@ -144,46 +773,160 @@ def get_stats() -> Dict[str, Any]:
     
     stats = {}
     
+    cursor.execute("SELECT indexing_status, url_count FROM status_counts")
+    counts = dict(cursor.fetchall())
+    
     # Total URLs
-    cursor.execute("SELECT COUNT(*) FROM urls")
-    stats["total_urls"] = cursor.fetchone()[0]
+    stats["total_urls"] = sum(counts.values())
     
     # Indexed URLs
-    cursor.execute("SELECT COUNT(*) FROM urls WHERE indexing_status = 'indexed'")
-    stats["indexed"] = cursor.fetchone()[0]
-    
-    # Pending - submitted recently but still not indexed
-    cutoff_time = datetime.now() - timedelta(hours=RESUBMIT_AFTER_HOURS)
-    cursor.execute("""
-        SELECT COUNT(*) FROM urls 
-        WHERE indexing_status IN ('Discovered - currently not indexed', 
-                                   'Crawled - currently not indexed',
-                                   'not_indexed')
-        AND last_submitted IS NOT NULL 
-        AND last_submitted >= ?
-    """, (cutoff_time,))
-    stats["pending"] = cursor.fetchone()[0]
-    
-    # Unindexed URLs (not yet submitted or submission expired)
-    cursor.execute("""
-        SELECT COUNT(*) FROM urls 
-        WHERE indexing_status IN ('Discovered - currently not indexed', 
-                                   'Crawled - currently not indexed',
-                                   'not_indexed')
-        AND (last_submitted IS NULL OR last_submitted < ?)
-    """, (cutoff_time,))
-    stats["unindexed"] = cursor.fetchone()[0]
+    stats["indexed"] = counts.get('indexed', 0)
+    
+    # Pending - submitted and still inside the verification schedule. Only
+    # touches open verifications, via idx_verifications_due.
+    stats["pending"] = _count_awaiting_verification(cursor)
+    
+    # Unindexed URLs (not yet submitted, or not indexed after verification)
+    not_indexed_total = sum(counts.get(s, 0) for s in NOT_INDEXED_STATUSES)
+    stats["unindexed"] = not_indexed_total - stats["pending"]
     
     # Today's submissions
     stats["today_submissions"] = get_today_submission_count()
     
     # Total submissions all time
-    cursor.execute("SELECT COUNT(*) FROM submissions")
-    stats["total_submissions"] = cursor.fetchone()[0]
+    cursor.execute("SELECT value FROM stat_counters WHERE name = 'total_submissions'")
+    row = cursor.fetchone()
+    stats["total_submissions"] = row[0] if row else 0
     
     conn.close()
     return stats
 
 
-# Initialize database on import
-init_database()
+def get_status_history(url: str) -> List[Dict[str, Any]]:
+    """Get the status transitions recorded for a URL, oldest first."""
+    from url_dict import url_id
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT old_status, new_status, changed_at FROM status_history
+        WHERE url_id = ?
+        ORDER BY changed_at ASC, id ASC
+    """, (url_id(cursor, url, SQLITE, create=False),))
+    
+    history = [
+        {
+            "old_status": r[0],
+            "new_status": r[1],
+            "changed_at": datetime.fromtimestamp(r[2]),
+        }
+        for r in cursor.fetchall()
+    ]
+    conn.close()
+    return history
+
+
+def get_time_to_index(since_days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Get how long submitted URLs took to become indexed.
+    
+    Returns one entry per URL that transitioned to 'indexed' after its last
+    submission, with 'submitted_at', 'indexed_at' and 'hours'.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    since = 0
+    if since_days is not None:
+        since = int(time.time()) - since_days * 86400
+    
+    # The first 'indexed' transition at or after the last submission, so a
+    # URL that was indexed before, dropped out and was resubmitted counts
+    # too. last_submitted is local time; changed_at is epoch seconds.
+    cursor.execute("""
+        SELECT d.url, u.last_submitted, MIN(h.changed_at)
+        FROM status_history h
+        JOIN urls u ON u.url_id = h.url_id
+        JOIN url_dict d ON d.id = h.url_id
+        WHERE h.new_status = 'indexed'
+        AND h.changed_at >= ?
+        AND u.last_submitted IS NOT NULL
+        AND h.changed_at >= CAST(strftime('%s', u.last_submitted, 'utc') AS INTEGER)
+        GROUP BY h.url_id
+    """, (since,))
+    
+    results = []
+    for url, last_submitted, indexed_ts in cursor.fetchall():
+        submitted_at = datetime.fromisoformat(str(last_submitted)).replace(microsecond=0)
+        indexed_at = datetime.fromtimestamp(indexed_ts)
+        results.append({
+            "url": url,
+            "submitted_at": submitted_at,
+            "indexed_at": indexed_at,
+            "hours": (indexed_at - submitted_at).total_seconds() / 3600,
+        })
+    
+    conn.close()
+    return results
+
+
+def get_regressions(since_days: int = 7) -> List[Dict[str, Any]]:
+    """Get URLs that dropped out of the index within the last `since_days` days."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    since = int(time.time()) - since_days * 86400
+    cursor.execute("""
+        SELECT d.url, h.old_status, h.new_status, h.changed_at
+        FROM status_history h
+        JOIN url_dict d ON d.id = h.url_id
+        WHERE h.changed_at >= ?
+        AND h.old_status = 'indexed'
+        AND h.new_status != 'indexed'
+        ORDER BY h.changed_at DESC
+    """, (since,))
+    
+    regressions = [
+        {
+            "url": r[0],
+            "old_status": r[1],
+            "new_status": r[2],
+            "changed_at": datetime.fromtimestamp(r[3]),
+        }
+        for r in cursor.fetchall()
+    ]
+    conn.close()
+    return regressions
+
+
+@timed(db_write_seconds('compact_status_history'))
+def compact_status_history(retention_days: int = STATUS_HISTORY_RETENTION_DAYS) -> int:
+    """
+    Drop history older than the retention window.
+    
+    The most recent transition of every URL is always kept so its current
+    state stays known. Returns the number of rows deleted.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cutoff = int(time.time()) - retention_days * 86400
+    # Only rows older than the cutoff are visited (idx_status_history_time);
+    # "a later row exists" is one probe of idx_status_history_url_time each.
+    cursor.execute("""
+        DELETE FROM status_history
+        WHERE changed_at < ?
+        AND EXISTS (
+            SELECT 1 FROM status_history later
+            WHERE later.url_id = status_history.url_id
+            AND (later.changed_at > status_history.changed_at
+                 OR (later.changed_at = status_history.changed_at AND later.id > status_history.id))
+        )
+    """, (cutoff,))
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    return deleted
+
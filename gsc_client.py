@@ -2,13 +2,15 @@
 Google Search Console API Client
 Checks indexing status of URLs via the URL Inspection API.
 """
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from typing import Optional, Dict
 from rich.console import Console
 
-from config import SERVICE_ACCOUNT_FILE, SITE_URL
+from config import SERVICE_ACCOUNT_FILES, SITE_URL, GSC_API_ENDPOINT, INSPECTION_DAILY_LIMIT
+from credentials_pool import CredentialPool
+from database import get_quota_ledger
+from metrics import INSPECT_ERRORS, INSPECT_SECONDS, timed
+from quota import inspection_scope
 
 console = Console()
 
@@ -17,26 +19,58 @@ SCOPES = ['https://www.googleapis.com/auth/webmasters.readonly']
 
 
 class GSCClient:
-    """Google Search Console API Client."""
+    """
+    Google Search Console API Client.
     
-    def __init__(self):
+    With several service accounts (config.SERVICE_ACCOUNT_FILES),
+    inspections rotate among the accounts that have inspection quota left.
+    
+    Warnings during a run go to `reporter` (set by pipeline.check_urls) so
+    they reach the run's output, e.g. a dashboard job's log; to the console
+    when there is none.
+    """
+    
+    def __init__(self, reporter=None):
+        self.reporter = reporter
         self.credentials = None
         self.service = None
+        self.pool = None
+        self._quota_warned = False
         self._authenticate()
     
     def _authenticate(self):
-        """Authenticate with Google APIs using service account."""
+        """Authenticate with Google APIs using the service account(s)."""
         try:
-            self.credentials = service_account.Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE,
-                scopes=SCOPES
+            self.pool = CredentialPool.from_files(
+                SERVICE_ACCOUNT_FILES, SCOPES, 'searchconsole', 'v1', GSC_API_ENDPOINT,
+                lambda project_id: inspection_scope(project_id, SITE_URL),
+                get_quota_ledger(INSPECTION_DAILY_LIMIT),
             )
-            self.service = build('searchconsole', 'v1', credentials=self.credentials)
-            console.print("[green]✓ Connected to Google Search Console API[/green]")
+            self.credentials = self.pool.accounts[0].credentials
+            self.service = self.pool.accounts[0].service
+            accounts = len(self.pool.accounts)
+            suffix = f" ({accounts} service accounts)" if accounts > 1 else ""
+            console.print(f"[green]✓ Connected to Google Search Console API{suffix}[/green]")
         except Exception as e:
             console.print(f"[red]Failed to authenticate with GSC: {e}[/red]")
             raise
     
+    def _warn(self, message: str, style: str = 'yellow'):
+        if self.reporter is not None:
+            self.reporter.warning(message)
+        else:
+            console.print(f"[{style}]{message}[/{style}]")
+    
+    def close(self):
+        """
+        Record inspection quota used so far (see CredentialPool.take).
+        Ends a run: the next run on this (shared) client warns again when
+        quota runs out.
+        """
+        self.pool.close()
+        self._quota_warned = False
+    
+    @timed(INSPECT_SECONDS)
     def inspect_url(self, url: str) -> Optional[Dict]:
         """
         Inspect a URL to check its indexing status.
@@ -45,13 +79,20 @@ class GSCClient:
         - verdict: 'PASS', 'PARTIAL', 'FAIL', 'NEUTRAL'
         - coverageState: 'Submitted and indexed', 'Discovered - currently not indexed', etc.
         """
+        account = self.pool.take()
+        if account is None:
+            if not self._quota_warned:
+                self._quota_warned = True
+                self._warn("Daily inspection quota exhausted for every service account")
+            return None
+        
         try:
             request_body = {
                 'inspectionUrl': url,
                 'siteUrl': SITE_URL
             }
             
-            response = self.service.urlInspection().index().inspect(
+            response = account.service.urlInspection().index().inspect(
                 body=request_body
             ).execute()
             
@@ -69,10 +110,12 @@ class GSCClient:
             }
             
         except HttpError as e:
-            console.print(f"[red]Error inspecting URL {url}: {e}[/red]")
+            INSPECT_ERRORS.inc()
+            self._warn(f"Error inspecting URL {url}: {e}", 'red')
             return None
         except Exception as e:
-            console.print(f"[red]Unexpected error inspecting {url}: {e}[/red]")
+            INSPECT_ERRORS.inc()
+            self._warn(f"Unexpected error inspecting {url}: {e}", 'red')
             return None
     
     def get_indexing_status(self, url: str) -> str:
@@ -101,7 +144,7 @@ class GSCClient:
             response = self.service.sitemaps().list(siteUrl=SITE_URL).execute()
             return response.get('sitemap', [])
         except HttpError as e:
-            console.print(f"[red]Error listing sitemaps: {e}[/red]")
+            self._warn(f"Error listing sitemaps: {e}", 'red')
             return []
 
 
@@ -2,15 +2,18 @@
 Google Indexing API Client
 Submits URLs for indexing via the Indexing API.
 """
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from typing import List, Dict, Tuple
+from contextlib import nullcontext
+from typing import Callable, List, Dict, Optional, Tuple
+import time
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from config import SERVICE_ACCOUNT_FILE, DAILY_SUBMISSION_LIMIT
-from database import get_today_submission_count, record_submission
+from config import SERVICE_ACCOUNT_FILES, INDEXING_API_ENDPOINT
+from credentials_pool import CredentialPool
+from database import record_submission, get_quota_ledger
+from quota import indexing_scope
+from metrics import SUBMIT_ERRORS, SUBMIT_SECONDS, timed
 
 console = Console()
 
@@ -19,33 +22,64 @@ SCOPES = ['https://www.googleapis.com/auth/indexing']
 
 
 class IndexingClient:
-    """Google Indexing API Client."""
+    """
+    Google Indexing API Client.
     
-    def __init__(self):
+    With several service accounts (config.SERVICE_ACCOUNT_FILES), publish
+    quota is pooled: each batch is split across the accounts' projects.
+    
+    Warnings during a run go to `reporter` (set by pipeline.submit_urls) so
+    they reach the run's output, e.g. a dashboard job's log; to the console
+    when there is none.
+    """
+    
+    def __init__(self, reporter=None):
+        self.reporter = reporter
         self.credentials = None
         self.service = None
+        self.pool = None
         self._authenticate()
+        
+        # Publish quota is per GCP project, shared by every process using it
+        self.quota_scope = self.pool.accounts[0].quota_scope
+        self.ledger = self.pool.ledger
     
     def _authenticate(self):
-        """Authenticate with Google Indexing API using service account."""
+        """Authenticate with Google Indexing API using the service account(s)."""
         try:
-            self.credentials = service_account.Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE,
-                scopes=SCOPES
+            self.pool = CredentialPool.from_files(
+                SERVICE_ACCOUNT_FILES, SCOPES, 'indexing', 'v3', INDEXING_API_ENDPOINT,
+                indexing_scope, get_quota_ledger(),
             )
-            self.service = build('indexing', 'v3', credentials=self.credentials)
-            console.print("[green]✓ Connected to Google Indexing API[/green]")
+            self.credentials = self.pool.accounts[0].credentials
+            self.service = self.pool.accounts[0].service
+            accounts = len(self.pool.accounts)
+            suffix = f" ({accounts} service accounts)" if accounts > 1 else ""
+            console.print(f"[green]✓ Connected to Google Indexing API{suffix}[/green]")
         except Exception as e:
             console.print(f"[red]Failed to authenticate with Indexing API: {e}[/red]")
             raise
     
-    def submit_url(self, url: str, action: str = "URL_UPDATED") -> Tuple[bool, str]:
+    def _warn(self, message: str, style: str = 'yellow'):
+        if self.reporter is not None:
+            self.reporter.warning(message)
+        else:
+            console.print(f"[{style}]{message}[/{style}]")
+    
+    @property
+    def daily_limit(self) -> int:
+        """Publish calls allowed per day across all pooled projects."""
+        return self.pool.daily_limit
+    
+    @timed(SUBMIT_SECONDS)
+    def submit_url(self, url: str, action: str = "URL_UPDATED", service=None) -> Tuple[bool, str]:
         """
         Submit a single URL for indexing.
         
         Args:
             url: The URL to submit
             action: 'URL_UPDATED' (request indexing) or 'URL_DELETED' (request removal)
+            service: API client of the pooled account to use (default: the first)
         
         Returns:
             Tuple of (success: bool, message: str)
@@ -56,7 +90,7 @@ class IndexingClient:
                 'type': action
             }
             
-            response = self.service.urlNotifications().publish(body=body).execute()
+            response = (service or self.service).urlNotifications().publish(body=body).execute()
             
             # Record successful submission
             record_submission(url, 'success')
@@ -64,32 +98,34 @@ class IndexingClient:
             return True, f"Submitted: {response.get('urlNotificationMetadata', {}).get('url', url)}"
             
         except HttpError as e:
+            SUBMIT_ERRORS.inc()
             error_msg = str(e)
             record_submission(url, 'error', error_msg)
             return False, f"HTTP Error: {error_msg}"
         except Exception as e:
+            SUBMIT_ERRORS.inc()
             error_msg = str(e)
             record_submission(url, 'error', error_msg)
             return False, f"Error: {error_msg}"
     
     def get_remaining_quota(self) -> int:
-        """Get remaining submissions allowed today."""
-        used = get_today_submission_count()
-        return max(0, DAILY_SUBMISSION_LIMIT - used)
+        """Get remaining submissions allowed today (informational; see submit_batch)."""
+        return self.pool.remaining()
     
-    def submit_batch(self, urls: List[str], dry_run: bool = False) -> Dict:
+    def submit_batch(self, urls: List[str], dry_run: bool = False,
+                     on_result: Optional[Callable] = None) -> Dict:
         """
         Submit multiple URLs for indexing, respecting daily limit.
         
         Args:
             urls: List of URLs to submit
             dry_run: If True, don't actually submit, just show what would be done
+            on_result: Called as on_result(url, success, message, seconds) for
+                each URL instead of printing it (no progress bar either)
         
         Returns:
             Dict with 'submitted', 'failed', 'skipped' counts
         """
-        remaining_quota = self.get_remaining_quota()
-        
         results = {
             'submitted': 0,
             'failed': 0,
@@ -97,50 +133,85 @@ class IndexingClient:
             'errors': []
         }
         
-        if remaining_quota == 0:
-            console.print("[yellow]Daily quota exhausted. No more submissions allowed today.[/yellow]")
+        if not urls:
+            return results
+        
+        if dry_run:
+            # Nothing is spent, so don't hold a reservation
+            grants = []
+            granted = min(len(urls), self.get_remaining_quota())
+        else:
+            # Atomically claim quota before submitting, so concurrent runs
+            # never overshoot the daily limit; split across pooled accounts
+            grants = self.pool.reserve(len(urls))
+            granted = sum(reservation.granted for _, reservation in grants)
+        
+        if granted == 0:
+            self._warn("Daily quota exhausted. No more submissions allowed today.")
             results['skipped'] = len(urls)
             return results
         
-        # Only process up to remaining quota
-        urls_to_process = urls[:remaining_quota]
+        # Only process up to the granted quota
+        urls_to_process = urls[:granted]
         skipped_count = len(urls) - len(urls_to_process)
         
         if skipped_count > 0:
-            console.print(f"[yellow]Will skip {skipped_count} URLs due to daily limit[/yellow]")
+            self._warn(f"Will skip {skipped_count} URLs due to daily limit")
             results['skipped'] = skipped_count
         
         if dry_run:
-            console.print("[cyan]DRY RUN - No actual submissions will be made[/cyan]")
+            if self.reporter is not None:
+                self.reporter.message("[cyan]DRY RUN - No actual submissions will be made[/cyan]")
+            else:
+                console.print("[cyan]DRY RUN - No actual submissions will be made[/cyan]")
             for url in urls_to_process:
-                console.print(f"  Would submit: {url}")
+                if on_result:
+                    on_result(url, True, 'dry run', 0.0)
+                else:
+                    console.print(f"  Would submit: {url}")
             results['submitted'] = len(urls_to_process)
             return results
         
-        # Submit with progress bar
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            task = progress.add_task("Submitting URLs...", total=len(urls_to_process))
-            
-            for url in urls_to_process:
-                success, message = self.submit_url(url)
-                
-                if success:
-                    results['submitted'] += 1
-                    console.print(f"[green]✓[/green] {url}")
-                else:
-                    results['failed'] += 1
-                    results['errors'].append({'url': url, 'error': message})
-                    console.print(f"[red]✗[/red] {url}: {message}")
+        # Each account's share of the URLs, in order
+        assignments = []
+        for account, reservation in grants:
+            assignments.extend([(account, reservation)] * reservation.granted)
+        attempted = {id(reservation): 0 for _, reservation in grants}
+        try:
+            # Submit with progress bar (unless the caller reports progress)
+            with (nullcontext() if on_result else Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=console
+            )) as progress:
+                task = progress.add_task("Submitting URLs...", total=len(urls_to_process)) if progress else None
                 
-                progress.advance(task)
+                for url, (account, reservation) in zip(urls_to_process, assignments):
+                    started = time.perf_counter()
+                    success, message = self.submit_url(url, service=account.service)
+                    attempted[id(reservation)] += 1
+                    
+                    if success:
+                        results['submitted'] += 1
+                    else:
+                        results['failed'] += 1
+                        results['errors'].append({'url': url, 'error': message})
+                    
+                    if on_result:
+                        on_result(url, success, message, time.perf_counter() - started)
+                    else:
+                        if success:
+                            console.print(f"[green]✓[/green] {url}")
+                        else:
+                            console.print(f"[red]✗[/red] {url}: {message}")
+                        progress.advance(task)
+        finally:
+            # Every publish call counts against quota; unused units go back
+            for _, reservation in grants:
+                reservation.commit(attempted[id(reservation)])
         
         return results
 
-
 if __name__ == "__main__":
     # Quick test
     client = IndexingClient()
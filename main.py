@@ -8,85 +8,98 @@ to Google's Indexing API.
 Usage:
     python main.py scan      # Scan sitemap and check indexing status
     python main.py submit    # Submit unindexed URLs
+    python main.py verify    # Re-inspect recent submissions that are due
     python main.py status    # Show current status
     python main.py run       # Full automated run (scan + submit)
+    
+    python main.py --quiet run          # Aggregate progress only
+    python main.py --output jsonl run   # One JSON event per line (see reporter.py)
 """
 import click
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich import box
 
-from config import SITEMAP_URL, SITE_URL, DAILY_SUBMISSION_LIMIT
-from sitemap_parser import get_all_urls
-from database import upsert_url, get_unindexed_urls, get_stats, get_today_submission_count
-from gsc_client import GSCClient
-from indexing_client import IndexingClient
+from config import SITEMAP_URL, SITE_URL, DAILY_SUBMISSION_LIMIT, SERVICE_ACCOUNT_FILES
+
+# Heavy dependencies (Rich, requests, the Google API clients) are imported
+# inside the commands that need them, so `--help` and `status` stay fast.
+_reporter = None
 
-console = Console()
+
+def get_reporter():
+    """Get the reporter for the selected output mode (text if none was set)."""
+    global _reporter
+    if _reporter is None:
+        from reporter import Reporter
+        _reporter = Reporter()
+    return _reporter
 
 
 @click.group()
-def cli():
+@click.option('--output', type=click.Choice(['text', 'jsonl']), default='text',
+              help='text for people, jsonl for one JSON event per line')
+@click.option('--quiet', '-q', is_flag=True,
+              help='Only print periodic aggregate progress, not every URL')
+@click.pass_context
+def cli(ctx, output, quiet):
     """AutoGSC - Automatic Google Search Console Indexer"""
-    pass
+    global _reporter
+    if output == 'jsonl' or quiet:
+        from reporter import Reporter, JSONL, QUIET
+        _reporter = Reporter(JSONL if output == 'jsonl' else QUIET)
+    ctx.call_on_close(_finish)
+
+
+def _finish():
+    """End of every command: print the timing summary and flush output."""
+    reporter = get_reporter()
+    reporter.metrics_summary()
+    reporter.close()
 
 
 @cli.command()
-@click.option('--sitemap', default=None, help='Sitemap URL (overrides config)')
+@click.option('--sitemap', default=None, help='Sitemap URL (overrides config; skips discovery)')
 def scan(sitemap):
     """Scan sitemap and check indexing status for all URLs."""
-    sitemap_url = sitemap or SITEMAP_URL
-    
-    console.print(Panel.fit(
-        f"[bold blue]Scanning: {sitemap_url}[/bold blue]",
-        title="AutoGSC Scan"
-    ))
+    from sitemap_parser import get_all_urls
+    from scan_store import CompactUrlList
+    from database import compact_status_history
+    from gsc_client import GSCClient
+    from pipeline import check_urls, find_sitemaps
     
-    # Fetch all URLs from sitemap
-    urls = get_all_urls(sitemap_url)
+    reporter = get_reporter()
+    sitemap_url = sitemap or SITEMAP_URL
     
-    if not urls:
-        console.print("[red]No URLs found in sitemap![/red]")
-        return
+    reporter.panel(f"[bold blue]Scanning: {sitemap_url}[/bold blue]", title="AutoGSC Scan")
     
     # Initialize GSC client
     try:
         gsc = GSCClient()
     except Exception as e:
-        console.print(f"[red]Failed to connect to GSC: {e}[/red]")
-        console.print("[yellow]Make sure your service-account.json is in the project folder.[/yellow]")
+        reporter.error(f"Failed to connect to GSC: {e}")
+        reporter.message("[yellow]Make sure your service-account.json is in the project folder.[/yellow]")
+        return
+    
+    # Fetch all URLs from the sitemap(s)
+    reporter.stage('sitemap')
+    sitemaps = [sitemap] if sitemap else find_sitemaps(reporter, SITE_URL, SITEMAP_URL, gsc)
+    urls = get_all_urls(sitemaps, urls=CompactUrlList())
+    reporter.summary(urls=len(urls))
+    
+    if not urls:
+        reporter.error("No URLs found in sitemap!")
         return
     
     # Check each URL
-    indexed_count = 0
-    not_indexed_count = 0
-    error_count = 0
-    
-    console.print(f"\n[cyan]Checking indexing status for {len(urls)} URLs...[/cyan]\n")
-    
-    for i, url in enumerate(urls, 1):
-        status = gsc.get_indexing_status(url)
-        upsert_url(url, status)
-        
-        if status == 'indexed':
-            indexed_count += 1
-            symbol = "[green]✓[/green]"
-        elif status == 'error':
-            error_count += 1
-            symbol = "[yellow]?[/yellow]"
-        else:
-            not_indexed_count += 1
-            symbol = "[red]✗[/red]"
-        
-        console.print(f"  {symbol} [{i}/{len(urls)}] {url[:60]}... -> {status}")
+    reporter.message(f"\n[cyan]Checking indexing status for {len(urls)} URLs...[/cyan]\n")
+    counts, _ = check_urls(urls, gsc, reporter)
     
     # Summary
-    console.print("\n" + "="*60)
-    console.print(f"[green]Indexed:[/green] {indexed_count}")
-    console.print(f"[red]Not Indexed:[/red] {not_indexed_count}")
-    console.print(f"[yellow]Errors:[/yellow] {error_count}")
-    console.print("="*60)
+    reporter.message("\n" + "="*60)
+    reporter.message(f"[green]Indexed:[/green] {counts['indexed']}")
+    reporter.message(f"[red]Not Indexed:[/red] {counts['not_indexed']}")
+    reporter.message(f"[yellow]Errors:[/yellow] {counts['error']}")
+    reporter.message("="*60)
+    
+    compact_status_history()
 
 
 @cli.command()
@@ -94,56 +107,105 @@ def scan(sitemap):
 @click.option('--limit', default=None, type=int, help='Max URLs to submit (default: use daily quota)')
 def submit(dry_run, limit):
     """Submit unindexed URLs to Google Indexing API."""
-    console.print(Panel.fit(
-        "[bold blue]Submitting Unindexed URLs[/bold blue]",
-        title="AutoGSC Submit"
-    ))
+    from database import get_unindexed_urls, count_unindexed_urls
+    from indexing_client import IndexingClient
+    from pipeline import submit_urls
     
-    # Get unindexed URLs from database
-    unindexed = get_unindexed_urls()
+    reporter = get_reporter()
+    reporter.panel("[bold blue]Submitting Unindexed URLs[/bold blue]", title="AutoGSC Submit")
     
-    if not unindexed:
-        console.print("[green]No unindexed URLs to submit![/green]")
+    # Count unindexed URLs, then load at most `limit` of them
+    total_unindexed = count_unindexed_urls()
+    
+    if not total_unindexed:
+        reporter.message("[green]No unindexed URLs to submit![/green]")
         return
     
-    console.print(f"[cyan]Found {len(unindexed)} unindexed URLs[/cyan]")
+    reporter.message(f"[cyan]Found {total_unindexed} unindexed URLs[/cyan]")
     
     # Apply limit if specified
+    unindexed = get_unindexed_urls(limit=limit or None)
     if limit:
-        unindexed = unindexed[:limit]
-        console.print(f"[yellow]Limited to {limit} URLs[/yellow]")
+        reporter.message(f"[yellow]Limited to {limit} URLs[/yellow]")
     
     # Initialize Indexing client
     try:
         indexer = IndexingClient()
     except Exception as e:
-        console.print(f"[red]Failed to connect to Indexing API: {e}[/red]")
+        reporter.error(f"Failed to connect to Indexing API: {e}")
         return
     
     # Check quota
     remaining = indexer.get_remaining_quota()
-    console.print(f"[cyan]Remaining daily quota: {remaining}/{DAILY_SUBMISSION_LIMIT}[/cyan]\n")
+    reporter.message(f"[cyan]Remaining daily quota: {remaining}/{indexer.daily_limit}[/cyan]\n")
     
     if remaining == 0 and not dry_run:
-        console.print("[yellow]Daily quota exhausted. Try again tomorrow![/yellow]")
+        reporter.warning("Daily quota exhausted. Try again tomorrow!")
         return
     
     # Submit
-    results = indexer.submit_batch(unindexed, dry_run=dry_run)
+    results = submit_urls(unindexed, indexer, reporter, dry_run=dry_run)
     
     # Summary
-    console.print("\n" + "="*60)
-    console.print(f"[green]Submitted:[/green] {results['submitted']}")
-    console.print(f"[red]Failed:[/red] {results['failed']}")
-    console.print(f"[yellow]Skipped (quota):[/yellow] {results['skipped']}")
-    console.print("="*60)
+    reporter.message("\n" + "="*60)
+    reporter.message(f"[green]Submitted:[/green] {results['submitted']}")
+    reporter.message(f"[red]Failed:[/red] {results['failed']}")
+    reporter.message(f"[yellow]Skipped (quota):[/yellow] {results['skipped']}")
+    reporter.message("="*60)
+
+
+@cli.command()
+@click.option('--limit', default=None, type=int, help='Max URLs to re-inspect (default: all that are due)')
+def verify(limit):
+    """Re-inspect submitted URLs whose verification is due."""
+    from database import get_verification_summary
+    from gsc_client import GSCClient
+    from pipeline import verify_submissions
+    
+    reporter = get_reporter()
+    reporter.panel("[bold blue]Verifying Submissions[/bold blue]", title="AutoGSC Verify")
+    
+    try:
+        gsc = GSCClient()
+    except Exception as e:
+        reporter.error(f"Failed to connect to GSC: {e}")
+        return
+    
+    verify_submissions(gsc, reporter, limit=limit)
+    
+    summary = get_verification_summary()
+    if reporter.mode == 'jsonl':
+        reporter.data('verification', **summary)
+        return
+    
+    median = summary['median_hours']
+    reporter.message("\n" + "="*60)
+    reporter.message(f"[green]Indexed after submission:[/green] {summary['indexed']}"
+                     + (f" (median {median:.0f}h)" if median is not None else ""))
+    for days, count in summary['indexed_by_day'].items():
+        reporter.message(f"  within {days}d: {count}")
+    reporter.message(f"[cyan]Awaiting verification:[/cyan] {summary['awaiting']}")
+    reporter.message(f"[red]Not indexed after the schedule (resubmittable):[/red] {summary['not_indexed']}")
+    reporter.message("="*60)
 
 
 @cli.command()
 def status():
     """Show current status and statistics."""
+    from rich.table import Table
+    from rich import box
+    from database import get_stats, get_today_submission_count
+    
     stats = get_stats()
     today_used = get_today_submission_count()
+    # Each pooled service account brings its project's quota
+    today_limit = DAILY_SUBMISSION_LIMIT * len(SERVICE_ACCOUNT_FILES)
+    
+    reporter = get_reporter()
+    if reporter.mode == 'jsonl':
+        reporter.data('status', **{**stats, 'site': SITE_URL,
+                                   'today_submissions': today_used, 'today_limit': today_limit})
+        return
     
     table = Table(title="AutoGSC Status", box=box.ROUNDED)
     table.add_column("Metric", style="cyan")
@@ -153,70 +215,23 @@ def status():
     table.add_row("Total URLs tracked", str(stats['total_urls']))
     table.add_row("Indexed", str(stats['indexed']))
     table.add_row("Not Indexed", str(stats['unindexed']))
-    table.add_row("Today's Submissions", f"{today_used}/{DAILY_SUBMISSION_LIMIT}")
+    table.add_row("Awaiting Verification", str(stats['pending']))
+    table.add_row("Today's Submissions", f"{today_used}/{today_limit}")
     table.add_row("Total Submissions (all time)", str(stats['total_submissions']))
     
-    console.print(table)
+    reporter.console.print(table)
 
 
 @cli.command()
 @click.option('--dry-run', is_flag=True, help='Show what would be done without actually doing it')
 def run(dry_run):
     """Full automated run: scan sitemap and submit unindexed URLs."""
-    console.print(Panel.fit(
-        "[bold blue]AutoGSC Full Run[/bold blue]",
-        title="🚀 AutoGSC"
-    ))
-    
-    # Step 1: Scan
-    console.print("\n[bold]Step 1: Scanning sitemap...[/bold]\n")
-    
-    urls = get_all_urls(SITEMAP_URL)
-    if not urls:
-        console.print("[red]No URLs found in sitemap![/red]")
-        return
-    
-    try:
-        gsc = GSCClient()
-    except Exception as e:
-        console.print(f"[red]Failed to connect to GSC: {e}[/red]")
-        return
-    
-    not_indexed = []
-    for url in urls:
-        status = gsc.get_indexing_status(url)
-        upsert_url(url, status)
-        if status != 'indexed' and status != 'error':
-            not_indexed.append(url)
-            console.print(f"  [red]✗[/red] {url[:70]}...")
-        else:
-            console.print(f"  [green]✓[/green] {url[:70]}...")
-    
-    console.print(f"\n[cyan]Found {len(not_indexed)} unindexed URLs[/cyan]")
-    
-    if not not_indexed:
-        console.print("[green]All URLs are indexed! Nothing to do.[/green]")
-        return
-    
-    # Step 2: Submit
-    console.print("\n[bold]Step 2: Submitting unindexed URLs...[/bold]\n")
-    
-    try:
-        indexer = IndexingClient()
-    except Exception as e:
-        console.print(f"[red]Failed to connect to Indexing API: {e}[/red]")
-        return
-    
-    results = indexer.submit_batch(not_indexed, dry_run=dry_run)
+    from pipeline import run_pipeline
+    from gsc_client import GSCClient
+    from indexing_client import IndexingClient
     
-    # Final summary
-    console.print("\n" + "="*60)
-    console.print(Panel.fit(
-        f"[green]Submitted: {results['submitted']}[/green]\n"
-        f"[red]Failed: {results['failed']}[/red]\n"
-        f"[yellow]Skipped: {results['skipped']}[/yellow]",
-        title="Run Complete"
-    ))
+    run_pipeline(get_reporter(), GSCClient, IndexingClient, SITEMAP_URL,
+                 dry_run=dry_run, site_url=SITE_URL)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,222 @@
+"""
+Metrics
+Process-wide timing histograms and counters for the scan/submit hot paths.
+
+Recording is a perf_counter() pair, a bisect and a locked add, so the
+instrumentation stays on in production. The Flask apps export everything
+at /metrics in Prometheus text format; main.py prints a summary table at
+the end of a run.
+
+    from metrics import SUBMIT_SECONDS, timed
+
+    @timed(SUBMIT_SECONDS)
+    def submit_url(...): ...
+
+    with INSPECT_SECONDS.time():
+        response = requests.post(...)
+"""
+import functools
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, Tuple
+
+# Upper bounds (seconds) of the histogram buckets; +Inf is implicit
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: Dict[Tuple[str, tuple], object] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+_registry_lock = Lock()
+
+
+class Counter:
+    """Monotonic counter."""
+
+    __slots__ = ('name', 'labels', 'value', '_lock')
+
+    def __init__(self, name: str, labels: tuple):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed values (usually seconds)."""
+
+    __slots__ = ('name', 'labels', 'buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, name: str, labels: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager timing the block into this histogram."""
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket."""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower  # +Inf bucket: best we can say is "above"
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+def _get(kind, name: str, help_text: str, labels: dict, **kwargs):
+    key = (name, tuple(sorted(labels.items())))
+    metric = _registry.get(key)
+    if metric is None:
+        with _registry_lock:
+            metric = _registry.get(key)
+            if metric is None:
+                metric = _registry[key] = kind(name, key[1], **kwargs)
+                _help.setdefault(name, (help_text, 'counter' if kind is Counter else 'histogram'))
+    return metric
+
+
+def counter(name: str, help_text: str, **labels) -> Counter:
+    """Get or create the counter `name` with the given label values."""
+    return _get(Counter, name, help_text, labels)
+
+
+def histogram(name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS, **labels) -> Histogram:
+    """Get or create the histogram `name` with the given label values."""
+    return _get(Histogram, name, help_text, labels, buckets=buckets)
+
+
+def timed(hist: Histogram):
+    """Decorator recording each call's duration into `hist`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _format_labels(labels: tuple, extra: str = '') -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: (m.name, m.labels))
+
+    lines = []
+    last_name = None
+    for metric in metrics:
+        if metric.name != last_name:
+            help_text, kind = _help[metric.name]
+            lines.append(f"# HELP {metric.name} {help_text}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            last_name = metric.name
+
+        if isinstance(metric, Counter):
+            lines.append(f"{metric.name}{_format_labels(metric.labels)} {metric.value}")
+            continue
+
+        with metric._lock:
+            counts = list(metric.counts)
+            total, count = metric.sum, metric.count
+        cumulative = 0
+        for bound, n in zip(list(metric.buckets) + ['+Inf'], counts):
+            cumulative += n
+            le = f'le="{bound}"'
+            lines.append(f"{metric.name}_bucket{_format_labels(metric.labels, le)} {cumulative}")
+        lines.append(f"{metric.name}_sum{_format_labels(metric.labels)} {total:.6f}")
+        lines.append(f"{metric.name}_count{_format_labels(metric.labels)} {count}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def summary_rows() -> List[dict]:
+    """
+    One row per histogram that has observations, for end-of-run summaries.
+
+    Rows have name, count, total, mean, p50 and p99 (seconds).
+    """
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: (m.name, m.labels))
+
+    rows = []
+    for metric in metrics:
+        if not isinstance(metric, Histogram) or not metric.count:
+            continue
+        name = metric.name
+        if metric.labels:
+            name += _format_labels(metric.labels)
+        rows.append({
+            'name': name,
+            'count': metric.count,
+            'total': metric.sum,
+            'mean': metric.sum / metric.count,
+            'p50': metric.quantile(0.5),
+            'p99': metric.quantile(0.99),
+        })
+    return rows
+
+
+# Metrics shared by the CLI clients and the web apps
+SITEMAP_FETCH_SECONDS = histogram('autogsc_sitemap_fetch_seconds', 'Time to download one sitemap file')
+SITEMAP_PARSE_SECONDS = histogram('autogsc_sitemap_parse_seconds', 'Time to parse one sitemap file')
+SITEMAP_FETCH_ERRORS = counter('autogsc_sitemap_fetch_errors_total', 'Sitemap downloads that failed')
+INSPECT_SECONDS = histogram('autogsc_inspect_seconds', 'URL Inspection API latency')
+INSPECT_ERRORS = counter('autogsc_inspect_errors_total', 'URL Inspection calls that failed')
+SUBMIT_SECONDS = histogram('autogsc_submit_seconds', 'Indexing API publish latency')
+SUBMIT_ERRORS = counter('autogsc_submit_errors_total', 'Indexing API publish calls that failed')
+CONSOLE_RENDER_SECONDS = histogram('autogsc_console_render_seconds', 'Time to print one per-URL console line')
+
+
+def db_write_seconds(op: str) -> Histogram:
+    """Histogram of database write time (connect to commit) for one operation."""
+    return histogram('autogsc_db_write_seconds', 'Database write time, connect to commit', op=op)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Apply pending schema migrations.
+
+Run once per deploy (release phase / pre-deploy command) so web workers and
+CLI runs never have to do DDL themselves.
+
+Usage:
+    python migrate.py            # Web user DB (app_oauth)
+    python migrate.py users cli  # Several targets
+    python migrate.py all        # Web user DB, CLI DB and SaaS DB
+"""
+import argparse
+import sys
+
+
+def migrate_users():
+    """Migrate the app_oauth user database (Postgres or SQLite)."""
+    import app_oauth
+    return app_oauth.init_db()
+
+
+def migrate_cli():
+    """Migrate the CLI tracking database (autogsc.db)."""
+    import database
+    return database.init_database()
+
+
+def migrate_saas():
+    """Migrate the app_saas database."""
+    import app_saas
+    return app_saas.init_db()
+
+
+TARGETS = {
+    'users': migrate_users,
+    'cli': migrate_cli,
+    'saas': migrate_saas,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending AutoGSC schema migrations.")
+    parser.add_argument('targets', nargs='*', metavar='target',
+                        help=f"One of {', '.join(sorted(TARGETS))} or all (default: users)")
+    args = parser.parse_args(argv)
+
+    targets = args.targets or ['users']
+    for name in targets:
+        if name != 'all' and name not in TARGETS:
+            parser.error(f"unknown target: {name}")
+    if 'all' in targets:
+        targets = sorted(TARGETS)
+
+    for name in targets:
+        applied = TARGETS[name]()
+        if applied:
+            print(f"{name}: applied migrations {', '.join(str(v) for v in applied)}")
+        else:
+            print(f"{name}: schema is current")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
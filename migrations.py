@@ -0,0 +1,169 @@
+"""
+Schema Migrations
+Versioned schema migrations for the SQLite and Postgres databases.
+
+Each database keeps a schema_version table listing the migrations applied
+to it. run_migrations() applies whatever is missing, in order, and is a
+single indexed read when the schema is already current.
+"""
+import zlib
+from typing import Callable, List, Optional
+
+SQLITE = 'sqlite'
+POSTGRES = 'postgres'
+
+
+class Migration:
+    """
+    A single schema change.
+
+    Args:
+        version: Position in the migration sequence (1, 2, 3, ...)
+        description: Short human-readable summary
+        apply: Callable taking (cursor, dialect) that performs the change
+        concurrent: Run outside a transaction on Postgres, so indexes can be
+            built with CREATE INDEX CONCURRENTLY without locking writes.
+            SQLite always runs migrations inside a transaction.
+    """
+
+    def __init__(self, version: int, description: str,
+                 apply: Callable, concurrent: bool = False):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.concurrent = concurrent
+
+
+def placeholder(dialect: str) -> str:
+    """Get the DB-API parameter placeholder for a dialect."""
+    return '%s' if dialect == POSTGRES else '?'
+
+
+def _ensure_version_table(conn):
+    """Create the schema_version table if it doesn't exist."""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def get_schema_version(conn, dialect: str = SQLITE) -> int:
+    """Get the highest migration version applied, or 0 for a fresh database."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MAX(version) FROM schema_version")
+    except Exception:
+        # No schema_version table yet
+        conn.rollback()
+        return 0
+    row = cur.fetchone()
+    if row is None:
+        return 0
+    value = row[0] if not isinstance(row, dict) else list(row.values())[0]
+    return value or 0
+
+
+def create_index(cursor, dialect: str, name: str, table: str, columns: str,
+                 where: Optional[str] = None, unique: bool = False):
+    """
+    Create an index, online on Postgres.
+
+    On Postgres this uses CREATE INDEX CONCURRENTLY, so the migration that
+    calls it must be marked concurrent=True. An invalid index left behind by
+    an interrupted concurrent build is dropped and rebuilt.
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    where_sql = f" WHERE {where}" if where else ""
+
+    if dialect == POSTGRES:
+        cursor.execute("""
+            SELECT i.indisvalid FROM pg_class c
+            JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = %s
+        """, (name,))
+        row = cursor.fetchone()
+        if row is not None:
+            valid = row[0] if not isinstance(row, dict) else row['indisvalid']
+            if valid:
+                return
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cursor.execute(
+            f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON {table} ({columns}){where_sql}"
+        )
+    else:
+        cursor.execute(
+            f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} "
+            f"ON {table} ({columns}){where_sql}"
+        )
+
+
+def run_migrations(conn, migrations: List[Migration], dialect: str = SQLITE) -> List[int]:
+    """
+    Apply pending migrations to an open connection.
+
+    On Postgres an advisory lock serializes concurrent runners (e.g. several
+    instances starting at once), so each migration is applied exactly once.
+
+    Returns:
+        The versions that were applied (empty when already current)
+    """
+    latest = migrations[-1].version if migrations else 0
+
+    # Fast path: schema already current, no DDL and no locks
+    if get_schema_version(conn, dialect) >= latest:
+        return []
+
+    _ensure_version_table(conn)
+
+    applied = []
+    lock_key = None
+    if dialect == POSTGRES:
+        lock_key = zlib.crc32(b'autogsc_schema_migrations')
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s)", (lock_key,))
+        conn.commit()
+
+    try:
+        # Re-read under the lock: another runner may have just finished
+        current = get_schema_version(conn, dialect)
+        mark = f"INSERT INTO schema_version (version) VALUES ({placeholder(dialect)})"
+
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+
+            if dialect == POSTGRES and migration.concurrent:
+                conn.commit()
+                conn.autocommit = True
+                try:
+                    cur = conn.cursor()
+                    migration.apply(cur, dialect)
+                    cur.execute(mark, (migration.version,))
+                finally:
+                    conn.autocommit = False
+            else:
+                cur = conn.cursor()
+                try:
+                    if dialect == SQLITE:
+                        # sqlite3 doesn't open transactions for DDL on its own
+                        cur.execute("BEGIN")
+                    migration.apply(cur, dialect)
+                    cur.execute(mark, (migration.version,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+            applied.append(migration.version)
+    finally:
+        if lock_key is not None:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (lock_key,))
+            conn.commit()
+
+    return applied
@@ -0,0 +1,203 @@
+"""
+Scan/Submit Pipeline
+The steps behind `main.py run`, shared by the CLI and the dashboard's
+in-process jobs. All progress goes through a reporter.Reporter.
+"""
+import time
+
+# Statuses written to the tracking database per transaction during a scan
+SCAN_WRITE_BATCH = 100
+
+
+def check_urls(urls, gsc, reporter, stage='scan'):
+    """
+    Inspect every URL, record its status and report each result.
+    
+    Returns:
+        Tuple of (counts dict, list of not-indexed URLs)
+    """
+    from database import upsert_urls
+    
+    counts = {'indexed': 0, 'not_indexed': 0, 'error': 0}
+    not_indexed = []
+    pending = []
+    # Quota and inspection warnings go to this run's output
+    gsc.reporter = reporter
+    
+    try:
+        # Inside the try: a cancelled dashboard job raises from the reporter,
+        # and the reserved inspection quota must still be settled
+        reporter.stage(stage, total=len(urls))
+        for i, url in enumerate(urls, 1):
+            started = time.perf_counter()
+            status = gsc.get_indexing_status(url)
+            elapsed = time.perf_counter() - started
+            pending.append((url, status))
+            if len(pending) >= SCAN_WRITE_BATCH:
+                upsert_urls(pending)
+                pending = []
+            
+            if status == 'indexed':
+                outcome = 'indexed'
+                symbol = "[green]✓[/green]"
+            elif status == 'error':
+                outcome = 'error'
+                symbol = "[yellow]?[/yellow]"
+            else:
+                outcome = 'not_indexed'
+                symbol = "[red]✗[/red]"
+                not_indexed.append(url)
+            counts[outcome] += 1
+            
+            reporter.url(url, status, outcome, elapsed,
+                         text=f"  {symbol} [{i}/{len(urls)}] {url[:60]}... -> {status}")
+    finally:
+        try:
+            # Whatever was checked is recorded, even if the scan stops early
+            upsert_urls(pending)
+        finally:
+            # Settle the inspection quota reserved by the GSC client
+            gsc.close()
+    
+    reporter.summary(**counts)
+    return counts, not_indexed
+
+
+def verify_submissions(gsc, reporter, limit=None):
+    """
+    Re-inspect submitted URLs whose verification is due (see
+    config.VERIFY_SCHEDULE_DAYS), instead of waiting for the next full scan.
+    
+    Returns:
+        check_urls counts, or None if nothing was due
+    """
+    from database import get_due_verifications
+    
+    urls = get_due_verifications(limit)
+    if not urls:
+        reporter.message("[green]No submissions due for verification.[/green]")
+        gsc.close()
+        return None
+    
+    reporter.message(f"[cyan]Verifying {len(urls)} submitted URLs...[/cyan]\n")
+    counts, _ = check_urls(urls, gsc, reporter, stage='verify')
+    return counts
+
+
+def find_sitemaps(reporter, site_url, sitemap_url, gsc=None):
+    """
+    Sitemaps to scan: `sitemap_url`, plus (with config.SITEMAP_DISCOVERY)
+    the ones in robots.txt and those submitted to Search Console via `gsc`.
+    """
+    from config import SITEMAP_DISCOVERY
+    from sitemap_parser import discover_sitemaps
+    
+    if not SITEMAP_DISCOVERY or not site_url:
+        return [sitemap_url]
+    
+    if gsc is not None:
+        gsc.reporter = reporter
+    sitemaps = discover_sitemaps(site_url, sitemap_url, gsc.list_sitemaps if gsc else None)
+    if len(sitemaps) > 1:
+        reporter.message(f"[cyan]Found {len(sitemaps)} sitemaps (config, robots.txt, Search Console)[/cyan]")
+    reporter.data('sitemaps', urls=sitemaps)
+    return sitemaps
+
+
+def submit_urls(urls, indexer, reporter, dry_run=False):
+    """Submit URLs through the Indexing API, reporting each result."""
+    def on_result(url, success, message, seconds):
+        if dry_run:
+            outcome, text = 'would_submit', f"  Would submit: {url}"
+        elif success:
+            outcome, text = 'submitted', f"[green]✓[/green] {url}"
+        else:
+            outcome, text = 'failed', f"[red]✗[/red] {url}: {message}"
+        reporter.url(url, message, outcome, seconds, text=text)
+    
+    reporter.stage('submit', total=len(urls))
+    indexer.reporter = reporter
+    results = indexer.submit_batch(urls, dry_run=dry_run, on_result=on_result)
+    reporter.summary(submitted=results['submitted'], failed=results['failed'],
+                     skipped=results['skipped'], dry_run=dry_run)
+    return results
+
+
+def run_pipeline(reporter, get_gsc, get_indexer, sitemap_url, dry_run=False, site_url=None):
+    """
+    Full run: scan the sitemap, then submit every URL that isn't indexed
+    and isn't awaiting verification of an earlier submission.
+    
+    Args:
+        reporter: reporter.Reporter for progress output
+        get_gsc: Callable returning a GSCClient (e.g. the class, or a cache)
+        get_indexer: Callable returning an IndexingClient
+        sitemap_url: Sitemap to scan
+        dry_run: Don't actually submit
+        site_url: Property whose other sitemaps are scanned too (see
+            find_sitemaps); only `sitemap_url` if None
+    
+    Returns:
+        submit_batch results, or None if nothing was submitted
+    """
+    from sitemap_parser import get_all_urls
+    from scan_store import CompactUrlList
+    from database import compact_status_history, get_awaiting_verification
+    
+    reporter.panel("[bold blue]AutoGSC Full Run[/bold blue]", title="🚀 AutoGSC")
+    
+    # Step 1: Scan
+    reporter.message("\n[bold]Step 1: Scanning sitemap...[/bold]\n")
+    
+    try:
+        gsc = get_gsc()
+    except Exception as e:
+        reporter.error(f"Failed to connect to GSC: {e}")
+        return None
+    
+    reporter.stage('sitemap')
+    urls = get_all_urls(find_sitemaps(reporter, site_url, sitemap_url, gsc), urls=CompactUrlList())
+    reporter.summary(urls=len(urls))
+    if not urls:
+        reporter.error("No URLs found in sitemap!")
+        return None
+    
+    _, not_indexed = check_urls(urls, gsc, reporter)
+    
+    compact_status_history()
+    
+    reporter.message(f"\n[cyan]Found {len(not_indexed)} unindexed URLs[/cyan]")
+    
+    # Recent submissions get the rest of their verification schedule first
+    awaiting = get_awaiting_verification()
+    if awaiting:
+        eligible = [url for url in not_indexed if url not in awaiting]
+        if len(eligible) < len(not_indexed):
+            reporter.message(f"[yellow]{len(not_indexed) - len(eligible)} submitted recently, "
+                             f"awaiting verification[/yellow]")
+        not_indexed = eligible
+    
+    if not not_indexed:
+        reporter.message("[green]All URLs are indexed! Nothing to do.[/green]")
+        return None
+    
+    # Step 2: Submit
+    reporter.message("\n[bold]Step 2: Submitting unindexed URLs...[/bold]\n")
+    
+    try:
+        indexer = get_indexer()
+    except Exception as e:
+        reporter.error(f"Failed to connect to Indexing API: {e}")
+        return None
+    
+    results = submit_urls(not_indexed, indexer, reporter, dry_run=dry_run)
+    
+    # Final summary
+    reporter.message("\n" + "="*60)
+    reporter.panel(
+        f"[green]Submitted: {results['submitted']}[/green]\n"
+        f"[red]Failed: {results['failed']}[/red]\n"
+        f"[yellow]Skipped: {results['skipped']}[/yellow]",
+        title="Run Complete"
+    )
+    return results
@@ -0,0 +1,261 @@
+"""
+Quota Ledger
+Atomic daily quota reservations shared by every process using the same DB.
+
+Callers reserve N units up front, do the work, then commit what they
+actually used (the rest goes back to the pool) or release the reservation.
+The read-check-update happens under a row lock (BEGIN IMMEDIATE on SQLite,
+SELECT ... FOR UPDATE on Postgres), so concurrent workers can use the whole
+quota but never exceed it.
+
+Quotas are tracked per scope and day. Use indexing_scope() for the Indexing
+API publish quota, which is per GCP project. Use inspection_scope() for the
+URL Inspection quota, which is per project and property.
+"""
+import time
+from datetime import datetime
+from typing import Callable
+
+from migrations import POSTGRES, SQLITE, placeholder
+
+# Reservations not committed or released within this many seconds are assumed
+# abandoned (crashed worker) and returned to the pool.
+RESERVATION_TTL_SECONDS = 15 * 60
+
+
+def indexing_scope(project: str) -> str:
+    """Quota scope for Indexing API publish calls (per GCP project)."""
+    return f"indexing/{project}"
+
+
+def inspection_scope(project: str, site_url: str) -> str:
+    """Quota scope for URL Inspection calls (per GCP project and property)."""
+    return f"inspection/{project}/{site_url}"
+
+
+def create_quota_tables(cur, dialect: str):
+    """Create the ledger tables; called from each database's migrations."""
+    id_column = 'id SERIAL PRIMARY KEY' if dialect == POSTGRES else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS quota_ledger (
+            scope TEXT NOT NULL,
+            day TEXT NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0,
+            reserved INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, day)
+        )
+    """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS quota_reservations (
+            {id_column},
+            scope TEXT NOT NULL,
+            day TEXT NOT NULL,
+            units INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_quota_reservations_scope
+        ON quota_reservations (scope, day, created_at)
+    """)
+
+
+def _col(row, name: str, index: int):
+    """Read a column from a tuple, sqlite3.Row or dict-style row."""
+    return row[name] if isinstance(row, dict) else row[index]
+
+
+class QuotaReservation:
+    """
+    Units reserved from a QuotaLedger.
+
+    Use as a context manager, or call commit()/release() explicitly. Leaving
+    the block without committing releases everything.
+    """
+
+    def __init__(self, ledger, scope: str, day: str, granted: int, reservation_id):
+        self.ledger = ledger
+        self.scope = scope
+        self.day = day
+        self.granted = granted
+        self.reservation_id = reservation_id
+        self.closed = granted == 0
+
+    def commit(self, used: int):
+        """Record `used` units as consumed and return the rest to the pool."""
+        if self.closed:
+            return
+        self.closed = True
+        self.ledger._settle(self, min(used, self.granted))
+
+    def release(self):
+        """Return all reserved units to the pool."""
+        if self.closed:
+            return
+        self.closed = True
+        self.ledger._settle(self, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class QuotaLedger:
+    """
+    Daily quota ledger over a SQLite or Postgres connection factory.
+
+    Args:
+        connect: Callable returning a new DB-API connection
+        dialect: migrations.SQLITE or migrations.POSTGRES
+        limit: Units available per scope per day
+        cache_seconds: How long remaining() may answer from memory instead
+            of the database (reservations are always checked in the DB)
+    """
+
+    def __init__(self, connect: Callable, dialect: str = SQLITE, limit: int = 200,
+                 cache_seconds: float = 0):
+        self.connect = connect
+        self.dialect = dialect
+        self.limit = limit
+        self.cache_seconds = cache_seconds
+        self.p = placeholder(dialect)
+        self._remaining = {}
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now().strftime("%Y-%m-%d")
+
+    def _lock_row(self, cur, scope: str, day: str):
+        """Start a write transaction and lock the (scope, day) ledger row."""
+        p = self.p
+        if self.dialect == SQLITE:
+            # Takes the database write lock now, not at the first write
+            cur.execute("BEGIN IMMEDIATE")
+        cur.execute(f"""
+            INSERT INTO quota_ledger (scope, day, used, reserved)
+            VALUES ({p}, {p}, 0, 0)
+            ON CONFLICT (scope, day) DO NOTHING
+        """, (scope, day))
+        lock = " FOR UPDATE" if self.dialect == POSTGRES else ""
+        cur.execute(f"""
+            SELECT used, reserved FROM quota_ledger
+            WHERE scope = {p} AND day = {p}{lock}
+        """, (scope, day))
+        row = cur.fetchone()
+        return _col(row, 'used', 0), _col(row, 'reserved', 1)
+
+    def _reclaim_expired(self, cur, scope: str, day: str) -> int:
+        """Return abandoned reservations to the pool; caller holds the row lock."""
+        p = self.p
+        cutoff = int(time.time()) - RESERVATION_TTL_SECONDS
+        cur.execute(f"""
+            SELECT COALESCE(SUM(units), 0) AS expired FROM quota_reservations
+            WHERE scope = {p} AND day = {p} AND created_at < {p}
+        """, (scope, day, cutoff))
+        expired = _col(cur.fetchone(), 'expired', 0)
+        if expired:
+            cur.execute(f"""
+                DELETE FROM quota_reservations
+                WHERE scope = {p} AND day = {p} AND created_at < {p}
+            """, (scope, day, cutoff))
+            cur.execute(f"""
+                UPDATE quota_ledger SET reserved = reserved - {p}
+                WHERE scope = {p} AND day = {p}
+            """, (expired, scope, day))
+        return expired
+
+    def reserve(self, scope: str, units: int) -> QuotaReservation:
+        """
+        Atomically reserve up to `units` for today.
+
+        Returns a QuotaReservation whose `granted` may be less than requested
+        (or 0 when the quota is exhausted).
+        """
+        self._remaining.pop(scope, None)
+        p = self.p
+        day = self.today()
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            used, reserved = self._lock_row(cur, scope, day)
+            reserved -= self._reclaim_expired(cur, scope, day)
+
+            granted = max(0, min(units, self.limit - used - reserved))
+            reservation_id = None
+            if granted:
+                cur.execute(f"""
+                    UPDATE quota_ledger SET reserved = reserved + {p}
+                    WHERE scope = {p} AND day = {p}
+                """, (granted, scope, day))
+                insert = f"""
+                    INSERT INTO quota_reservations (scope, day, units, created_at)
+                    VALUES ({p}, {p}, {p}, {p})
+                """
+                params = (scope, day, granted, int(time.time()))
+                if self.dialect == POSTGRES:
+                    cur.execute(insert + " RETURNING id", params)
+                    reservation_id = _col(cur.fetchone(), 'id', 0)
+                else:
+                    cur.execute(insert, params)
+                    reservation_id = cur.lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        return QuotaReservation(self, scope, day, granted, reservation_id)
+
+    def _settle(self, reservation: QuotaReservation, used: int):
+        """Apply a commit/release: move `used` units to used, free the rest."""
+        self._remaining.pop(reservation.scope, None)
+        p = self.p
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            self._lock_row(cur, reservation.scope, reservation.day)
+            cur.execute(f"DELETE FROM quota_reservations WHERE id = {p}",
+                        (reservation.reservation_id,))
+            # If the reservation already expired its units were reclaimed;
+            # only the usage still needs recording.
+            still_reserved = reservation.granted if cur.rowcount == 1 else 0
+            cur.execute(f"""
+                UPDATE quota_ledger
+                SET used = used + {p}, reserved = reserved - {p}
+                WHERE scope = {p} AND day = {p}
+            """, (used, still_reserved, reservation.scope, reservation.day))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def remaining(self, scope: str) -> int:
+        """Units still available today (excluding outstanding reservations)."""
+        if self.cache_seconds:
+            cached = self._remaining.get(scope)
+            if cached is not None and time.monotonic() - cached[0] < self.cache_seconds:
+                return cached[1]
+        p = self.p
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT used, reserved FROM quota_ledger
+                WHERE scope = {p} AND day = {p}
+            """, (scope, self.today()))
+            row = cur.fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            remaining = self.limit
+        else:
+            remaining = max(0, self.limit - _col(row, 'used', 0) - _col(row, 'reserved', 1))
+        if self.cache_seconds:
+            self._remaining[scope] = (time.monotonic(), remaining)
+        return remaining
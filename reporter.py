@@ -0,0 +1,239 @@
+"""
+Progress Reporter
+How main.py reports progress, in one of three output modes:
+
+    text   Rich console output, one line per URL (default)
+    quiet  Rich console output, aggregate progress every few seconds only
+    jsonl  One compact JSON event per line, for app.py and other programs
+
+JSON events all have an "event" key:
+    {"event":"stage","stage":"scan","total":120}
+    {"event":"url","stage":"scan","url":"...","status":"indexed","outcome":"indexed","ms":412.7,"done":1,"total":120}
+    {"event":"progress","stage":"scan","done":25,"total":120,"counts":{"indexed":20,"not_indexed":5},"rate":2.4}
+    {"event":"summary","stage":"scan","indexed":100,"not_indexed":18,"error":2,"seconds":51.3}
+    {"event":"warning","message":"..."} / {"event":"error","message":"..."}
+"""
+import json
+import sys
+import time
+from typing import Callable, Optional
+
+from metrics import CONSOLE_RENDER_SECONDS, summary_rows
+
+TEXT = 'text'
+QUIET = 'quiet'
+JSONL = 'jsonl'
+
+# Seconds between aggregate progress updates (quiet/jsonl) and JSONL flushes
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+# Buffered JSONL lines are flushed once this many are pending
+JSONL_BUFFER_LINES = 500
+
+
+class Reporter:
+    """
+    Reports stages, per-URL results and summaries in the selected mode.
+
+    Per-URL results are counted by `outcome` (e.g. 'indexed', 'submitted')
+    so quiet and jsonl modes can report aggregates without the caller
+    keeping its own counters.
+    """
+
+    def __init__(self, mode: str = TEXT, stream=None, on_event: Optional[Callable] = None):
+        """
+        Args:
+            mode: TEXT, QUIET or JSONL
+            stream: Output stream (default: stdout)
+            on_event: JSONL mode only; receives each event dict instead of
+                it being written out (used for in-process jobs)
+        """
+        self.mode = mode
+        self.on_event = on_event
+        self._console = None
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._stage = None
+        self._counts = {}
+        self._done = 0
+        self._total = None
+        self._stage_started = time.monotonic()
+        self._last_progress = self._stage_started
+
+        # sys.stdout as it was before a JSONL reporter redirected it
+        self._saved_stdout = None
+        if mode == JSONL and on_event is None:
+            # Keep stdout for events only while this reporter is open;
+            # anything else printed (the sitemap parser, client setup) goes
+            # to stderr. close() puts stdout back.
+            self._stream = stream or sys.stdout
+            self._saved_stdout = sys.stdout
+            sys.stdout = sys.stderr
+        else:
+            self._stream = stream
+
+    @property
+    def console(self):
+        """Rich console for text/quiet output, imported on first use."""
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(file=self._stream) if self._stream else Console()
+        return self._console
+
+    # -- JSONL output ------------------------------------------------------
+
+    def _emit(self, event: str, **fields):
+        if self.on_event is not None:
+            self.on_event({'event': event, **fields})
+            return
+        self._buffer.append(json.dumps({'event': event, **fields}, separators=(',', ':')))
+        if (len(self._buffer) >= JSONL_BUFFER_LINES
+                or time.monotonic() - self._last_flush >= PROGRESS_INTERVAL_SECONDS):
+            self.flush()
+
+    def flush(self):
+        """Write out buffered JSONL events."""
+        if self._buffer:
+            self._stream.write('\n'.join(self._buffer) + '\n')
+            self._stream.flush()
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    # -- Reporting API -----------------------------------------------------
+
+    def message(self, markup: str):
+        """Decorative console text (banners, hints); not emitted as JSON."""
+        if self.mode != JSONL:
+            self.console.print(markup)
+
+    def panel(self, body: str, title: str):
+        """A boxed banner in text/quiet mode."""
+        if self.mode != JSONL:
+            from rich.panel import Panel
+            self.console.print(Panel.fit(body, title=title))
+
+    def warning(self, message: str):
+        if self.mode == JSONL:
+            self._emit('warning', message=message)
+        else:
+            self.console.print(f"[yellow]{message}[/yellow]")
+
+    def error(self, message: str):
+        if self.mode == JSONL:
+            self._emit('error', message=message)
+            self.flush()
+        else:
+            self.console.print(f"[red]{message}[/red]")
+
+    def stage(self, name: str, total: int = None):
+        """Start a stage; resets the per-URL counters."""
+        self._stage = name
+        self._counts = {}
+        self._done = 0
+        self._total = total
+        self._stage_started = self._last_progress = time.monotonic()
+        if self.mode == JSONL:
+            fields = {'stage': name} if total is None else {'stage': name, 'total': total}
+            self._emit('stage', **fields)
+            self.flush()
+
+    def url(self, url: str, status: str, outcome: str, seconds: float = None, text: str = None):
+        """
+        Record one URL result.
+
+        Args:
+            url: The URL
+            status: Raw status (coverage state, API message, ...)
+            outcome: Counter to increment ('indexed', 'failed', ...)
+            seconds: Time the API call took
+            text: Rich markup line to print in text mode
+        """
+        self._done += 1
+        self._counts[outcome] = self._counts.get(outcome, 0) + 1
+
+        if self.mode == JSONL:
+            fields = {'stage': self._stage, 'url': url, 'status': status,
+                      'outcome': outcome, 'done': self._done}
+            if seconds is not None:
+                fields['ms'] = round(seconds * 1000, 1)
+            if self._total is not None:
+                fields['total'] = self._total
+            self._emit('url', **fields)
+        elif self.mode == TEXT and text is not None:
+            with CONSOLE_RENDER_SECONDS.time():
+                self.console.print(text)
+
+        now = time.monotonic()
+        if self.mode != TEXT and now - self._last_progress >= PROGRESS_INTERVAL_SECONDS:
+            self._last_progress = now
+            self.progress()
+
+    def progress(self):
+        """Report aggregate progress for the current stage."""
+        elapsed = time.monotonic() - self._stage_started
+        rate = self._done / elapsed if elapsed > 0 else 0.0
+        if self.mode == JSONL:
+            self._emit('progress', stage=self._stage, done=self._done, total=self._total,
+                       counts=dict(self._counts), rate=round(rate, 2))
+            self.flush()
+        else:
+            total = f"/{self._total}" if self._total is not None else ""
+            counts = ", ".join(f"{k.replace('_', ' ')} {v}" for k, v in sorted(self._counts.items()))
+            self.console.print(f"[dim]{self._stage}: {self._done}{total} ({counts}) {rate:.1f} URL/s[/dim]")
+
+    def summary(self, **counts):
+        """
+        End the current stage with its final counts.
+
+        Text/quiet mode prints nothing here; the command prints its own
+        summary block.
+        """
+        if self.mode == JSONL:
+            seconds = round(time.monotonic() - self._stage_started, 2)
+            self._emit('summary', stage=self._stage, seconds=seconds, **counts)
+            self.flush()
+        elif self.mode == QUIET and self._done:
+            self.progress()
+
+    def data(self, event: str, **fields):
+        """Emit a structured record (e.g. stats) in jsonl mode."""
+        if self.mode == JSONL:
+            self._emit(event, **fields)
+
+    def metrics_summary(self):
+        """Report where the time went (see metrics.py), if anything was timed."""
+        rows = summary_rows()
+        if not rows:
+            return
+        if self.mode == JSONL:
+            self._emit('metrics', timers=rows)
+            return
+
+        from rich.table import Table
+        from rich import box
+        table = Table(title="Timings", box=box.SIMPLE)
+        table.add_column("Metric", style="cyan")
+        for column in ("Count", "Total", "Mean", "p50", "p99"):
+            table.add_column(column, justify="right")
+        for row in rows:
+            table.add_row(
+                row['name'], str(row['count']), f"{row['total']:.2f}s",
+                f"{row['mean'] * 1000:.1f}ms", f"{row['p50'] * 1000:.1f}ms", f"{row['p99'] * 1000:.1f}ms",
+            )
+        self.console.print(table)
+
+    def close(self):
+        """Flush JSONL output and give back stdout."""
+        if self.mode == JSONL:
+            self.flush()
+        if self._saved_stdout is not None:
+            if sys.stdout is sys.stderr:
+                sys.stdout = self._saved_stdout
+            self._saved_stdout = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,174 @@
+"""
+Scan Store
+Compact in-memory containers for multi-million-URL scans.
+
+A Python str costs ~50 bytes of overhead before its characters, and a dict
+per result several hundred more. These containers instead keep:
+  - URLs split into an interned "scheme://host" prefix id plus the path,
+    with all paths packed into one bytearray
+  - statuses as small integer ids into a table of distinct status strings
+  - per-result flags in a byte array
+so 1M results cost roughly the size of their path bytes plus ~15 bytes each.
+"""
+import json
+from array import array
+from typing import Iterable, Iterator, Optional
+
+# Per-result flag bits
+FLAG_INDEXED = 1
+FLAG_ERROR = 2
+
+
+class ScanResult:
+    """A single scan result, materialized on demand."""
+
+    __slots__ = ('url', 'status', 'indexed', 'error')
+
+    def __init__(self, url: str, status: str, indexed: bool, error: bool):
+        self.url = url
+        self.status = status
+        self.indexed = indexed
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'status': self.status, 'indexed': self.indexed}
+
+
+class CompactUrlList:
+    """Append-only list of URLs stored as (prefix id, packed path bytes)."""
+
+    def __init__(self, urls: Optional[Iterable[str]] = None):
+        self._prefixes = []
+        self._prefix_ids = {}
+        self._prefix_of = array('I')
+        self._paths = bytearray()
+        self._offsets = array('Q', [0])
+        if urls is not None:
+            for url in urls:
+                self.append(url)
+
+    def append(self, url: str):
+        # Split after "scheme://host"; everything else is the path part
+        split = url.find('/', url.find('//') + 2) if '//' in url else -1
+        if split == -1:
+            prefix, path = url, ''
+        else:
+            prefix, path = url[:split], url[split:]
+
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self._prefixes)
+            self._prefixes.append(prefix)
+            self._prefix_ids[prefix] = prefix_id
+
+        self._prefix_of.append(prefix_id)
+        self._paths += path.encode('utf-8')
+        self._offsets.append(len(self._paths))
+
+    def __len__(self) -> int:
+        return len(self._prefix_of)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('CompactUrlList index out of range')
+        path = self._paths[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+        return self._prefixes[self._prefix_of[index]] + path
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+
+class ScanResultStore:
+    """
+    Compact store of scan results with running totals.
+
+    add() records a result; iterate to get ScanResult records back, or use
+    iter_json() to stream the results as a JSON array without building
+    them all in memory.
+    """
+
+    def __init__(self):
+        self._urls = CompactUrlList()
+        self._statuses = []
+        self._status_ids = {}
+        self._status_of = array('H')
+        self._flags = bytearray()
+        self.indexed = 0
+        self.not_indexed = 0
+        self.errors = 0
+
+    def add(self, url: str, status: str, indexed: bool = False, error: bool = False):
+        status_id = self._status_ids.get(status)
+        if status_id is None:
+            status_id = len(self._statuses)
+            self._statuses.append(status)
+            self._status_ids[status] = status_id
+
+        self._urls.append(url)
+        self._status_of.append(status_id)
+        self._flags.append((FLAG_INDEXED if indexed else 0) | (FLAG_ERROR if error else 0))
+
+        if error:
+            self.errors += 1
+        elif indexed:
+            self.indexed += 1
+        else:
+            self.not_indexed += 1
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def __getitem__(self, index: int) -> ScanResult:
+        flags = self._flags[index]
+        return ScanResult(
+            self._urls[index],
+            self._statuses[self._status_of[index]],
+            bool(flags & FLAG_INDEXED),
+            bool(flags & FLAG_ERROR),
+        )
+
+    def __iter__(self) -> Iterator[ScanResult]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def iter_json(self, chunk_size: int = 1000) -> Iterator[str]:
+        """Yield the results as a JSON array, in chunks of `chunk_size` entries."""
+        yield '['
+        chunk = []
+        for i, result in enumerate(self):
+            chunk.append(json.dumps(result.to_dict()))
+            if len(chunk) == chunk_size:
+                yield (',' if i >= chunk_size else '') + ','.join(chunk)
+                chunk = []
+        if chunk:
+            yield (',' if len(self) > len(chunk) else '') + ','.join(chunk)
+        yield ']'
+
+
+def bounded_map(executor, fn, items: Iterable, max_pending: int) -> Iterator:
+    """
+    Like executor.map, but keeps at most `max_pending` tasks queued.
+
+    executor.map submits every item up front, holding a future per URL;
+    this pulls from `items` lazily. Results are yielded in completion order.
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    pending = set()
+    for item in items:
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(fn, item))
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
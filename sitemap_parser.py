@@ -1,10 +1,23 @@
 """
 Sitemap Parser Module
 Fetches and parses XML sitemaps to extract all URLs.
+
+Parsing uses lxml when it's installed (pip install lxml), otherwise a
+regex fast path with ElementTree as its fallback; see set_parser_backend().
 """
+import gzip
+import html
+import io
+import math
+import re
 import requests
 import xml.etree.ElementTree as ET
-from typing import List
+from importlib.util import find_spec
+from hashlib import blake2b
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from metrics import SITEMAP_FETCH_ERRORS, SITEMAP_FETCH_SECONDS, SITEMAP_PARSE_SECONDS, timed
 try:
     from rich.console import Console
     console = Console()
@@ -19,60 +32,545 @@ except ImportError:
             print(clean_msg)
     console = Console()
 
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Sitemap files downloaded at once by get_all_urls
+SITEMAP_FETCH_WORKERS = 8
+
 
-def fetch_sitemap(sitemap_url: str) -> str:
-    """Fetch sitemap XML content from URL."""
+@timed(SITEMAP_FETCH_SECONDS)
+def fetch_sitemap(sitemap_url: str) -> bytes:
+    """
+    Fetch sitemap XML content from URL.
+
+    Returns the raw bytes (the parser honours the XML encoding declaration),
+    gunzipped if the server sent a .xml.gz file as-is.
+    """
     try:
         response = requests.get(sitemap_url, timeout=30)
         response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
+        content = response.content
+        if content[:2] == GZIP_MAGIC:
+            content = gzip.decompress(content)
+        return content
+    except (requests.RequestException, OSError, EOFError) as e:
+        SITEMAP_FETCH_ERRORS.inc()
         console.print(f"[red]Error fetching sitemap: {e}[/red]")
-        return ""
+        return b""
 
 
-def parse_sitemap(xml_content: str) -> List[str]:
-    """Parse sitemap XML and extract all URLs."""
-    urls = []
-    
+# Query parameters that only carry tracking data; URLs that differ only in
+# these are the same page.
+TRACKING_PARAMS = frozenset({
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', '_ga', '_gl',
+})
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL without changing which page it points to.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters. Path case and trailing slashes are kept as written, since
+    servers may treat them as distinct (dedup_key still counts /a and /a/
+    as one page, emitting whichever appears first).
+
+    Raises ValueError for a malformed URL (bad port, unclosed IPv6 bracket).
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if parts.port is not None and DEFAULT_PORTS.get(scheme) == str(parts.port):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    query = parts.query
+    if query:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [
+            (k, v) for k, v in params
+            if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+        ]
+        # Only re-encode when something was dropped, to keep encoding as written
+        if len(kept) != len(params):
+            query = urlencode(kept)
+
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+def dedup_key(normalized_url: str) -> int:
+    """
+    Compact 64-bit key for duplicate detection.
+
+    A trailing slash is ignored here (but kept in the emitted URL), so
+    /page and /page/ collapse to whichever appears first.
+    """
+    base, sep, query = normalized_url.partition('?')
+    key = base.rstrip('/') + sep + query
+    return int.from_bytes(blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for very large URL sets.
+
+    Uses a fraction of the memory of an exact set, at the cost of a small
+    false-positive rate. A false positive drops a unique URL as a duplicate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-6):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int):
+        # Double hashing: derive k positions from two halves of the key
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: int) -> bool:
+        """Add a key; returns True if it was (probably) already present."""
+        present = True
+        for pos in self._positions(key):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+
+class UrlDeduplicator:
+    """
+    Streaming URL normalization and duplicate removal with a report.
+
+    Keeps a set of 64-bit digests (exact for any realistic sitemap size), or
+    a BloomFilter when `bloom_capacity` is given, for huge indexes.
+    """
+
+    def __init__(self, bloom_capacity: Optional[int] = None, max_examples: int = 10):
+        self.bloom = BloomFilter(bloom_capacity) if bloom_capacity else None
+        self.seen = set() if self.bloom is None else None
+        self.total = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.examples = []
+        self.max_examples = max_examples
+
+    def add(self, url: str) -> Optional[str]:
+        """
+        Normalize a URL; returns it if new, or None if it's a duplicate or
+        malformed (counted in `invalid`, so one bad <loc> doesn't stop a scan).
+        """
+        self.total += 1
+        try:
+            normalized = normalize_url(url)
+        except ValueError:
+            self.invalid += 1
+            return None
+        key = dedup_key(normalized)
+
+        if self.bloom is not None:
+            duplicate = self.bloom.add(key)
+        else:
+            duplicate = key in self.seen
+            if not duplicate:
+                self.seen.add(key)
+
+        if duplicate:
+            self.duplicates += 1
+            if len(self.examples) < self.max_examples:
+                self.examples.append(url)
+            return None
+        return normalized
+
+    def filter(self, urls: Iterable[str]) -> Iterator[str]:
+        """Yield normalized, de-duplicated URLs from a stream."""
+        for url in urls:
+            normalized = self.add(url)
+            if normalized is not None:
+                yield normalized
+
+    @property
+    def unique(self) -> int:
+        return self.total - self.duplicates - self.invalid
+
+    def report(self) -> Dict:
+        """Summary of what was collapsed."""
+        return {
+            'total': self.total,
+            'unique': self.unique,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'examples': list(self.examples),
+        }
+
+
+class SitemapParseError(ValueError):
+    """Sitemap content isn't well-formed XML."""
+
+
+def _local_name(tag) -> str:
+    # '{namespace}loc' -> 'loc'; comments/PIs (non-str tags) -> ''
+    return tag.rpartition('}')[2] if isinstance(tag, str) else ''
+
+
+def _entry_loc(entry) -> Optional[str]:
+    """Text of the <loc> directly inside a <url>/<sitemap> element."""
+    for child in entry:
+        if _local_name(child.tag) == 'loc':
+            text = (child.text or '').strip()
+            return text or None
+    return None
+
+
+def _parse_locs_lxml(data: bytes) -> Tuple[List[str], List[str]]:
+    """lxml iterparse: one pass, entries freed as soon as they're read."""
+    from lxml import etree
+
+    refs, urls = [], []
+    try:
+        for _, entry in etree.iterparse(
+            io.BytesIO(data), events=('end',), tag=('{*}url', '{*}sitemap'),
+            resolve_entities=False, no_network=True, huge_tree=True,
+        ):
+            loc = _entry_loc(entry)
+            if loc:
+                (refs if _local_name(entry.tag) == 'sitemap' else urls).append(loc)
+            entry.clear()
+            while entry.getprevious() is not None:
+                del entry.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        raise SitemapParseError(str(e)) from e
+    return (refs, []) if refs else ([], urls)
+
+
+def _parse_locs_stdlib(data: bytes) -> Tuple[List[str], List[str]]:
+    """ElementTree iterparse: one pass, entries freed as soon as they're read."""
+    refs, urls = [], []
+    root = None
+    try:
+        for event, element in ET.iterparse(io.BytesIO(data), events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            name = _local_name(element.tag)
+            if name == 'url' or name == 'sitemap':
+                loc = _entry_loc(element)
+                if loc:
+                    (refs if name == 'sitemap' else urls).append(loc)
+                root.clear()
+    except ET.ParseError as e:
+        raise SitemapParseError(str(e)) from e
+    return (refs, []) if refs else ([], urls)
+
+
+# Namespace-agnostic fast path. <loc> is only taken with the same prefix as
+# the root element, so extension tags like <image:loc> are skipped.
+_ROOT_TAG = re.compile(rb'<([A-Za-z_][\w.-]*:)?(urlset|sitemapindex)[\s>/]')
+_XML_ENCODING = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)')
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+_COMMENT = re.compile(rb'<!--.*?-->', re.DOTALL)
+_loc_patterns: Dict[bytes, re.Pattern] = {}
+
+
+def _loc_pattern(prefix: bytes):
+    pattern = _loc_patterns.get(prefix)
+    if pattern is None:
+        tag = re.escape(prefix) + rb'loc'
+        pattern = _loc_patterns[prefix] = re.compile(rb'<' + tag + rb'\s*>([^<]*)</' + tag + rb'\s*>')
+    return pattern
+
+
+def _parse_locs_fast(data: bytes) -> Tuple[List[str], List[str]]:
+    """
+    Regex scan for <loc> elements: no tree, no per-element Python objects.
+
+    Anything the scan can't be trusted with (CDATA, DTDs, non-UTF-8
+    encodings, no recognisable root, a missing closing tag) goes to a real
+    XML parser instead.
+    """
+    declared = _XML_ENCODING.match(data)
+    if (b'<![CDATA[' in data or b'<!DOCTYPE' in data or data[:2] in (b'\xff\xfe', b'\xfe\xff')
+            or (declared and declared.group(1).lower() not in (b'utf-8', b'utf8', b'us-ascii'))):
+        return _XML_BACKENDS[_fallback_backend()](data)
+    if b'<!--' in data:
+        data = _COMMENT.sub(b'', data)
+
+    root = _ROOT_TAG.search(data)
+    if root is None or not data[-256:].rstrip().endswith(b'</' + (root.group(1) or b'') + root.group(2) + b'>'):
+        # Not a sitemap, or truncated: let the real parser report it
+        return _XML_BACKENDS[_fallback_backend()](data)
+
+    try:
+        locs = [loc.strip().decode('utf-8') for loc in _loc_pattern(root.group(1) or b'').findall(data)]
+    except UnicodeDecodeError:
+        return _XML_BACKENDS[_fallback_backend()](data)
+    locs = [html.unescape(loc) if '&' in loc else loc for loc in locs if loc]
+    return (locs, []) if root.group(2) == b'sitemapindex' else ([], locs)
+
+
+_XML_BACKENDS = {
+    'lxml': _parse_locs_lxml,
+    'stdlib': _parse_locs_stdlib,
+    'fast': _parse_locs_fast,
+}
+
+_backend = None
+
+
+def _fallback_backend() -> str:
+    return 'lxml' if find_spec('lxml') is not None else 'stdlib'
+
+
+def get_parser_backend() -> str:
+    """Name of the sitemap XML parser in use (see config.SITEMAP_PARSER)."""
+    if _backend is None:
+        from config import SITEMAP_PARSER
+        set_parser_backend(SITEMAP_PARSER)
+    return _backend
+
+
+def set_parser_backend(name: str):
+    """
+    Select the sitemap XML parser.
+
+    "auto" picks lxml if it's installed, else the fast path; "lxml",
+    "stdlib" and "fast" force one.
+    """
+    global _backend
+    if name == 'auto':
+        name = 'lxml' if find_spec('lxml') is not None else 'fast'
+    if name not in _XML_BACKENDS:
+        raise ValueError(f"Unknown sitemap parser {name!r}; expected auto, {', '.join(_XML_BACKENDS)}")
+    if name == 'lxml' and find_spec('lxml') is None:
+        raise ValueError("Sitemap parser 'lxml' selected but lxml is not installed")
+    _backend = name
+
+
+@timed(SITEMAP_PARSE_SECONDS)
+def _parse_locs(xml_content) -> Tuple[List[str], List[str]]:
+    """
+    Parse sitemap XML (bytes or str) in a single pass.
+
+    Namespace-agnostic: <urlset>/<sitemapindex> are recognised with or
+    without the sitemaps.org namespace.
+
+    Returns:
+        Tuple of (child sitemap URLs, page URLs)
+
+    Raises:
+        SitemapParseError: if the XML is malformed
+    """
+    if isinstance(xml_content, str):
+        # Already decoded, so drop any encoding declaration along with it
+        xml_content = _XML_DECLARATION.sub('', xml_content, count=1).encode('utf-8')
+    return _XML_BACKENDS[get_parser_backend()](xml_content)
+
+
+def _iter_parsed(xml_content, visited: set) -> Iterator[str]:
+    """Yield page URLs from sitemap XML, following child sitemaps lazily."""
     if not xml_content:
-        return urls
+        return
     
     try:
-        root = ET.fromstring(xml_content)
-        
-        # Handle namespace (sitemaps typically use this namespace)
-        namespace = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        
-        # Check if this is a sitemap index (contains other sitemaps)
-        sitemap_refs = root.findall(".//ns:sitemap/ns:loc", namespace)
-        
-        if sitemap_refs:
-            # This is a sitemap index - recursively fetch each sitemap
-            console.print(f"[yellow]Found sitemap index with {len(sitemap_refs)} sitemaps[/yellow]")
-            for sitemap_ref in sitemap_refs:
-                nested_url = sitemap_ref.text
-                console.print(f"  Fetching: {nested_url}")
-                nested_content = fetch_sitemap(nested_url)
-                urls.extend(parse_sitemap(nested_content))
-        else:
-            # This is a regular sitemap - extract URLs
-            url_elements = root.findall(".//ns:url/ns:loc", namespace)
-            for url_elem in url_elements:
-                if url_elem.text:
-                    urls.append(url_elem.text.strip())
-    
-    except ET.ParseError as e:
+        sitemap_refs, urls = _parse_locs(xml_content)
+    except SitemapParseError as e:
         console.print(f"[red]Error parsing sitemap XML: {e}[/red]")
+        return
     
-    return urls
+    if sitemap_refs:
+        # This is a sitemap index - recursively fetch each sitemap
+        console.print(f"[yellow]Found sitemap index with {len(sitemap_refs)} sitemaps[/yellow]")
+        for nested_url in sitemap_refs:
+            if nested_url in visited:
+                continue  # Listed twice, or an index loop
+            visited.add(nested_url)
+            console.print(f"  Fetching: {nested_url}")
+            yield from _iter_parsed(fetch_sitemap(nested_url), visited)
+    else:
+        yield from urls
+
+
+def parse_sitemap(xml_content) -> List[str]:
+    """Parse sitemap XML and extract all URLs (raw, not de-duplicated)."""
+    return list(_iter_parsed(xml_content, set()))
 
 
-def get_all_urls(sitemap_url: str) -> List[str]:
-    """Main function: fetch sitemap and return all URLs."""
-    console.print(f"[blue]Fetching sitemap: {sitemap_url}[/blue]")
+def iter_sitemap_urls(sitemap_url: str) -> Iterator[str]:
+    """Stream raw page URLs from a sitemap or sitemap index."""
+    yield from _iter_parsed(fetch_sitemap(sitemap_url), {sitemap_url})
+
+
+def _load_sitemap(sitemap_url: str) -> Tuple[List[str], List[str]]:
+    """Fetch and parse one sitemap file; (child sitemaps, page URLs)."""
     xml_content = fetch_sitemap(sitemap_url)
-    urls = parse_sitemap(xml_content)
+    if not xml_content:
+        return [], []
+    try:
+        return _parse_locs(xml_content)
+    except SitemapParseError as e:
+        console.print(f"[red]Error parsing sitemap XML ({sitemap_url}): {e}[/red]")
+        return [], []
+
+
+def iter_sitemap_sources(sitemap_urls: Iterable[str], max_workers: int = SITEMAP_FETCH_WORKERS) -> Iterator[str]:
+    """
+    Stream raw page URLs from several sitemaps and their child sitemaps,
+    fetching up to `max_workers` sitemap files at once.
+    
+    URLs arrive in the order files finish, not sitemap order. A child
+    listed by more than one source (or index) is fetched once.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from queue import Full, Queue
+    from threading import Event, Lock
+    
+    sources = list(dict.fromkeys(sitemap_urls))
+    visited = set(sources)
+    visited_lock = Lock()
+    # Page URL lists, or ints adjusting the number of unfinished files
+    results = Queue(maxsize=max_workers * 2)
+    stop = Event()
+    
+    def put(item):
+        # Give up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+    
+    def walk(sitemap_url):
+        try:
+            refs, urls = _load_sitemap(sitemap_url)
+            if refs:
+                console.print(f"[yellow]Found sitemap index with {len(refs)} sitemaps[/yellow]")
+                with visited_lock:
+                    children = [ref for ref in dict.fromkeys(refs) if ref not in visited]
+                    visited.update(children)
+                # Counted before they start, so a fast child can't finish the stream early
+                put(len(children))
+                for ref in children:
+                    console.print(f"  Fetching: {ref}")
+                    executor.submit(walk, ref)
+            if urls:
+                put(urls)
+        finally:
+            put(-1)
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for source in sources:
+            executor.submit(walk, source)
+        pending = len(sources)
+        while pending:
+            item = results.get()
+            if isinstance(item, int):
+                pending += item
+            else:
+                yield from item
+    finally:
+        stop.set()
+        # Don't wait out in-flight downloads if the consumer stopped early
+        executor.shutdown(wait=False)
+
+
+def site_origin(site_url: str) -> str:
+    """https://host root of a Search Console property (sc-domain: or URL prefix)."""
+    if site_url.startswith('sc-domain:'):
+        return 'https://' + site_url[len('sc-domain:'):].strip().strip('/')
+    parts = urlsplit(site_url.strip())
+    return urlunsplit((parts.scheme or 'https', parts.netloc, '', '', ''))
+
+
+def robots_sitemaps(site_url: str) -> List[str]:
+    """Sitemap URLs from the `Sitemap:` lines of the site's robots.txt."""
+    robots_url = site_origin(site_url) + '/robots.txt'
+    try:
+        response = requests.get(robots_url, timeout=10)
+        if response.status_code != 200:
+            return []
+        text = response.text
+    except requests.RequestException as e:
+        console.print(f"[yellow]Couldn't fetch {robots_url}: {e}[/yellow]")
+        return []
+    
+    sitemaps = []
+    for line in text.splitlines():
+        field, sep, value = line.partition(':')
+        if sep and field.strip().lower() == 'sitemap':
+            value = value.split('#', 1)[0].strip()
+            if value:
+                sitemaps.append(value)
+    return sitemaps
+
+
+def discover_sitemaps(site_url: str, configured: Optional[str] = None, list_gsc=None) -> List[str]:
+    """
+    Every sitemap known for a property, without repeats.
+    
+    robots.txt and Search Console are queried at the same time.
+    
+    Args:
+        site_url: Search Console property (URL prefix or sc-domain:)
+        configured: Sitemap URL set by the user, listed first
+        list_gsc: Callable returning sitemaps().list() entries (e.g.
+            GSCClient.list_sitemaps); skipped if None
+    
+    Returns:
+        Sitemap URLs, or the site's /sitemap.xml if none were found
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    found = [configured] if configured else []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        robots = executor.submit(robots_sitemaps, site_url)
+        gsc = executor.submit(list_gsc) if list_gsc is not None else None
+        found += robots.result()
+        if gsc is not None:
+            try:
+                found += [entry['path'] for entry in gsc.result() if entry.get('path')]
+            except Exception as e:
+                console.print(f"[yellow]Couldn't list Search Console sitemaps: {e}[/yellow]")
+    
+    sitemaps = list(dict.fromkeys(url.strip() for url in found if url.strip()))
+    return sitemaps or [site_origin(site_url) + '/sitemap.xml']
+
+
+def get_all_urls(sitemap_url, deduplicator: Optional[UrlDeduplicator] = None, urls=None):
+    """
+    Main function: fetch sitemap and return all URLs.
+    
+    URLs are normalized and duplicates (across sitemaps and child sitemaps,
+    trailing slash or tracking-parameter variants) collapsed, so each page
+    is inspected and submitted once.
+    
+    Args:
+        sitemap_url: Sitemap or sitemap index URL, or a list of them (see
+            discover_sitemaps), fetched concurrently
+        deduplicator: UrlDeduplicator to use (e.g. one with a Bloom filter)
+        urls: Container to append into (e.g. scan_store.CompactUrlList);
+            a new list by default
+    """
+    sources = [sitemap_url] if isinstance(sitemap_url, str) else list(sitemap_url)
+    for source in sources:
+        console.print(f"[blue]Fetching sitemap: {source}[/blue]")
+    deduplicator = deduplicator or UrlDeduplicator()
+    if urls is None:
+        urls = []
+    for url in deduplicator.filter(iter_sitemap_sources(sources)):
+        urls.append(url)
+    
+    if deduplicator.duplicates:
+        console.print(f"[yellow]Collapsed {deduplicator.duplicates} duplicate URLs[/yellow]")
+    if deduplicator.invalid:
+        console.print(f"[yellow]Skipped {deduplicator.invalid} malformed URLs[/yellow]")
     console.print(f"[green]Found {len(urls)} URLs in sitemap[/green]")
     return urls
 
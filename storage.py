@@ -0,0 +1,327 @@
+"""
+Storage
+One connection layer for the CLI database (database.py), the web user DB
+(app_oauth) and the SaaS database (app_saas), on SQLite or Postgres.
+
+A Storage hands out pooled connections that behave like plain DB-API
+connections, so existing code (and QuotaLedger, ConcurrencyStore,
+WriteBehind, which take a `connect` callable) keeps its
+connect / cursor / commit / close pattern; close() returns the connection
+to the pool instead of tearing it down. What differs between the two
+databases lives here, once:
+
+    bulk writes       executemany(): execute_batch on Postgres (page_size
+                      rows per round trip), executemany on SQLite
+    streaming reads   iter_rows(): a server-side cursor on Postgres,
+                      fetchmany on SQLite; memory stays flat either way
+    prepared          prepared(): PREPARE / EXECUTE on Postgres; SQLite's
+                      per-connection statement cache, kept warm by pooling
+    schema            migrate(): the front end's Migration list, applied
+                      once per process on first connect
+
+    storage = open_storage(DATABASE_URL, 'autogsc_users.db', MIGRATIONS)
+    with storage.transaction() as cur:
+        storage.executemany(cur, f"INSERT INTO t (a, b) VALUES ({storage.p}, {storage.p})", rows)
+    for row in storage.iter_rows("SELECT url FROM urls"):
+        ...
+"""
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator, List, Optional, Sequence
+
+from migrations import Migration, POSTGRES, SQLITE, get_schema_version, placeholder, run_migrations
+
+# Idle connections kept per Storage; more can be open at once, the extras
+# are closed when given back.
+POOL_SIZE = 8
+
+# Rows per round trip for bulk writes and streaming reads
+BATCH_ROWS = 500
+
+# Compiled statements SQLite keeps per connection
+SQLITE_STATEMENT_CACHE = 256
+
+
+class PooledConnection:
+    """A connection borrowed from a Storage; close() gives it back."""
+
+    def __init__(self, storage: 'Storage', raw):
+        self._storage = storage
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._storage._release(raw)
+
+
+class Storage:
+    """
+    Pooled connections to one database. Use SQLiteStorage or PostgresStorage
+    (or open_storage to pick between them).
+
+    Args:
+        migrations: Applied on first connect (None: the schema is managed
+            elsewhere)
+        pool_size: Idle connections kept for reuse
+    """
+
+    dialect = SQLITE
+
+    def __init__(self, migrations: Optional[List[Migration]] = None, pool_size: int = POOL_SIZE):
+        self.migrations = migrations
+        self.pool_size = pool_size
+        self.p = placeholder(self.dialect)
+        self._idle = []
+        self._lock = Lock()
+        self._init_lock = Lock()
+        self._ready = not migrations
+
+    def _open(self):
+        """Open a new raw connection."""
+        raise NotImplementedError
+
+    @property
+    def Error(self):
+        """The driver's DB-API Error class, for `except storage.Error`."""
+        raise NotImplementedError
+
+    def _alive(self, raw) -> bool:
+        return True
+
+    def migrate(self) -> List[int]:
+        """Apply pending migrations; returns the versions applied."""
+        if not self.migrations:
+            return []
+        conn = self._open()
+        try:
+            applied = run_migrations(conn, self.migrations, self.dialect)
+        finally:
+            conn.close()
+        self._ready = True
+        return applied
+
+    def _ensure_schema(self):
+        with self._init_lock:
+            if not self._ready:
+                self.migrate()
+
+    def connect(self) -> PooledConnection:
+        """Borrow a connection, applying pending migrations on first use."""
+        if not self._ready:
+            self._ensure_schema()
+        raw = None
+        with self._lock:
+            while self._idle and raw is None:
+                raw = self._idle.pop()
+                if not self._alive(raw):
+                    raw = None
+        return PooledConnection(self, raw if raw is not None else self._open())
+
+    def _release(self, raw):
+        try:
+            # End whatever the borrower left open; nothing half-done goes back
+            raw.rollback()
+        except Exception:
+            self._forget(raw)
+            raw.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.pool_size and self._alive(raw):
+                # Most recently used first: its statement cache is warmest
+                self._idle.append(raw)
+                return
+        self._forget(raw)
+        raw.close()
+
+    def _forget(self, raw):
+        pass
+
+    def close(self):
+        """Close the idle connections (borrowed ones close on give-back)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for raw in idle:
+            self._forget(raw)
+            raw.close()
+
+    @contextmanager
+    def transaction(self):
+        """A cursor in one transaction: committed on success, rolled back on error."""
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def fetchone(self, sql: str, params: Sequence = ()):
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchone()
+        finally:
+            conn.close()
+
+    def fetchall(self, sql: str, params: Sequence = ()) -> list:
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchall()
+        finally:
+            conn.close()
+
+    def _stream_cursor(self, conn, batch_size: int):
+        return conn.cursor()
+
+    def iter_rows(self, sql: str, params: Sequence = (), batch_size: int = BATCH_ROWS) -> Iterator:
+        """Yield the rows of a query, fetching `batch_size` at a time."""
+        conn = self.connect()
+        try:
+            cur = self._stream_cursor(conn, batch_size)
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def executemany(self, cur, sql: str, rows: Sequence[Sequence], page_size: int = BATCH_ROWS):
+        """Run `sql` for every row of parameters."""
+        cur.executemany(sql, rows)
+
+    def prepared(self, cur, sql: str, params: Sequence = ()):
+        """
+        Execute a statement that runs many times per connection (per-URL
+        writes), skipping the re-parse where the database allows it.
+        """
+        cur.execute(sql, params)
+
+
+class SQLiteStorage(Storage):
+    """
+    A SQLite file.
+
+    Args:
+        path: Database file
+        row_factory: sqlite3 row factory (sqlite3.Row for dict-like rows)
+    """
+
+    dialect = SQLITE
+
+    def __init__(self, path: str, migrations: Optional[List[Migration]] = None,
+                 pool_size: int = POOL_SIZE, row_factory=None):
+        super().__init__(migrations, pool_size)
+        self.path = path
+        self.row_factory = row_factory
+
+    @property
+    def Error(self):
+        return sqlite3.Error
+
+    def _open(self):
+        # Pooled connections move between threads, one borrower at a time
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=SQLITE_STATEMENT_CACHE)
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        return conn
+
+    def migrate(self) -> List[int]:
+        if self.migrations:
+            conn = self._open()
+            try:
+                # WAL lets readers (e.g. a streaming query) coexist with writers
+                if get_schema_version(conn) < self.migrations[-1].version:
+                    conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+        return super().migrate()
+
+
+class PostgresStorage(Storage):
+    """
+    A Postgres database (psycopg2).
+
+    Args:
+        dsn: Connection string (e.g. DATABASE_URL)
+        dict_rows: Return rows as dicts (RealDictCursor)
+    """
+
+    dialect = POSTGRES
+
+    def __init__(self, dsn: str, migrations: Optional[List[Migration]] = None,
+                 pool_size: int = POOL_SIZE, dict_rows: bool = True):
+        super().__init__(migrations, pool_size)
+        self.dsn = dsn
+        self.dict_rows = dict_rows
+        # Statements PREPAREd on each open connection, by id(connection)
+        self._prepared = {}
+
+    def _open(self):
+        # psycopg2 is only needed when a Postgres URL is configured
+        import psycopg2
+        import psycopg2.extras
+        if self.dict_rows:
+            return psycopg2.connect(self.dsn, cursor_factory=psycopg2.extras.RealDictCursor)
+        return psycopg2.connect(self.dsn)
+
+    @property
+    def Error(self):
+        import psycopg2
+        return psycopg2.Error
+
+    def _alive(self, raw) -> bool:
+        return not raw.closed
+
+    def _forget(self, raw):
+        self._prepared.pop(id(raw), None)
+
+    def _stream_cursor(self, conn, batch_size: int):
+        # Named cursors live on the server; rows arrive batch_size at a time
+        cur = conn.cursor(name=f"autogsc_stream_{id(conn):x}")
+        cur.itersize = batch_size
+        return cur
+
+    def executemany(self, cur, sql: str, rows: Sequence[Sequence], page_size: int = BATCH_ROWS):
+        from psycopg2.extras import execute_batch
+        execute_batch(cur, sql, rows, page_size=page_size)
+
+    def prepared(self, cur, sql: str, params: Sequence = ()):
+        name = f"autogsc_{zlib.crc32(sql.encode()):08x}"
+        prepared = self._prepared.setdefault(id(cur.connection), set())
+        if name not in prepared:
+            numbered = iter(range(1, len(params) + 1))
+            cur.execute(f"PREPARE {name} AS " + re.sub(r'%s', lambda m: f"${next(numbered)}", sql))
+            prepared.add(name)
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+
+def open_storage(database_url: Optional[str], sqlite_path: str,
+                 migrations: Optional[List[Migration]] = None, **kwargs) -> Storage:
+    """
+    Postgres when `database_url` is set, the SQLite file at `sqlite_path`
+    otherwise. Extra arguments go to the chosen class.
+    """
+    if database_url:
+        kwargs.pop('row_factory', None)
+        return PostgresStorage(database_url, migrations, **kwargs)
+    kwargs.pop('dict_rows', None)
+    return SQLiteStorage(sqlite_path, migrations, **kwargs)
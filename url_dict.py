@@ -0,0 +1,161 @@
+"""
+URL Dictionary
+Every URL string stored once, in url_dict, keyed by a 64-bit hash of the
+URL; urls, submissions and status history reference it by that id.
+
+E-commerce URLs are often 150+ bytes. Keyed by text, each of those tables
+repeats the string per row and every index on it copies it again; keyed
+by id they hold 8 bytes. url_dict's primary key is the id itself (the
+rowid on SQLite), so there is no index on the text at all: finding a
+URL's id is a hash plus one primary-key read.
+
+Ids are the first 8 bytes of BLAKE2b(url) as a signed 64-bit integer. On
+the rare collision (about 3 in 10^8 odds of any at all among 1M URLs) the
+later URL takes the next free id, and lookups probe the same way. Rows are
+never deleted from url_dict, so a probe never skips a URL.
+
+    cur.execute(f"SELECT status FROM urls WHERE url_id = {p}", (url_id(cur, url, dialect),))
+"""
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from migrations import POSTGRES, placeholder
+
+# Candidate ids tried per URL before giving up (one is almost always enough)
+MAX_PROBES = 8
+
+# URLs resolved per query by url_ids()
+BATCH_SIZE = 500
+
+
+def url_hash(url: str) -> int:
+    """The URL's home id: a signed 64-bit hash."""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def _next_id(candidate: int) -> int:
+    """The next id to probe, wrapping within signed 64 bits."""
+    return candidate + 1 if candidate < 2 ** 63 - 1 else -2 ** 63
+
+
+def _value(row, key: str, index: int):
+    return row[key] if isinstance(row, dict) else row[index]
+
+
+def create_url_dict_tables(cur, dialect: str):
+    """Create url_dict; called from each database's migrations."""
+    id_type = 'BIGINT' if dialect == POSTGRES else 'INTEGER'
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS url_dict (
+            id {id_type} PRIMARY KEY,
+            url TEXT NOT NULL
+        )
+    """)
+
+
+def url_id(cur, url: str, dialect: str, create: bool = True) -> Optional[int]:
+    """
+    The id of `url`, adding it to url_dict when `create` (else None if
+    it isn't there). Runs in the caller's transaction.
+    """
+    p = placeholder(dialect)
+    candidate = url_hash(url)
+    for _ in range(MAX_PROBES):
+        cur.execute(f"SELECT url FROM url_dict WHERE id = {p}", (candidate,))
+        row = cur.fetchone()
+        if row is None:
+            if not create:
+                return None
+            cur.execute(f"""
+                INSERT INTO url_dict (id, url) VALUES ({p}, {p})
+                ON CONFLICT (id) DO NOTHING
+            """, (candidate, url))
+            if cur.rowcount == 1:
+                return candidate
+            # Another writer took this id first; look at it again
+            continue
+        if _value(row, 'url', 0) == url:
+            return candidate
+        candidate = _next_id(candidate)
+    raise RuntimeError(f"No free url_dict id for {url} after {MAX_PROBES} probes")
+
+
+def _executemany(cur, dialect: str, sql: str, rows: List[tuple]):
+    if dialect == POSTGRES:
+        from psycopg2.extras import execute_batch
+        execute_batch(cur, sql, rows, page_size=BATCH_SIZE)
+    else:
+        cur.executemany(sql, rows)
+
+
+def url_ids(cur, urls: Iterable[str], dialect: str, create: bool = True) -> Dict[str, int]:
+    """
+    Ids of many URLs, a few queries per BATCH_SIZE URLs. URLs not in
+    url_dict are added when `create`, else left out of the result.
+    """
+    p = placeholder(dialect)
+    ids = {}
+    urls = list(dict.fromkeys(urls))
+    for start in range(0, len(urls), BATCH_SIZE):
+        chunk = urls[start:start + BATCH_SIZE]
+        batch = {url_hash(url): url for url in chunk}
+
+        def match(candidates):
+            cur.execute(
+                f"SELECT id, url FROM url_dict WHERE id IN ({', '.join([p] * len(candidates))})",
+                list(candidates)
+            )
+            taken = set()
+            for row in cur.fetchall():
+                found_id, found_url = _value(row, 'id', 0), _value(row, 'url', 1)
+                taken.add(found_id)
+                if batch.get(found_id) == found_url:
+                    ids[found_url] = found_id
+            return taken
+
+        taken = match(batch)
+        free = [(h, url) for h, url in batch.items() if h not in taken]
+        if create and free:
+            _executemany(cur, dialect, f"""
+                INSERT INTO url_dict (id, url) VALUES ({p}, {p})
+                ON CONFLICT (id) DO NOTHING
+            """, free)
+            match([h for h, _ in free])
+
+        # Left over: two URLs of the chunk with one hash, or a hash already
+        # taken by another URL; settled by probing, one at a time
+        for url in chunk:
+            if url not in ids:
+                found = url_id(cur, url, dialect, create)
+                if found is not None:
+                    ids[url] = found
+    return ids
+
+
+def _iter_column(cur, dialect: str, sql: str, batch_size: int = BATCH_SIZE) -> Iterator[List[str]]:
+    """Batches of the first column of `sql`, read on a second cursor."""
+    if dialect == POSTGRES:
+        reader = cur.connection.cursor(name='url_dict_backfill')
+    else:
+        reader = cur.connection.cursor()
+    reader.execute(sql)
+    while True:
+        rows = reader.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [row[0] if not isinstance(row, dict) else list(row.values())[0] for row in rows]
+    reader.close()
+
+
+def build_url_map(cur, dialect: str, sql: str):
+    """
+    Migration helper: add every URL returned by `sql` (one column, distinct
+    URLs) to url_dict, and fill a temporary url_map (url, id) table to join
+    the old text-keyed rows against. Drop url_map when done.
+    """
+    id_type = 'BIGINT' if dialect == POSTGRES else 'INTEGER'
+    p = placeholder(dialect)
+    cur.execute(f"CREATE TEMPORARY TABLE url_map (url TEXT PRIMARY KEY, id {id_type} NOT NULL)")
+    for urls in _iter_column(cur, dialect, sql):
+        ids = url_ids(cur, urls, dialect)
+        _executemany(cur, dialect, f"INSERT INTO url_map (url, id) VALUES ({p}, {p})", list(ids.items()))
@@ -0,0 +1,288 @@
+"""
+Write-Behind Sync
+Hot per-URL writes go to a local SQLite outbox; a background thread pushes
+them to the authoritative database (usually Postgres) in batches.
+
+A scan writes one status row per URL. Sent straight to a remote Postgres
+that is a network round trip per URL; through the outbox it is a local
+insert, and the remote sees one multi-row statement per batch. Repeated
+writes for the same key (a URL re-checked before the next flush) are
+coalesced in the outbox, so only the latest is sent.
+
+The outbox is a file, so rows written before a crash are sent by the next
+process that opens it. Several processes can share one outbox: each flush
+claims its batch first, and claims older than CLAIM_TTL_SECONDS (a flusher
+that died) are picked up again.
+
+    sync = WriteBehind(connect, POSTGRES, [URL_STATUS, SUBMISSION_LOG], outbox_path)
+    sync.start()
+    sync.put(URL_STATUS, (site_url, url, status, checked_at))
+    ...
+    sync.close()   # final flush
+"""
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from metrics import counter, db_write_seconds
+from migrations import POSTGRES, placeholder
+
+# Rows pushed per remote statement
+BATCH_ROWS = 500
+
+# Seconds between background flushes
+FLUSH_SECONDS = 5.0
+
+# A claimed batch not sent within this many seconds is claimed again
+CLAIM_TTL_SECONDS = 300
+
+SYNC_FLUSH_SECONDS = db_write_seconds('write_behind_flush')
+SYNC_ROWS = counter('autogsc_write_behind_rows_total', 'Rows synced to the authoritative database')
+SYNC_ERRORS = counter('autogsc_write_behind_errors_total', 'Write-behind flushes that failed')
+
+logger = logging.getLogger(__name__)
+
+
+class SyncTable:
+    """
+    A table in the authoritative database that rows are synced into.
+
+    Rows are upserted on `key`; with no key they are appended.
+    """
+
+    def __init__(self, name: str, columns: Sequence[str], key: Sequence[str] = ()):
+        self.name = name
+        self.columns = tuple(columns)
+        self.key = tuple(key)
+        self._key_index = [self.columns.index(column) for column in self.key]
+
+    def row_key(self, row: Sequence) -> Optional[str]:
+        """Outbox coalescing key, or None for append-only rows."""
+        if not self.key:
+            return None
+        return json.dumps([row[i] for i in self._key_index], separators=(',', ':'))
+
+    def insert_sql(self, dialect: str) -> str:
+        columns = ', '.join(self.columns)
+        # Postgres gets a single VALUES %s for psycopg2's execute_values
+        values = '%s' if dialect == POSTGRES else '(' + ', '.join([placeholder(dialect)] * len(self.columns)) + ')'
+        sql = f"INSERT INTO {self.name} ({columns}) VALUES {values}"
+        if self.key:
+            updates = ', '.join(f"{c} = excluded.{c}" for c in self.columns if c not in self.key)
+            sql += f" ON CONFLICT ({', '.join(self.key)}) DO UPDATE SET {updates}"
+        return sql
+
+
+# Tables shared by the CLI sync and the web app
+URL_STATUS = SyncTable('url_status', ('site_url', 'url', 'status', 'checked_at'), key=('site_url', 'url'))
+SUBMISSION_LOG = SyncTable('submission_log', ('site_url', 'url', 'result', 'error_message', 'submitted_at'))
+
+
+def create_sync_tables(cur, dialect: str):
+    """Create URL_STATUS and SUBMISSION_LOG; called from migrations, or directly."""
+    id_column = 'id SERIAL PRIMARY KEY' if dialect == POSTGRES else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS url_status (
+            site_url TEXT NOT NULL,
+            url TEXT NOT NULL,
+            status TEXT,
+            checked_at TEXT,
+            PRIMARY KEY (site_url, url)
+        )
+    """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS submission_log (
+            {id_column},
+            site_url TEXT NOT NULL,
+            url TEXT NOT NULL,
+            result TEXT,
+            error_message TEXT,
+            submitted_at TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_submission_log_site_time
+        ON submission_log (site_url, submitted_at)
+    """)
+
+
+class WriteBehind:
+    """
+    Local outbox in front of an authoritative database.
+
+    Args:
+        connect: Callable returning a new connection to the authoritative DB
+        dialect: migrations.SQLITE or migrations.POSTGRES
+        tables: The SyncTables rows may be put into
+        outbox_path: Local SQLite file holding unsent rows
+        batch_rows: Rows per remote statement (and pending rows that wake
+            the background flusher early)
+        flush_seconds: Interval between background flushes
+    """
+
+    def __init__(self, connect: Callable, dialect: str, tables: Iterable[SyncTable], outbox_path: str,
+                 batch_rows: int = BATCH_ROWS, flush_seconds: float = FLUSH_SECONDS):
+        self.connect = connect
+        self.dialect = dialect
+        self.tables = {table.name: table for table in tables}
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self._pending = 0
+        self._outbox = sqlite3.connect(outbox_path, timeout=30, check_same_thread=False,
+                                       isolation_level=None)
+        self._outbox_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._outbox.execute("PRAGMA journal_mode=WAL")
+        self._outbox.execute("PRAGMA synchronous=NORMAL")
+        self._outbox.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                key TEXT,
+                row TEXT NOT NULL,
+                claim INTEGER,
+                claimed_at INTEGER
+            )
+        """)
+        # NULL keys (append-only rows) never conflict
+        self._outbox.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_key ON outbox (tbl, key)")
+
+    def put(self, table: SyncTable, row: Sequence):
+        """Queue one row; replaces any unsent row with the same key."""
+        self.put_many(table, [row])
+
+    def put_many(self, table: SyncTable, rows: Iterable[Sequence]):
+        """Queue rows in one local transaction."""
+        records = [(table.name, table.row_key(row), json.dumps(list(row))) for row in rows]
+        if not records:
+            return
+        with self._outbox_lock:
+            self._outbox.execute("BEGIN")
+            try:
+                self._outbox.executemany(
+                    "INSERT OR REPLACE INTO outbox (tbl, key, row) VALUES (?, ?, ?)", records
+                )
+                self._outbox.execute("COMMIT")
+            except Exception:
+                self._outbox.execute("ROLLBACK")
+                raise
+            self._pending += len(records)
+            pending = self._pending
+        if pending >= self.batch_rows:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def _claim(self) -> tuple:
+        """Claim up to batch_rows unsent rows; returns (claim, rows)."""
+        claim = random.getrandbits(62)
+        now = int(time.time())
+        with self._outbox_lock:
+            self._outbox.execute("BEGIN IMMEDIATE")
+            try:
+                self._outbox.execute("""
+                    UPDATE outbox SET claim = ?, claimed_at = ?
+                    WHERE id IN (
+                        SELECT id FROM outbox
+                        WHERE claim IS NULL OR claimed_at < ?
+                        ORDER BY id LIMIT ?
+                    )
+                """, (claim, now, now - CLAIM_TTL_SECONDS, self.batch_rows))
+                rows = self._outbox.execute(
+                    "SELECT tbl, row FROM outbox WHERE claim = ? ORDER BY id", (claim,)
+                ).fetchall()
+                self._outbox.execute("COMMIT")
+            except Exception:
+                self._outbox.execute("ROLLBACK")
+                raise
+        return claim, rows
+
+    def _send(self, rows: List[tuple]):
+        """Write claimed rows to the authoritative DB in one transaction."""
+        by_table = {}
+        for name, row in rows:
+            by_table.setdefault(name, []).append(tuple(json.loads(row)))
+
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            for name, values in by_table.items():
+                sql = self.tables[name].insert_sql(self.dialect)
+                if self.dialect == POSTGRES:
+                    from psycopg2.extras import execute_values
+                    execute_values(cur, sql, values, page_size=self.batch_rows)
+                else:
+                    cur.executemany(sql, values)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def flush(self) -> int:
+        """Send everything unsent; returns the rows sent."""
+        sent = 0
+        with self._flush_lock:
+            while True:
+                claim, rows = self._claim()
+                if not rows:
+                    break
+                try:
+                    with SYNC_FLUSH_SECONDS.time():
+                        self._send(rows)
+                except Exception:
+                    SYNC_ERRORS.inc()
+                    with self._outbox_lock:
+                        self._outbox.execute("UPDATE outbox SET claim = NULL WHERE claim = ?", (claim,))
+                    raise
+                with self._outbox_lock:
+                    self._outbox.execute("DELETE FROM outbox WHERE claim = ?", (claim,))
+                    self._pending = max(0, self._pending - len(rows))
+                SYNC_ROWS.inc(len(rows))
+                sent += len(rows)
+        return sent
+
+    def unsent(self) -> int:
+        """Rows waiting in the outbox (from any process)."""
+        with self._outbox_lock:
+            return self._outbox.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Rows stay in the outbox for the next attempt. Logged, not
+                # printed: stdout may be a JSONL stream or a dashboard job.
+                logger.warning("Write-behind flush failed; rows stay queued", exc_info=True)
+
+    def start(self):
+        """Flush in the background every flush_seconds."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the background flusher and send what's left."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        finally:
+            self._outbox.close()